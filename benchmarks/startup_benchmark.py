@@ -0,0 +1,62 @@
+"""
+浏览器启动耗时基准测试：对比不同启动配置的冷启动耗时和首次打开页面的耗时
+
+    python -m benchmarks.startup_benchmark -b Chrome --url https://www.example.com --runs 3
+"""
+import argparse
+import statistics
+import time
+
+from common.driver_config import DriverConfig
+from common.launch_profile import LAUNCH_PROFILES, get_launch_profile
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark browser cold launch and first navigation per launch profile.")
+    parser.add_argument("-b", "--browser", default="Chrome", help="What browser to use")
+    parser.add_argument("--url", default="about:blank", help="Page used to measure the first navigation")
+    parser.add_argument("--runs", type=int, default=3, help="Launches per profile")
+    parser.add_argument("--profiles", nargs="+", choices=list(LAUNCH_PROFILES), default=list(LAUNCH_PROFILES),
+                        help="Profiles to benchmark (default: all)")
+    return parser.parse_args()
+
+
+def benchmark_profile(browser, profile_name, url, runs):
+    """
+    :return: (冷启动耗时列表, 首次打开页面耗时列表)，单位秒
+    """
+    profile = get_launch_profile(profile_name)
+    launch_times, navigation_times = [], []
+    for _ in range(runs):
+        start = time.perf_counter()
+        driver = DriverConfig().init_driver(browser, profile=profile)
+        launch_times.append(time.perf_counter() - start)
+        if driver is None:
+            raise AssertionError(f"启动 {browser} 浏览器失败（启动配置: {profile_name}）")
+        try:
+            start = time.perf_counter()
+            driver.get(url)
+            navigation_times.append(time.perf_counter() - start)
+        finally:
+            driver.quit()
+    return launch_times, navigation_times
+
+
+def main():
+    args = parse_args()
+    results = {}
+    for profile_name in args.profiles:
+        logger.info(f"⏱️ Benchmarking profile {profile_name} ({args.runs} runs)")
+        results[profile_name] = benchmark_profile(args.browser, profile_name, args.url, args.runs)
+
+    logger.info(f"{'profile':<16}{'launch median':>16}{'launch min':>14}{'navigate median':>18}{'navigate min':>16}")
+    for profile_name, (launch_times, navigation_times) in results.items():
+        logger.info(f"{profile_name:<16}{statistics.median(launch_times):>15.3f}s{min(launch_times):>13.3f}s"
+                    f"{statistics.median(navigation_times):>17.3f}s{min(navigation_times):>15.3f}s")
+
+
+if __name__ == "__main__":
+    main()
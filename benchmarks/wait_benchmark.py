@@ -0,0 +1,80 @@
+"""
+元素等待延迟基准测试：对比 WebDriverWait 轮询和事件驱动等待，元素出现/消失后多久等待才返回
+
+    python -m benchmarks.wait_benchmark -b Chrome --runs 20
+"""
+import argparse
+import random
+import statistics
+import time
+
+from selenium.webdriver.common.by import By
+
+from common.browser_operation import BrowserOperator
+from common.driver_config import DriverConfig
+from common.launch_profile import LAUNCH_PROFILES, get_launch_profile
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 测试页面：通过 window.schedule(delay, action) 在 delay 毫秒后添加或删除目标元素
+BENCHMARK_PAGE = """data:text/html,<html><body><div id="box"></div><script>
+window.schedule = (delay, action) => setTimeout(() => {
+    const box = document.getElementById('box');
+    if (action === 'show') { box.innerHTML = '<span id="target">ready</span>'; }
+    else { box.innerHTML = ''; }
+}, delay);
+</script></body></html>"""
+
+TARGET = (By.ID, "target")
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description="Benchmark element wait latency of the polling and event wait engines.")
+    parser.add_argument("-b", "--browser", default="Chrome", help="What browser to use")
+    parser.add_argument("--profile", choices=list(LAUNCH_PROFILES), default="headless-fast", help="Browser launch profile")
+    parser.add_argument("--runs", type=int, default=20, help="Waits per engine and condition")
+    return parser.parse_args()
+
+
+def measure(operator: BrowserOperator, action, runs):
+    """
+    :return: 每次等待的额外延迟（秒）= 等待总耗时 - 元素实际变化的延迟
+    """
+    latencies = []
+    for _ in range(runs):
+        operator.driver.get(BENCHMARK_PAGE)
+        if action == "hide":
+            operator.driver.execute_script("window.schedule(0, 'show');")
+            operator.element_get(TARGET, timeout=5)
+        delay = random.randint(200, 1200)
+        operator.driver.execute_script("window.schedule(arguments[0], arguments[1]);", delay, action)
+        start = time.perf_counter()
+        if action == "show":
+            operator.element_get(TARGET, timeout=5, must_be_visible=True)
+        else:
+            operator.element_wait_for_not_display(TARGET, timeout=5)
+        latencies.append(time.perf_counter() - start - delay / 1000)
+    return latencies
+
+
+def main():
+    args = parse_args()
+    driver = DriverConfig().init_driver(args.browser, profile=get_launch_profile(args.profile))
+    if driver is None:
+        raise AssertionError(f"启动 {args.browser} 浏览器失败")
+    try:
+        operator = BrowserOperator(driver=driver)
+        logger.info(f"{'engine':<10}{'condition':<12}{'median':>10}{'p90':>10}{'max':>10}")
+        for engine in ("polling", "event"):
+            operator.wait_engine = engine
+            for action in ("show", "hide"):
+                latencies = sorted(measure(operator, action, args.runs))
+                p90 = latencies[int(len(latencies) * 0.9) - 1] if len(latencies) >= 10 else latencies[-1]
+                logger.info(f"{engine:<10}{action:<12}{statistics.median(latencies) * 1000:>8.0f}ms{p90 * 1000:>8.0f}ms{latencies[-1] * 1000:>8.0f}ms")
+    finally:
+        driver.quit()
+
+
+if __name__ == "__main__":
+    main()
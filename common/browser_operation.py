@@ -1,47 +1,164 @@
-import io
 import os
 import time
+import uuid
+from concurrent.futures import Future
 
 from PIL import Image
-from selenium.common import TimeoutException
+from selenium.common import JavascriptException, NoSuchFrameException, NoSuchWindowException, StaleElementReferenceException, TimeoutException
 from selenium.webdriver import Keys, ActionChains
+from selenium.webdriver.remote.webdriver import WebDriver
 from selenium.webdriver.support.wait import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 
+from common.deep_locator import DeepLocator, get_frame_path, set_frame_path, switch_to_frame_path
+from common.download_manager import DownloadWatcher, get_session_download_dir
+from common.element_cache import clear_element_cache, element_cache_enabled, get_element_cache, invalidate_element_cache
+from common.event_wait import EventWaiter, get_wait_engine
 from common.global_var import GlobalVar
+from common.js_scripts import RESOLVE_MANY_JS, NETWORK_TRACKER_JS, PAGE_READY_JS, FILL_FORM_JS, READ_FORM_JS, TABLE_JS, LIST_STREAM_JS, SHADOW_FIND_JS, VISUAL_RECTS_JS
+from common.locator_profiler import locator_profile_enabled, locator_profiler
+from common.retry_policy import DEFAULT_RETRY_POLICY, RetryPolicy, classify_exception, deadline_scope, remaining_time
+from common.screenshot_service import screenshot_service
+from common.tab_pool import TabPool
+from common.visual_match import VisualComparator, baseline_store, decode_image, render_diff, visual_comparator, visual_update_enabled
+from utils.common_utils import get_worker_path
+from utils.file_utils import get_current_project_path
 from utils.log_manager import LogManager
 
 logger = LogManager()
 
 
 class BrowserOperator:
-
-    def __init__(self):
-        self.driver = GlobalVar.get_driver()
+    # 元素操作的重试策略，page 中可以覆盖这个属性定制重试的异常类型和退避时间
+    retry_policy: RetryPolicy = DEFAULT_RETRY_POLICY
+
+    def __init__(self, driver: WebDriver = None, driver_role: str = None):
+        """
+        driver: 指定使用的驱动
+        driver_role: 指定使用哪个角色的驱动（GlobalVar.set_driver_map 中注册的角色）
+        都不指定时使用当前上下文中的驱动（参考 GlobalVar.session）
+        """
+        if driver is None and driver_role is not None:
+            driver = GlobalVar.get_driver_map(driver_role)
+            if driver is None:
+                raise ValueError(f"没有发现角色 {driver_role} 的driver，请先调用set_driver_map的方法")
+        self.driver = driver or GlobalVar.get_driver()
+        # 等待引擎：polling（WebDriverWait 轮询）/ event（页面内事件驱动），默认读取环境变量 TEST_WAIT_ENGINE
+        self.wait_engine = get_wait_engine()
+        self.event_waiter = EventWaiter(self.driver)
+        # 元素缓存（同一个驱动的所有 page 共享），默认读取环境变量 TEST_ELEMENT_CACHE，没有开启时为 None
+        self.element_cache = get_element_cache(self.driver) if element_cache_enabled() else None
+        # 定位方式耗时分析（run.py --locator-profile 开启），没有开启时为 None
+        self.locator_profiler = locator_profiler if locator_profile_enabled() else None
 
     def get_page_title(self):
         return self.driver.title
 
-    def page_forward(self):
+    def open_url(self, url: str, wait_ready: bool = True):
+        """
+        打开页面
+        url: 页面地址
+        wait_ready: 是否等待页面就绪（网络空闲、没有动画、前端框架空闲），参考 wait_for_page_ready
+        """
+        self.enable_network_tracking()
+        self._reset_context()
+        self.driver.get(url)
+        if wait_ready:
+            self.wait_for_page_ready()
+
+    def page_forward(self, wait_ready: bool = True):
         """
         浏览器前进
         """
+        self.enable_network_tracking()
+        self._reset_context()
         self.driver.forward()
+        if wait_ready:
+            self.wait_for_page_ready()
 
-    def page_back(self):
+    def page_back(self, wait_ready: bool = True):
         """
         浏览器后退
         """
+        self.enable_network_tracking()
+        self._reset_context()
         self.driver.back()
+        if wait_ready:
+            self.wait_for_page_ready()
 
-    def page_refresh(self, wait_time: int = None):
+    def page_refresh(self, wait_time: int = None, wait_ready: bool = True):
+        """
+        刷新页面
+        wait_time: 刷新后固定等待的时间（秒），不指定时等待页面就绪
+        wait_ready: 没有指定 wait_time 时是否等待页面就绪
+        """
+        self.enable_network_tracking()
+        self._reset_context()
         self.driver.refresh()
         if wait_time:
             time.sleep(wait_time)
+        elif wait_ready:
+            self.wait_for_page_ready()
+
+    def enable_network_tracking(self):
+        """
+        在页面脚本执行之前注入 fetch/XHR 请求计数（Chromium 内核通过 CDP 注入，之后打开的所有页面都会生效），
+        这样页面加载过程中发出的请求也能被统计到；其他浏览器在 wait_for_page_ready 时才注入
+        """
+        if getattr(self.driver, "_network_tracking", False) or not hasattr(self.driver, "execute_cdp_cmd"):
+            return
+        try:
+            self.driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": NETWORK_TRACKER_JS})
+            self.driver._network_tracking = True
+        except Exception as e:
+            logger.warning(f"注入网络请求计数脚本失败: {e}")
+
+    def wait_for_page_ready(self, idle_time: float = 0.5, timeout: float = 30, long_request: float = 10, raise_on_timeout: bool = False) -> bool:
+        """
+        等待页面就绪：文档加载完成、fetch/XHR/资源加载空闲 idle_time 秒、没有正在播放的动画、jQuery/Angular 空闲
+        用于代替打开页面、刷新、前进、后退之后的固定等待
+        idle_time: 网络空闲多久认为页面就绪（秒）
+        timeout: 超时时间（秒）
+        long_request: 超过这个时长仍未结束的请求视为长连接/轮询，不计入网络繁忙（秒）
+        raise_on_timeout: 超时后是否抛出异常，默认只记录警告
+        :return: 是否在超时时间内就绪
+        """
+        deadline = time.monotonic() + timeout
+        self.event_waiter.ensure_script_timeout(timeout)
+        while True:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                result = {"status": "timeout", "pending": "-"}
+                break
+            try:
+                result = self.driver.execute_async_script(PAGE_READY_JS, int(idle_time * 1000), int(remaining * 1000), int(long_request * 1000))
+                break
+            except (JavascriptException, TimeoutException):
+                # 等待过程中页面发生跳转（文档卸载导致脚本中断或者脚本超时），在新页面上重新等待
+                # 窗口已关闭、会话失效等其他错误直接抛出，不会等待完整的超时时间
+                time.sleep(0.05)
+        if result["status"] == "ok":
+            return True
+        message = f"页面在 {timeout} 秒内没有就绪，仍有 {result['pending']} 个网络请求未完成"
+        if raise_on_timeout:
+            raise TimeoutException(message)
+        logger.warning(message)
+        return False
 
     def get_current_url(self):
         return self.driver.current_url
 
+    @staticmethod
+    def deadline(timeout: float):
+        """
+        多个步骤共享一个时间预算，范围内每个操作的等待时间不会超过剩余的时间
+
+            with self.deadline(15):
+                self.element_fill_value(user_input, "admin")
+                self.element_click(login_button)
+        """
+        return deadline_scope(timeout)
+
     def scroll_to_top(self) -> bool:
         """滑动到浏览器顶部"""
         try:
@@ -58,6 +175,53 @@ class BrowserOperator:
         except Exception as e:
             raise AssertionError(f"滑动到浏览器底部失败！{e}")
 
+    def iter_list_rows(self, container: tuple = None, row_selector: str = "[role=row]", key_attribute: str = None, cell_selector: str = None,
+                       step: int = 0, settle_time: float = 0.15, load_timeout: float = 5, max_rows: int = None, timeout=20):
+        """
+        逐步滚动虚拟列表/无限滚动列表并逐行返回（生成器），每一步一次浏览器往返：读取新渲染的行、滚动、等待渲染稳定
+        被虚拟列表回收复用的行按 key 去重，只返回行的数据（不持有 WebElement），可以遍历几万行的列表而不占用大量内存
+
+            for row in self.iter_list_rows((By.CSS_SELECTOR, ".grid-body"), ".grid-row", key_attribute="data-id"):
+                assert row["cells"][2] != "ERROR"
+
+        container: 滚动容器的定位元组，为 None 时滚动整个页面
+        row_selector: 行的 css 选择器（在容器中查找）
+        key_attribute: 作为行唯一标识的属性，为 None 时依次尝试 data-key、data-id、data-row-key、data-index、aria-rowindex、id，都没有时使用行的文本
+        cell_selector: 单元格的 css 选择器，为 None 时使用行的子元素
+        step: 每次滚动的像素，0 表示容器可见高度的 90%
+        settle_time: 列表发生变化后多久没有新的变化认为渲染完成（秒）
+        load_timeout: 滚动到底部后等待懒加载新数据的时间（秒），超过后认为已经没有更多数据；也是每一步等待渲染稳定的上限，容器一直变化时返回已经读取到的行
+        max_rows: 最多返回的行数
+        timeout: 等待滚动容器出现的超时时间（秒）
+        :return: 生成器，每一行为 {"key": key, "text": 行的文本, "cells": [单元格文本]}
+        """
+        element = self.element_get(container, timeout) if container else None
+        stream_id = uuid.uuid4().hex
+        self.event_waiter.ensure_script_timeout(load_timeout)
+        seen = set()
+        try:
+            while True:
+                try:
+                    result = self.driver.execute_async_script(LIST_STREAM_JS, element, row_selector, key_attribute, cell_selector, stream_id,
+                                                              step, int(settle_time * 1000), int(load_timeout * 1000))
+                except Exception as e:
+                    raise AssertionError(f"滚动读取列表 {container or row_selector} 时报错: {e}")
+                for row in result["rows"]:
+                    # 页面中也会去重，这里再去重一次，防止页面刷新后页面中的记录丢失
+                    if row["key"] in seen:
+                        continue
+                    seen.add(row["key"])
+                    yield row
+                    if max_rows and len(seen) >= max_rows:
+                        return
+                if result["exhausted"]:
+                    return
+        finally:
+            try:
+                self.driver.execute_script("if (window.__listStreams) delete window.__listStreams[arguments[0]];", stream_id)
+            except Exception:
+                pass
+
     def get_current_handle(self):
         """
         获取当前浏览器tab的句柄
@@ -77,12 +241,14 @@ class BrowserOperator:
         window_index (int): 窗口索引（从0开始），-1表示最后一个窗口
         window_name (str): 窗口名称（可选，通过 driver.switch_to.window(name) 实现）
         """
+        self._reset_context()
         try:
-            # 最推荐：直接通过句柄切换
+            # 最推荐：直接通过句柄切换（句柄不存在时切换命令会抛出 NoSuchWindowException，不需要先查询 window_handles）
             if window_handle:
-                if window_handle not in self.driver.window_handles:
+                try:
+                    self.driver.switch_to.window(window_handle)
+                except NoSuchWindowException:
                     raise AssertionError("这个浏览器句柄不存在！")
-                self.driver.switch_to.window(window_handle)
                 return window_handle
             # 通过名称切换（部分浏览器可能不支持）
             if window_name:
@@ -99,6 +265,115 @@ class BrowserOperator:
         except Exception as e:
             raise AssertionError(f"切换浏览器窗口或标签页失败! {e}")
 
+    def tab_pool(self, size: int = 4, timeout: float = 30, wait_ready: bool = True) -> TabPool:
+        """
+        在当前浏览器中打开 size 个标签页组成的工作池，退出 with 时关闭这些标签页并切换回原来的窗口
+
+            with operator.tab_pool(4) as pool:
+                prices = pool.map(detail_urls, lambda operator, url: operator.element_get(DetailPage.PRICE).text)
+        timeout: 每个页面加载的超时时间（秒）
+        wait_ready: 是否在跳转后等待页面就绪，参考 wait_for_page_ready
+        """
+        return TabPool(self, size=size, timeout=timeout, wait_ready=wait_ready)
+
+    def run_in_tabs(self, items: list, check=None, size: int = 4, timeout: float = 30, wait_ready: bool = True, raise_on_error: bool = True) -> list:
+        """
+        打开 size 个标签页并行处理互相独立的只读检查，处理完成后关闭这些标签页，返回与 items 顺序一致的结果
+        所有标签页先开始跳转再逐个等待，页面加载的时间互相重叠
+        items: url 或者方法的列表，url 打开后调用 check(operator, url)，方法在空闲的标签页中调用 item(operator)
+        check: 页面打开后执行的检查方法，为 None 时返回页面的 url
+        raise_on_error: 是否在全部处理完成后对失败的 item 统一抛出 AssertionError，否则失败的结果为异常对象
+        """
+        with self.tab_pool(size=min(size, len(items)) or 1, timeout=timeout, wait_ready=wait_ready) as pool:
+            return pool.map(items, check=check, raise_on_error=raise_on_error)
+
+    def switch_to_frame(self, frame_reference, timeout=20):
+        """
+        切换到 iframe 中（从当前 frame 进入下一层）
+        frame_reference: frame 的定位元组、name/id、索引或者 WebElement
+        timeout: 超时时间（秒）
+        """
+        current = get_frame_path(self.driver)
+        try:
+            WebDriverWait(self.driver, remaining_time(timeout)).until(
+                EC.frame_to_be_available_and_switch_to_it(frame_reference)
+            )
+        except Exception as e:
+            set_frame_path(self.driver, None)
+            raise AssertionError(f"切换到 frame {frame_reference} 失败! {e}")
+        # 只有通过定位元组进入的 frame 才能和 DeepLocator 的 frame 路径对应，其他方式进入后路径记为未知
+        set_frame_path(self.driver, current + (tuple(frame_reference),) if current is not None and isinstance(frame_reference, tuple) else None)
+
+    def switch_to_frame_path(self, frames: list, timeout=20):
+        """
+        切换到指定的 frame 路径（从最外层页面开始依次进入的 frame 定位元组），只切换和当前 frame 不同的部分
+        """
+        switch_to_frame_path(self.driver, frames, timeout)
+
+    def switch_to_parent_frame(self):
+        """切换到上一层 frame"""
+        current = get_frame_path(self.driver)
+        self.driver.switch_to.parent_frame()
+        set_frame_path(self.driver, current[:-1] if current is not None else None)
+
+    def switch_to_default_content(self):
+        """切换回最外层的页面"""
+        self.driver.switch_to.default_content()
+        set_frame_path(self.driver, ())
+
+    def _reset_context(self):
+        """页面跳转、切换窗口后会回到最外层页面：清空元素缓存和记录的 frame 路径"""
+        clear_element_cache(self.driver)
+        set_frame_path(self.driver, ())
+
+    def _find_in_shadow(self, web_element: DeepLocator, must_be_visible=False, find_all=False):
+        """在一次脚本调用中穿过所有的 shadow root 查找元素，没有找到时返回 None"""
+        return self.driver.execute_script(SHADOW_FIND_JS, list(web_element.shadow), web_element.by, web_element.value, must_be_visible, find_all)
+
+    def _in_frames(self, web_element: DeepLocator, timeout, lookup):
+        """
+        切换到 DeepLocator 所在的 frame 后执行 lookup
+        记录的 frame 路径和当前一致时不会发送切换命令，如果这个 frame 已经在 BrowserOperator 之外被重新加载或移除（NoSuchFrameException），
+        从最外层页面重新进入一次
+        """
+        switch_to_frame_path(self.driver, web_element.frames, timeout)
+        try:
+            return lookup()
+        except NoSuchFrameException:
+            if not web_element.frames:
+                raise
+            logger.warning(f"frame 路径 {list(web_element.frames)} 已经失效，从最外层页面重新进入")
+            set_frame_path(self.driver, None)
+            switch_to_frame_path(self.driver, web_element.frames, timeout)
+            return lookup()
+
+    @staticmethod
+    def _cache_key(web_element: tuple) -> tuple:
+        """元素在缓存中的 key：没有 shadow DOM 的 DeepLocator 在 frame 中按普通定位元组查找和缓存"""
+        if isinstance(web_element, DeepLocator) and not web_element.shadow:
+            return web_element.target
+        return web_element
+
+    def element_cache_stats(self) -> dict:
+        """元素缓存的命中次数、未命中次数、失效的元素数量和命中率，没有开启缓存时返回 None"""
+        return self.element_cache.stats() if self.element_cache is not None else None
+
+    def _profile_locator(self, web_element: tuple):
+        """记录当前 page 使用的定位元组，用于定位方式耗时分析"""
+        if self.locator_profiler is not None and not isinstance(web_element, DeepLocator):
+            self.locator_profiler.observe(self.driver, type(self).__qualname__, web_element)
+
+    def _run_on_element(self, web_element: tuple, element, action, timeout=20, must_be_visible=False):
+        """
+        对元素执行 action，元素来自缓存并且已经失效（页面重新渲染）时，从缓存中移除并重新查找一次再执行
+        """
+        try:
+            return action(element)
+        except StaleElementReferenceException:
+            if self.element_cache is None or not self.element_cache.discard(self._cache_key(web_element)):
+                raise
+            return action(self.element_get(web_element, timeout, must_be_visible))
+
     # ===================================================== 常用元素操作方法 start ===============================================================================
 
     def element_get(self, web_element: tuple, timeout=20, must_be_visible=False):
@@ -110,19 +385,54 @@ class BrowserOperator:
         :return: WebElement 对象
         """
         try:
-            if must_be_visible:
+            if isinstance(web_element, DeepLocator):
+                return self._in_frames(web_element, timeout, lambda: self._element_get(web_element, timeout, must_be_visible))
+            return self._element_get(web_element, timeout, must_be_visible)
+        except NoSuchFrameException as e:
+            raise AssertionError(f"查找元素 {web_element} 时报错: {e}")
+
+    def _element_get(self, web_element: tuple, timeout=20, must_be_visible=False):
+        if isinstance(web_element, DeepLocator) and not web_element.shadow:
+            # 已经在元素所在的 frame 中，没有 shadow DOM 时按普通定位查找
+            web_element = web_element.target
+        if self.element_cache is not None:
+            element = self.element_cache.get(web_element, must_be_visible)
+            if element is not None:
+                self._profile_locator(web_element)
+                return element
+        timeout = remaining_time(timeout)
+        try:
+            if isinstance(web_element, DeepLocator):
+                element = WebDriverWait(self.driver, timeout).until(
+                    lambda driver: self._find_in_shadow(web_element, must_be_visible)
+                )
+            elif self.wait_engine == "event":
+                element = self.event_waiter.wait(web_element, "visible" if must_be_visible else "present", timeout)
+            elif must_be_visible:
                 # 等待元素存在且可见
                 element = WebDriverWait(self.driver, timeout).until(
-                    EC.visibility_of_element_located(*web_element)
+                    EC.visibility_of_element_located(web_element)
                 )
             else:
                 # 等待元素存在
                 element = WebDriverWait(self.driver, timeout).until(
-                    EC.presence_of_element_located(*web_element)
+                    EC.presence_of_element_located(web_element)
                 )
+            if self.element_cache is not None:
+                self.element_cache.put(web_element, element, must_be_visible)
+            self._profile_locator(web_element)
             return element
-        except Exception:
-            raise TimeoutException(f"元素 {web_element} 在 {timeout} 秒内未找到或不可见")
+        except TimeoutException:
+            raise TimeoutException(f"元素 {web_element} 在 {timeout:.1f} 秒内未找到或不可见")
+        except NoSuchFrameException:
+            # 所在的 frame 已经失效，由 _in_frames 从最外层重新进入
+            raise
+        except Exception as e:
+            # 元素被重新渲染等可以重试的异常交给调用方的重试策略处理
+            if classify_exception(e) in self.retry_policy.retry_on:
+                raise
+            # 定位写错、窗口已关闭等错误直接抛出真实原因，不会等待完整的超时时间后再包装成超时
+            raise AssertionError(f"查找元素 {web_element} 时报错: {e}")
 
     def elements_get(self, web_element: tuple, timeout=20, must_be_visible=False):
         """
@@ -132,21 +442,66 @@ class BrowserOperator:
         :param must_be_visible: 是否要求元素可见
         :return: 包含所有匹配元素的列表
         """
+        if isinstance(web_element, DeepLocator):
+            return self._in_frames(web_element, timeout, lambda: self._elements_get(web_element, timeout, must_be_visible))
+        return self._elements_get(web_element, timeout, must_be_visible)
+
+    def _elements_get(self, web_element: tuple, timeout=20, must_be_visible=False):
+        if isinstance(web_element, DeepLocator) and not web_element.shadow:
+            web_element = web_element.target
+        timeout = remaining_time(timeout)
         try:
-            if must_be_visible:
+            if isinstance(web_element, DeepLocator):
+                elements = WebDriverWait(self.driver, timeout).until(
+                    lambda driver: self._find_in_shadow(web_element, must_be_visible, find_all=True)
+                )
+            elif must_be_visible:
                 # 等待元素存在且可见
                 elements = WebDriverWait(self.driver, timeout).until(
-                    EC.visibility_of_all_elements_located(*web_element)
+                    EC.visibility_of_all_elements_located(web_element)
                 )
             else:
                 # 等待元素存在
                 elements = WebDriverWait(self.driver, timeout).until(
-                    EC.presence_of_all_elements_located(*web_element)
+                    EC.presence_of_all_elements_located(web_element)
                 )
+            self._profile_locator(web_element)
             return elements
+        except NoSuchFrameException:
+            raise
         except Exception:
             raise TimeoutException(f"元素 {web_element} 在 {timeout} 秒内未找到或不可见")
 
+    def elements_resolve_many(self, web_elements: dict, timeout=20, must_be_visible=False, raise_on_missing=True) -> dict:
+        """
+        一次浏览器往返查找多个元素，只对还没有找到的元素继续等待
+        :param web_elements: {名称: 定位元组}，如 {"user": (By.ID, "user"), "submit": (By.XPATH, "//button")}
+        :param timeout: 超时时间（秒）
+        :param must_be_visible: 是否要求元素可见
+        :param raise_on_missing: 超时后仍有元素没有找到时是否抛出异常，为 False 时只返回找到的元素
+        :return: {名称: {"element": WebElement, "visible": bool, "text": str, "value": str}}
+        """
+        resolved = {}
+        pending = {name: list(locator) for name, locator in web_elements.items()}
+        timeout = remaining_time(timeout)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                found = self.driver.execute_script(RESOLVE_MANY_JS, pending)
+            except Exception as e:
+                raise AssertionError(f"批量查找元素时报错: {e}")
+            for name, info in found.items():
+                if info["visible"] or not must_be_visible:
+                    resolved[name] = info
+                    pending.pop(name)
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        if pending and raise_on_missing:
+            missing = {name: tuple(locator) for name, locator in pending.items()}
+            raise TimeoutException(f"元素 {missing} 在 {timeout:.1f} 秒内未找到或不可见")
+        return resolved
+
     def element_wait_for_display(self, web_element: tuple, timeout=20) -> bool:
         """
         等待元素显示
@@ -155,8 +510,14 @@ class BrowserOperator:
         :return: WebElement 对象
         """
         try:
+            if isinstance(web_element, DeepLocator):
+                self.element_get(web_element, timeout, must_be_visible=True)
+                return True
+            if self.wait_engine == "event":
+                self.event_waiter.wait(web_element, "visible", timeout)
+                return True
             WebDriverWait(self.driver, timeout).until(
-                EC.visibility_of_element_located(*web_element)
+                EC.visibility_of_element_located(web_element)
             )
             return True
         except TimeoutException:
@@ -172,8 +533,17 @@ class BrowserOperator:
         :param timeout: 超时时间（秒）
         """
         try:
+            if isinstance(web_element, DeepLocator):
+                if web_element.shadow:
+                    gone = lambda driver: not self._find_in_shadow(web_element, must_be_visible=True)
+                else:
+                    gone = EC.invisibility_of_element_located(web_element.target)
+                self._in_frames(web_element, timeout, lambda: WebDriverWait(self.driver, remaining_time(timeout)).until(gone))
+                return True
+            if self.wait_engine == "event":
+                return self.event_waiter.wait(web_element, "gone", timeout)
             WebDriverWait(self.driver, timeout).until(
-                EC.invisibility_of_element_located(*web_element)
+                EC.invisibility_of_element_located(web_element)
             )
             return True
         except TimeoutException:
@@ -184,30 +554,43 @@ class BrowserOperator:
 
     def element_click(self, web_element: tuple, timeout=20):
         """
-        点击元素
+        点击元素，元素被重新渲染、被遮挡或者暂时不可交互时在 timeout 内重试（参考 retry_policy）
         web_element: 定位元组，如 (By.ID, "element_id")
-        timeout: 超时时间（秒）
+        timeout: 超时时间（秒），包括所有重试的时间
         """
-        timeout = int(timeout / 2)  # 缩小等待时间，分成两种方式的等待，增加正确率
-        try:
-            element = WebDriverWait(self.driver, timeout).until(
-                EC.element_to_be_clickable(*web_element)
-            )
-            element.click()
-        except Exception as e:
-            time.sleep(1)
-            logger.error(f"点击元素时发生错误， 进行重试: {str(e)}")
-            element = self.element_get(web_element=web_element, timeout=timeout)
+        def click():
+            if isinstance(web_element, DeepLocator):
+                # 跨 frame / shadow DOM 的元素先切换 frame 并查找元素，再等待元素可以点击
+                target = self.element_get(web_element, remaining_time(timeout), must_be_visible=True)
+                cached = target if self.element_cache is not None else None
+            else:
+                cached = self.element_cache.get(web_element, must_be_visible=True) if self.element_cache is not None else None
+                target = cached or web_element
             try:
+                element = WebDriverWait(self.driver, remaining_time(timeout)).until(
+                    EC.element_to_be_clickable(target)
+                )
+                self._profile_locator(web_element)  # 点击后页面可能跳转，在点击之前分析
                 element.click()
-            except Exception as e:
-                raise AssertionError(f"点击元素时发生错误: {str(e)}")
+            except StaleElementReferenceException:
+                # 缓存的元素已经失效，移除后由重试策略重新查找
+                if cached is not None:
+                    self.element_cache.discard(self._cache_key(web_element))
+                raise
+            # 点击可能触发页面跳转，下一次查找时检查文档是否变化（前端重新渲染的元素由失效重试处理）
+            invalidate_element_cache(self.driver)
+
+        try:
+            self.retry_policy.run(click, timeout, f"点击元素 {web_element} ")
+        except TimeoutException:
+            raise AssertionError(f"元素 {web_element} 在 {timeout} 秒内不可点击")
+        except Exception as e:
+            raise AssertionError(f"点击元素时发生错误: {str(e)}")
 
     def element_double_click(self, web_element: tuple, timeout=20):
         element = self.element_get(web_element=web_element, timeout=timeout)
         try:
-            actions = ActionChains(self.driver)
-            actions.double_click(element).perform()
+            self._run_on_element(web_element, element, lambda el: ActionChains(self.driver).double_click(el).perform(), timeout)
         except Exception as e:
             raise AssertionError(f"双击元素失败: {str(e)}")
 
@@ -219,8 +602,7 @@ class BrowserOperator:
         clear_first (bool): 是否先清空输入框，默认True
         check (bool): 验证输入结果，默认False
         """
-        element = self.element_get(web_element, timeout)
-        try:
+        def fill(element):
             if value == "":
                 element.clear()
                 return
@@ -231,9 +613,127 @@ class BrowserOperator:
                 actual_value = element.get_attribute("value")
                 if actual_value != value:
                     raise AssertionError(f"向元素{web_element}中输入内容时失败！")
+
+        element = self.element_get(web_element, timeout)
+        try:
+            self._run_on_element(web_element, element, fill, timeout)
         except Exception as e:
             raise AssertionError(f"向元素{web_element}中输入内容时报错: {str(e)}")
 
+    def fill_form(self, fields: dict, timeout=20, check=True, keystrokes=()):
+        """
+        一次脚本调用填写整个表单：通过原生 setter 赋值并触发 input/change 事件（兼容 React/Vue/Angular 的数据绑定），
+        并在同一次调用中校验所有字段的值，代替逐个字段调用 element_fill_value（每个字段 3~4 次浏览器往返）
+        fields: {定位元组: 值}，复选框/单选框的值为 bool，多选下拉框的值为 list，下拉框的值可以是 option 的 value 或者文本
+        timeout: 等待字段出现的超时时间（秒）
+        check: 是否校验填写后的值
+        keystrokes: 需要真实键盘输入的字段（定位元组），如监听按键的自动补全输入框，这些字段在其他字段之后通过 element_fill_value 逐个输入
+        """
+        keystroke_fields = {tuple(locator) for locator in keystrokes}
+        pending = {tuple(locator): self._form_value(value) for locator, value in fields.items() if tuple(locator) not in keystroke_fields}
+        mismatched = {}
+        timeout = remaining_time(timeout)
+        deadline = time.monotonic() + timeout
+        while pending:
+            items = list(pending.items())
+            try:
+                results = self.driver.execute_script(FILL_FORM_JS, [[locator[0], locator[1], value] for locator, value in items])
+            except Exception as e:
+                raise AssertionError(f"批量填写表单时报错: {e}")
+            for (locator, value), result in zip(items, results):
+                if not result["found"]:
+                    continue
+                pending.pop(locator)
+                if check and not result["ok"]:
+                    mismatched[locator] = (value, result["actual"])
+            # 还没有出现的字段（如选择某一项后才显示的字段）继续等待
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        if pending:
+            raise TimeoutException(f"元素 {list(pending)} 在 {timeout:.1f} 秒内未找到")
+        for locator, value in fields.items():
+            if tuple(locator) in keystroke_fields:
+                self.element_fill_value(locator, value, timeout, check=check)
+        if mismatched:
+            details = ", ".join(f"{locator}: 期望 {expected!r} 实际 {actual!r}" for locator, (expected, actual) in mismatched.items())
+            raise AssertionError(f"填写表单后校验失败！{details}")
+
+    def read_form(self, fields: list, timeout=20) -> dict:
+        """
+        一次脚本调用读取多个字段的值
+        fields: 定位元组列表
+        timeout: 等待字段出现的超时时间（秒）
+        :return: {定位元组: 值}，复选框/单选框的值为 bool，多选下拉框的值为 list，其他字段为 value 或者文本
+        """
+        pending = [tuple(locator) for locator in fields]
+        values = {}
+        timeout = remaining_time(timeout)
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                results = self.driver.execute_script(READ_FORM_JS, [list(locator) for locator in pending])
+            except Exception as e:
+                raise AssertionError(f"批量读取表单时报错: {e}")
+            for locator, result in zip(pending, results):
+                if result["found"]:
+                    values[locator] = result["value"]
+            pending = [locator for locator in pending if locator not in values]
+            if not pending or time.monotonic() >= deadline:
+                break
+            time.sleep(0.1)
+        if pending:
+            raise TimeoutException(f"元素 {pending} 在 {timeout:.1f} 秒内未找到")
+        return {tuple(locator): values[tuple(locator)] for locator in fields}
+
+    @staticmethod
+    def _form_value(value):
+        """表单字段的值转换为页面中使用的类型：bool 保持不变，列表中的值和其他值转换为字符串"""
+        if isinstance(value, bool):
+            return value
+        if isinstance(value, (list, tuple, set)):
+            return [str(item) for item in value]
+        return "" if value is None else str(value)
+
+    def extract_table(self, web_element: tuple, columns: list = None, row_selector: str = None, cell_selector: str = None,
+                      timeout=20, chunk_size: int = 0) -> list:
+        """
+        在页面中把表格/列表序列化后一次返回，代替 elements_get 之后逐个单元格获取 .text（每个单元格一次浏览器往返）
+        web_element: 表格或者列表容器的定位元组
+        columns: 需要的列（表头文本或者列的索引），为 None 时返回所有列
+        row_selector: 行的 css 选择器，默认 <table> 取 tbody 中的行，其他元素取 role=row 的元素或者子元素
+        cell_selector: 单元格的 css 选择器，默认 <td>/<th>、role=cell 的元素或者行的子元素
+        timeout: 等待表格出现的超时时间（秒）
+        chunk_size: 每次浏览器往返读取的行数，0 表示一次读取全部，很大的表格可以分块读取避免单次响应过大
+        :return: 有列名（columns 或者表头）时每行为 {列名: 单元格文本}，否则每行为 [单元格文本]
+        """
+        rows = []
+        for chunk in self.extract_table_chunks(web_element, columns, row_selector, cell_selector, timeout, chunk_size):
+            rows.extend(chunk)
+        return rows
+
+    def extract_table_chunks(self, web_element: tuple, columns: list = None, row_selector: str = None, cell_selector: str = None,
+                             timeout=20, chunk_size: int = 500):
+        """
+        分块读取表格，每次浏览器往返读取 chunk_size 行并返回这一块的行（参数和返回的行格式参考 extract_table）
+        """
+        table = self.element_get(web_element, timeout)
+        start = 0
+        while True:
+            try:
+                result = self._run_on_element(web_element, table, lambda el: self.driver.execute_script(
+                    TABLE_JS, el, row_selector, cell_selector, columns, start, chunk_size), timeout)
+            except Exception as e:
+                raise AssertionError(f"提取表格 {web_element} 的数据时报错: {e}")
+            if result.get("error"):
+                raise AssertionError(f"提取表格 {web_element} 的数据失败: {result['error']}，表头: {result['headers']}")
+            keys = columns or result["headers"]
+            if result["rows"]:
+                yield [dict(zip(keys, row)) for row in result["rows"]] if keys else result["rows"]
+            start += len(result["rows"])
+            if not chunk_size or not result["rows"] or start >= result["total"]:
+                break
+
     def element_scroll_to(self, web_element: tuple, timeout=20):
         """
         滑动到指定元素位置（元素可见时停止）
@@ -243,7 +743,8 @@ class BrowserOperator:
         element = self.element_get(web_element, timeout)
         try:
             # 使用 JavaScript 直接滚动到元素位置
-            self.driver.execute_script("arguments[0].scrollIntoView({behavior: 'smooth', block: 'center', inline: 'bearest'});", element)
+            self._run_on_element(web_element, element, lambda el: self.driver.execute_script(
+                "arguments[0].scrollIntoView({behavior: 'smooth', block: 'center', inline: 'bearest'});", el), timeout)
         except Exception as e:
             raise AssertionError(f"滑动到指定元素位置失败！{e}")
 
@@ -263,7 +764,7 @@ class BrowserOperator:
                     key = getattr(Keys, key)  # 转换为 Keys 枚举（如 Keys.ENTER）
                 else:
                     logger.error(f"'{key}'不是标准的按键常量，将作为字符串发送")
-            element.send_keys(key)
+            self._run_on_element(web_element, element, lambda el: el.send_keys(key), timeout)
         except Exception as e:
             raise AssertionError(f"元素{web_element}触发时报错: {str(e)}")
 
@@ -272,21 +773,19 @@ class BrowserOperator:
         获取元素的属性值
         web_element (tuple): 元素定位器，格式为 (By.<strategy>, "locator_value")
         attribute (str): 要获取的属性名（如 "value", "class", "href" 等）
-        timeout (int): 每次尝试查找元素的超时时间（秒），默认5秒
+        timeout (int): 超时时间（秒），包括元素被重新渲染后重新查找的时间，默认5秒
         """
-        for _ in range(3):
-            try:
-                element = self.element_get(web_element, timeout)
-                value = element.get_attribute(attribute)
-                if value is None or value == "":
-                    return None
-                return value
-            except Exception:
-                time.sleep(0.5)
-                continue
-        # 部分情况下没有指定的attribute也是一种期望的结果，表明前段元素处于正确的状态
-        logger.error(f"{web_element} 没有发现指定的 {attribute}")
-        return None
+        try:
+            value = self.retry_policy.run(lambda: self._run_on_element(web_element, self.element_get(web_element, timeout),
+                                                                       lambda el: el.get_attribute(attribute), timeout),
+                                          timeout, f"获取元素 {web_element} 的 {attribute} ")
+        except Exception:
+            # 部分情况下没有指定的attribute也是一种期望的结果，表明前段元素处于正确的状态
+            logger.error(f"{web_element} 没有发现指定的 {attribute}")
+            return None
+        if value is None or value == "":
+            return None
+        return value
 
     def element_upload(self, web_element: tuple, file_path: str, timeout: int = 20):
         """
@@ -301,36 +800,96 @@ class BrowserOperator:
         absolute_path = os.path.abspath(file_path)
         # 定位元素
         element = self.element_get(web_element, timeout)
-        if element.get_attribute("type") != "file":
+        if self._run_on_element(web_element, element, lambda el: el.get_attribute("type"), timeout) != "file":
             raise AssertionError(f"该元素不是正确的文件输入框: {web_element}")
         try:
-            element.send_keys(absolute_path)
+            self._run_on_element(web_element, element, lambda el: el.send_keys(absolute_path), timeout)
         except Exception as e:
             raise AssertionError(f"上传文件错误！{e}")
 
-    def element_save_image(self, web_element: tuple, image_file_name, timeout: int = 20):
+    def get_download_dir(self) -> str:
+        """当前浏览器会话的下载目录 download/<worker>/<会话编号>（每个浏览器独立，浏览器池中的浏览器每次被取用时都是新的空目录）"""
+        return get_session_download_dir(self.driver)
+
+    def expect_download(self, timeout: float = 60, count: int = 1) -> DownloadWatcher:
+        """
+        等待 with 中的操作触发的下载完成，不需要固定等待或者轮询下载目录：
+
+            with self.expect_download() as download:
+                self.element_click(self.EXPORT_BUTTON)
+            logger.info(f"下载完成: {download.path}, {download.size} 字节")
+        timeout: 退出 with 后等待下载完成的超时时间（秒），超时抛出 TimeoutException
+        count: 需要等待的文件数量，所有文件保存在 download.downloads 中
+        """
+        return DownloadWatcher(self.get_download_dir(), timeout=timeout, count=count)
+
+    def element_save_image(self, web_element: tuple, image_file_name, timeout: int = 20, wait: bool = False) -> Future:
         """
         element (WebElement): 要截图的 Selenium WebElement 对象
         image_file_name (str): 保存的图片路径 包含文件名（支持 .png/.jpg/.jpeg）
+        wait: 是否等待图片写入完成；默认只在当前线程中取回截图，转码和写入由后台的 screenshot_service 完成
+        返回写入完成后得到图片路径的 Future，所有截图会在 pytest 会话结束前写入完成
         """
         ext = os.path.splitext(image_file_name)[1].lower()
         if ext not in (".png", ".jpg", ".jpeg"):
             raise ValueError("图片名称必须以： .png, .jpg, or .jpeg 结尾")
-        os.makedirs(os.path.dirname(image_file_name), exist_ok=True)
 
         element = self.element_get(web_element, timeout)
         try:
-            # 获取元素截图（返回二进制数据）
-            element_screenshot = element.screenshot_as_png
-            if ext == ".png":
-                with open(image_file_name, "wb") as f:
-                    f.write(element_screenshot)
-            else:
-                img = Image.open(io.BytesIO(element_screenshot))
-                img.save(image_file_name)
+            # 获取元素截图（支持 CDP 时只截取元素所在的区域，并由浏览器直接编码为目标格式）
+            future = self._run_on_element(web_element, element, lambda el: screenshot_service.capture(self.driver, image_file_name, el), timeout)
+            if wait:
+                future.result()
+            return future
         except Exception as e:
             raise AssertionError(f"保存元素 {web_element} 失败！{e}")
 
+    def assert_visual_match(self, locator_or_page, baseline: str, ignore=(), ssim_threshold: float = None, timeout: int = 20) -> dict:
+        """
+        比较元素（或者整个窗口）的截图和基准图，不一致时生成差异图并抛出 AssertionError
+        locator_or_page: 元素的定位元组，为 None 时截取整个窗口
+        baseline: 基准图名称（可以包含 / 分组，如 "login/header"），保存在 visual_baseline 目录下；
+                  基准图不存在或者开启了 --update-visual-baseline 时，本次截图会保存为新的基准图
+        ignore: 比较时忽略的区域，可以是定位元组（如时间、验证码等动态内容）或者截图中的像素区域 (x, y, 宽, 高)
+        ssim_threshold: 每个分块的 SSIM 阈值，默认使用 visual_comparator 的设置
+        返回比较结果，参考 VisualComparator.compare
+        """
+        element = None if locator_or_page is None else self.element_get(locator_or_page, timeout)
+        try:
+            image = decode_image(screenshot_service.grab(self.driver, element))
+        except Exception as e:
+            raise AssertionError(f"获取 {locator_or_page or '页面'} 的截图失败！{e}")
+
+        regions = [region for region in ignore if not isinstance(region[0], str)]
+        ignored_elements = [found for region in ignore if isinstance(region[0], str) for found in self.driver.find_elements(*region)]
+        if ignored_elements:
+            rects = self.driver.execute_script(VISUAL_RECTS_JS, element, ignored_elements)
+            target = rects["target"]
+            # 截图是设备像素，页面中的位置是 CSS 像素
+            scale = image.shape[1] / target["width"] if target["width"] else 1
+            regions.extend(((rect["x"] - target["x"]) * scale, (rect["y"] - target["y"]) * scale, rect["width"] * scale, rect["height"] * scale)
+                           for rect in rects["ignore"])
+
+        expected = baseline_store.load(baseline)
+        if expected is None or visual_update_enabled():
+            path = baseline_store.save(baseline, image)
+            logger.warning(f"基准图 {baseline} {'已更新' if expected is not None else '不存在，已保存本次截图'}: {path}")
+            return {"passed": True, "baseline_saved": path}
+
+        comparator = visual_comparator if ssim_threshold is None else VisualComparator(
+            visual_comparator.tile_size, ssim_threshold, visual_comparator.pixel_tolerance, visual_comparator.tile_tolerance)
+        result = comparator.compare(expected, image, regions)
+        if result["passed"]:
+            return result
+        diff_path = os.path.join(get_worker_path(os.path.join(get_current_project_path(), "visual_diff")), *baseline.split("/")) + ".diff.png"
+        os.makedirs(os.path.dirname(diff_path), exist_ok=True)
+        Image.fromarray(render_diff(expected, image, result)).save(diff_path)
+        result["diff_image"] = diff_path
+        if result["size_mismatch"]:
+            raise AssertionError(f"{locator_or_page or '页面'} 与基准图 {baseline} 的尺寸不一致: {result['current_size']} != {result['baseline_size']}，差异图: {diff_path}")
+        raise AssertionError(f"{locator_or_page or '页面'} 与基准图 {baseline} 不一致: {result['failed_tiles']}/{result['total_tiles']} 个分块不一致，"
+                             f"最低 SSIM {result['min_ssim']}，差异图: {diff_path}")
+
     def element_move_mouse_to(self, web_element: tuple, timeout=20):
         """
         将鼠标移动到指定元素中心位置
@@ -339,7 +898,7 @@ class BrowserOperator:
         """
         element = self.element_get(web_element, timeout)
         try:
-            ActionChains(self.driver).move_to_element(element).perform()
+            self._run_on_element(web_element, element, lambda el: ActionChains(self.driver).move_to_element(el).perform(), timeout)
         except Exception as e:
             raise AssertionError(f"将鼠标移动到指定元素中心位置失败！{e}")
 
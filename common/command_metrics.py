@@ -0,0 +1,260 @@
+import bisect
+import heapq
+import json
+import os
+import sys
+import threading
+import time
+from pathlib import Path
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from utils.common_utils import get_worker_id
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 延迟直方图的分桶上限（毫秒），最后一个桶记录超过 10 秒的命令
+HISTOGRAM_BUCKETS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# 发出命令的 BrowserOperator 方法通过调用栈中 browser_operation.py 的栈帧识别
+OPERATION_FILE = "browser_operation.py"
+
+
+def command_metrics_enabled() -> bool:
+    """是否开启 WebDriver 命令统计，由 run.py 的 --command-metrics 通过环境变量 TEST_COMMAND_METRICS（输出目录）开启"""
+    return bool(os.environ.get("TEST_COMMAND_METRICS"))
+
+
+def caller_operation() -> str:
+    """
+    获取发出当前命令的 BrowserOperator 方法名，方法之间互相调用时（如 element_click 调用 element_get）取最外层的方法
+    不是通过 BrowserOperator 发出的命令（如 conftest 中直接调用 driver）返回 "-"
+    """
+    frame = sys._getframe(1)
+    method = None
+    while frame is not None:
+        if os.path.basename(frame.f_code.co_filename) == OPERATION_FILE:
+            method = frame.f_code.co_name
+        frame = frame.f_back
+    return method or "-"
+
+
+class LatencyStats:
+    """一组命令的耗时统计：次数、总耗时、最大耗时、失败次数和延迟直方图"""
+
+    def __init__(self):
+        self.count = 0
+        self.total = 0.0
+        self.max = 0.0
+        self.errors = 0
+        self.buckets = [0] * (len(HISTOGRAM_BUCKETS) + 1)
+
+    def add(self, duration_ms, ok=True):
+        self.count += 1
+        self.total += duration_ms
+        self.max = max(self.max, duration_ms)
+        if not ok:
+            self.errors += 1
+        self.buckets[bisect.bisect_left(HISTOGRAM_BUCKETS, duration_ms)] += 1
+
+    def merge(self, data: dict):
+        """合并 to_dict 导出的统计数据（用于合并多个 worker 的结果）"""
+        self.count += data["count"]
+        self.total += data["total_ms"]
+        self.max = max(self.max, data["max_ms"])
+        self.errors += data["errors"]
+        self.buckets = [a + b for a, b in zip(self.buckets, data["histogram"].values())]
+
+    def percentile(self, q):
+        """根据直方图估算分位数（返回所在分桶的上限，超过最后一个分桶时返回最大耗时）"""
+        if not self.count:
+            return 0.0
+        target = q * self.count
+        seen = 0
+        for index, count in enumerate(self.buckets):
+            seen += count
+            if seen >= target:
+                return float(HISTOGRAM_BUCKETS[index]) if index < len(HISTOGRAM_BUCKETS) else self.max
+        return self.max
+
+    def to_dict(self):
+        labels = [f"<={bucket}ms" for bucket in HISTOGRAM_BUCKETS] + [f">{HISTOGRAM_BUCKETS[-1]}ms"]
+        return {
+            "count": self.count,
+            "total_ms": round(self.total, 3),
+            "mean_ms": round(self.total / self.count, 3) if self.count else 0.0,
+            "max_ms": round(self.max, 3),
+            "p50_ms": self.percentile(0.5),
+            "p90_ms": self.percentile(0.9),
+            "p99_ms": self.percentile(0.99),
+            "errors": self.errors,
+            "histogram": dict(zip(labels, self.buckets)),
+        }
+
+
+class CommandMetrics:
+    """
+    WebDriver 命令统计：记录每个命令的名称、耗时和结果，并标记所属的 case 和发出命令的 BrowserOperator 方法
+    提供每个 case / 整个运行的延迟直方图、浏览器往返次数以及最慢的 top_n 个命令
+    """
+
+    def __init__(self, top_n=20):
+        self.top_n = top_n
+        self.current_test = None
+        self.run = LatencyStats()
+        self.commands = {}
+        self.methods = {}
+        self.tests = {}
+        self.slowest = []
+        self._sequence = 0
+        self._lock = threading.Lock()
+
+    def begin_test(self, nodeid):
+        """开始统计一个 case，之后所有驱动发出的命令都计入这个 case（同一个进程中同一时间只执行一个 case）"""
+        self.current_test = nodeid
+
+    def end_test(self):
+        """结束当前 case 的统计，返回这个 case 的统计结果，没有发出任何命令时返回 None"""
+        nodeid, self.current_test = self.current_test, None
+        return self.test_summary(nodeid)
+
+    def record(self, command, duration_ms, outcome="ok", method="-"):
+        test = self.current_test or "-"
+        ok = outcome == "ok"
+        with self._lock:
+            self.run.add(duration_ms, ok)
+            self.commands.setdefault(command, LatencyStats()).add(duration_ms, ok)
+            self.methods.setdefault(method, LatencyStats()).add(duration_ms, ok)
+            test_stats = self.tests.setdefault(test, {"stats": LatencyStats(), "commands": {}, "slowest": []})
+            test_stats["stats"].add(duration_ms, ok)
+            test_stats["commands"].setdefault(command, LatencyStats()).add(duration_ms, ok)
+            self._sequence += 1
+            entry = (duration_ms, self._sequence, {"command": command, "duration_ms": round(duration_ms, 3),
+                                                    "outcome": outcome, "method": method, "test": test})
+            # 只保留最慢的 top_n 个命令（小顶堆）
+            for heap in (self.slowest, test_stats["slowest"]):
+                if len(heap) < self.top_n:
+                    heapq.heappush(heap, entry)
+                elif duration_ms > heap[0][0]:
+                    heapq.heapreplace(heap, entry)
+
+    def test_summary(self, nodeid):
+        with self._lock:
+            test_stats = self.tests.get(nodeid)
+            if test_stats is None:
+                return None
+            return {
+                "test": nodeid,
+                "round_trips": test_stats["stats"].count,
+                "latency": test_stats["stats"].to_dict(),
+                "commands": {name: stats.to_dict() for name, stats in test_stats["commands"].items()},
+                "slowest": [entry[2] for entry in sorted(test_stats["slowest"], reverse=True)],
+            }
+
+    def to_dict(self):
+        with self._lock:
+            return {
+                "worker": get_worker_id(),
+                "round_trips": self.run.count,
+                "latency": self.run.to_dict(),
+                "commands": {name: stats.to_dict() for name, stats in self.commands.items()},
+                "methods": {name: stats.to_dict() for name, stats in self.methods.items()},
+                "tests": {nodeid: {"round_trips": value["stats"].count, "latency": value["stats"].to_dict()}
+                          for nodeid, value in self.tests.items()},
+                "slowest": [entry[2] for entry in sorted(self.slowest, reverse=True)],
+            }
+
+    def save(self, report_dir):
+        """写入 report_dir/<worker>.json，没有记录任何命令时不写入"""
+        if not self.run.count:
+            return None
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        path = report_dir / f"{get_worker_id()}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(self.to_dict(), f, indent=4, ensure_ascii=False)
+        return path
+
+    @staticmethod
+    def merge_reports(report_dir, top_n=20) -> dict:
+        """合并所有 worker 的统计结果，作为整个运行的统计（忽略之前合并生成的 summary.json）"""
+        run, commands, methods, tests, slowest, workers = LatencyStats(), {}, {}, {}, [], []
+        for path in sorted(Path(report_dir).glob("*.json")):
+            if path.name == "summary.json":
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            workers.append(data["worker"])
+            run.merge(data["latency"])
+            for target, source in ((commands, data["commands"]), (methods, data["methods"])):
+                for name, stats in source.items():
+                    target.setdefault(name, LatencyStats()).merge(stats)
+            tests.update(data["tests"])
+            slowest.extend(data["slowest"])
+        return {
+            "generated": time.time(),
+            "workers": workers,
+            "round_trips": run.count,
+            "latency": run.to_dict(),
+            "commands": {name: stats.to_dict() for name, stats in sorted(commands.items(), key=lambda item: -item[1].total)},
+            "methods": {name: stats.to_dict() for name, stats in sorted(methods.items(), key=lambda item: -item[1].total)},
+            "tests": tests,
+            "slowest": sorted(slowest, key=lambda entry: -entry["duration_ms"])[:top_n],
+        }
+
+    @staticmethod
+    def format_summary(summary: dict) -> str:
+        """将统计结果格式化为文本表格（用于 allure 附件和日志）"""
+        latency = summary["latency"]
+        lines = [f"round trips: {summary['round_trips']}  total: {latency['total_ms']:.1f}ms  mean: {latency['mean_ms']:.1f}ms  "
+                 f"p50: {latency['p50_ms']}ms  p90: {latency['p90_ms']}ms  p99: {latency['p99_ms']}ms  errors: {latency['errors']}",
+                 "", "latency histogram:"]
+        peak = max(latency["histogram"].values(), default=0) or 1
+        for label, count in latency["histogram"].items():
+            lines.append(f"    {label:>10} {count:>7} {'#' * int(40 * count / peak)}")
+        lines += ["", f"{'command':<32} {'count':>7} {'total(ms)':>12} {'mean(ms)':>10} {'max(ms)':>10} {'errors':>7}"]
+        for name, stats in sorted(summary["commands"].items(), key=lambda item: -item[1]["total_ms"]):
+            lines.append(f"{name:<32} {stats['count']:>7} {stats['total_ms']:>12.1f} {stats['mean_ms']:>10.1f} {stats['max_ms']:>10.1f} {stats['errors']:>7}")
+        lines += ["", f"slowest {len(summary['slowest'])} commands:"]
+        for entry in summary["slowest"]:
+            lines.append(f"    {entry['duration_ms']:>10.1f}ms  {entry['command']:<28} {entry['method']:<28} {entry['outcome']:<12} {entry['test']}")
+        return "\n".join(lines)
+
+
+# 进程内共享的统计实例，所有开启统计的驱动都记录到这里
+command_metrics = CommandMetrics()
+
+
+def install_command_metrics(driver: WebDriver, metrics: CommandMetrics = None) -> WebDriver:
+    """
+    给驱动的命令执行器（RemoteConnection）加上耗时统计，驱动发出的每个命令（包括 execute_cdp_cmd）都会被记录
+    只替换执行器实例上的 execute 方法，不改变执行器的类型，CDP / BiDi 等依赖 RemoteConnection 类型检查的功能不受影响
+    """
+    executor = driver.command_executor
+    if getattr(executor, "_command_metrics", None) is not None:
+        return driver
+    metrics = metrics or command_metrics
+    original_execute = executor.execute
+
+    def execute(command, params):
+        method = caller_operation()
+        start = time.perf_counter()
+        try:
+            response = original_execute(command, params)
+        except Exception as e:
+            metrics.record(command, (time.perf_counter() - start) * 1000, type(e).__name__, method)
+            raise
+        duration_ms = (time.perf_counter() - start) * 1000
+        # W3C 协议的错误通过响应中的 value.error 返回，之后才由 ErrorHandler 转换为异常
+        value = response.get("value") if isinstance(response, dict) else None
+        outcome = value["error"] if isinstance(value, dict) and value.get("error") else "ok"
+        metrics.record(command, duration_ms, outcome, method)
+        return response
+
+    executor.execute = execute
+    executor._command_metrics = metrics
+    return driver
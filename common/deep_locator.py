@@ -0,0 +1,100 @@
+from selenium.common import TimeoutException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+from common.element_cache import clear_element_cache
+from common.retry_policy import remaining_time
+
+
+class DeepLocator(tuple):
+    """
+    跨 iframe 和 shadow DOM 的定位元组：(by, value, frames, shadow)
+        frames: 从最外层页面开始依次进入的 iframe 的定位元组
+        shadow: 进入 frame 之后依次穿过的 shadow host 的 css 选择器，最后在最内层的 shadow root 中按 (by, value) 查找
+    可以和普通的定位元组一样传给 BrowserOperator 的元素操作方法，不需要在 page 中手动切换 frame
+
+        TOTAL = DeepLocator(By.CSS_SELECTOR, ".total", frames=[(By.ID, "main"), (By.NAME, "invoice")], shadow=["invoice-view", "price-box"])
+    """
+
+    def __new__(cls, by, value, frames=(), shadow=()):
+        return super().__new__(cls, (by, value, tuple(tuple(frame) for frame in frames), tuple(shadow)))
+
+    @property
+    def by(self):
+        return self[0]
+
+    @property
+    def value(self):
+        return self[1]
+
+    @property
+    def frames(self) -> tuple:
+        return self[2]
+
+    @property
+    def shadow(self) -> tuple:
+        return self[3]
+
+    @property
+    def target(self) -> tuple:
+        """在最内层 frame / shadow root 中使用的普通定位元组"""
+        return self[0], self[1]
+
+    def __repr__(self):
+        return f"DeepLocator(frames={list(self.frames)}, shadow={list(self.shadow)}, target={self.target})"
+
+
+def get_frame_path(driver: WebDriver):
+    """当前所在的 frame 路径（从最外层开始的 frame 定位元组），() 表示在最外层页面，None 表示未知"""
+    return getattr(driver, "_frame_path", ())
+
+
+def set_frame_path(driver: WebDriver, frames):
+    """记录当前所在的 frame 路径，frame 发生变化时清空元素缓存"""
+    if get_frame_path(driver) != frames:
+        clear_element_cache(driver)
+    driver._frame_path = None if frames is None else tuple(frames)
+
+
+def switch_to_frame_path(driver: WebDriver, frames: tuple, timeout=20):
+    """
+    切换到 frames 对应的 frame，只切换和当前 frame 路径不同的部分：
+    当前已经在目标 frame 中时不发送任何命令；需要返回上层时，在 逐层 parent_frame 和 回到最外层后重新进入公共的部分 之间选择命令较少的一种
+    记录的路径已经失效（如页面跳转后 frame 不存在了）时，从最外层页面重新进入
+    """
+    frames = tuple(frames)
+    current = get_frame_path(driver)
+    if current == frames:
+        return
+    try:
+        _switch(driver, current, frames, timeout)
+    except TimeoutException:
+        raise
+    except WebDriverException:
+        set_frame_path(driver, None)
+        _switch(driver, None, frames, timeout)
+
+
+def _switch(driver: WebDriver, current, frames, timeout):
+    common = 0
+    if current is not None:
+        while common < min(len(current), len(frames)) and current[common] == frames[common]:
+            common += 1
+    up = len(current) - common if current is not None else 0
+    # 进入一层 frame 需要查找 + 切换两个命令，返回上一层只需要一个命令
+    if current is None or up > 1 + 2 * common:
+        driver.switch_to.default_content()
+        common = 0
+    else:
+        for _ in range(up):
+            driver.switch_to.parent_frame()
+    set_frame_path(driver, frames[:common])
+    for index in range(common, len(frames)):
+        wait_time = remaining_time(timeout)
+        try:
+            WebDriverWait(driver, wait_time).until(EC.frame_to_be_available_and_switch_to_it(frames[index]))
+        except TimeoutException:
+            set_frame_path(driver, None)
+            raise TimeoutException(f"frame {frames[index]} 在 {wait_time:.1f} 秒内未找到")
+        set_frame_path(driver, frames[:index + 1])
@@ -0,0 +1,244 @@
+import ctypes
+import ctypes.util
+import os
+import re
+import select
+import shutil
+import sys
+import time
+import uuid
+
+from selenium.common import TimeoutException
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from utils.common_utils import get_worker_path
+from utils.file_utils import get_current_project_path
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 浏览器下载过程中使用的临时文件（Chrome/Edge: .crdownload，Firefox: .part），重命名为最终文件名后才算下载完成
+TEMP_SUFFIXES = (".crdownload", ".part", ".tmp", ".download")
+TEMP_PREFIXES = (".com.google.Chrome", ".org.chromium.Chromium", "~$")
+
+# inotify 事件：创建、写入完成、移入（临时文件重命名）、删除、移出
+_IN_EVENTS = 0x00000100 | 0x00000008 | 0x00000080 | 0x00000200 | 0x00000040
+
+
+# 会话下载目录的名称（create_session_download_dir 生成的会话编号）
+_SESSION_DIR_NAME = re.compile(r"^[0-9a-f]{12}$")
+_swept = False
+
+
+def create_session_download_dir() -> str:
+    """
+    为一个浏览器会话创建独立的下载目录：download/<worker>/<会话编号>，多个浏览器的下载文件互不干扰
+    浏览器退出或者启动失败时删除（参考 attach_session_download_dir），进程中第一次创建时清理之前异常退出遗留下来的会话目录
+    """
+    global _swept
+    worker_dir = get_worker_path(os.path.join(get_current_project_path(), "download"))
+    if not _swept:
+        _swept = True
+        cleanup_stale_download_dirs(worker_dir)
+    path = os.path.join(worker_dir, uuid.uuid4().hex[:12])
+    os.makedirs(path, exist_ok=True)
+    return path
+
+
+def remove_session_download_dir(path):
+    """删除浏览器会话的下载目录，只删除 create_session_download_dir 创建的目录"""
+    if path and _SESSION_DIR_NAME.match(os.path.basename(path)):
+        shutil.rmtree(path, ignore_errors=True)
+
+
+def attach_session_download_dir(driver: WebDriver, path) -> WebDriver:
+    """在驱动上记录下载目录，浏览器退出（driver.quit）后删除这个目录"""
+    driver._download_dir = path
+    if path is None:
+        return driver
+    original_quit = driver.quit
+
+    def quit_and_remove():
+        try:
+            original_quit()
+        finally:
+            # 浏览器池复用浏览器时下载目录会被更换（参考 renew_session_download_dir），删除的是当前的目录
+            remove_session_download_dir(driver._download_dir)
+
+    driver.quit = quit_and_remove
+    return driver
+
+
+def renew_session_download_dir(driver: WebDriver):
+    """
+    浏览器交给下一个使用者之前（浏览器池），让它使用一个新的空下载目录，之前下载的文件不会被下一个使用者看到：
+    Chromium 内核通过 CDP 的 Browser.setDownloadBehavior 切换到新的会话目录并删除原来的目录（之后才完成的下载也不会写入新目录），
+    其他浏览器无法修改下载目录，清空原来的目录
+    """
+    old_dir = getattr(driver, "_download_dir", None)
+    if old_dir is None:
+        return
+    if hasattr(driver, "execute_cdp_cmd"):
+        new_dir = create_session_download_dir()
+        try:
+            driver.execute_cdp_cmd("Browser.setDownloadBehavior", {"behavior": "allow", "downloadPath": new_dir})
+        except Exception:
+            remove_session_download_dir(new_dir)
+            raise
+        driver._download_dir = new_dir
+        remove_session_download_dir(old_dir)
+        return
+    for entry in os.scandir(old_dir):
+        if entry.is_dir(follow_symlinks=False):
+            shutil.rmtree(entry.path, ignore_errors=True)
+        else:
+            os.remove(entry.path)
+
+
+def cleanup_stale_download_dirs(worker_dir, max_age=24 * 3600):
+    """删除之前异常退出（没有调用 driver.quit）的进程遗留下来的会话下载目录"""
+    for entry in os.scandir(worker_dir):
+        try:
+            if entry.is_dir() and _SESSION_DIR_NAME.match(entry.name) and time.time() - entry.stat().st_mtime > max_age:
+                shutil.rmtree(entry.path, ignore_errors=True)
+        except FileNotFoundError:
+            continue
+
+
+def get_session_download_dir(driver: WebDriver) -> str:
+    """浏览器会话的下载目录（DriverConfig 启动浏览器时记录），没有记录时（如调试模式接管的浏览器）使用 worker 的下载目录"""
+    return getattr(driver, "_download_dir", None) or get_worker_path(os.path.join(get_current_project_path(), "download"))
+
+
+def is_temp_download(name: str) -> bool:
+    return name.endswith(TEMP_SUFFIXES) or name.startswith(TEMP_PREFIXES)
+
+
+class _DirectoryNotifier:
+    """
+    目录变化通知：Linux 使用 inotify（通过 ctypes 调用 libc，不需要额外的依赖），目录有变化时立即唤醒；
+    其他系统或者 inotify 不可用时退化为按 poll_interval 轮询
+    """
+
+    def __init__(self, directory, poll_interval=0.2):
+        self.poll_interval = poll_interval
+        self._fd = None
+        if not sys.platform.startswith("linux"):
+            return
+        try:
+            libc = ctypes.CDLL(ctypes.util.find_library("c") or "libc.so.6", use_errno=True)
+            fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+            if fd < 0:
+                raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+            if libc.inotify_add_watch(fd, os.fsencode(directory), _IN_EVENTS) < 0:
+                os.close(fd)
+                raise OSError(ctypes.get_errno(), "inotify_add_watch failed")
+            self._fd = fd
+        except (OSError, AttributeError) as e:
+            logger.warning(f"inotify 不可用，使用轮询等待下载: {e}")
+
+    def wait(self, timeout: float):
+        """等待目录发生变化或者超时；使用 inotify 时最多等待 1 秒也会返回一次，避免漏掉事件"""
+        if self._fd is None:
+            time.sleep(min(self.poll_interval, timeout))
+            return
+        readable, _, _ = select.select([self._fd], [], [], min(1.0, timeout))
+        if readable:
+            try:
+                while os.read(self._fd, 65536):
+                    pass
+            except BlockingIOError:
+                pass
+
+    def close(self):
+        if self._fd is not None:
+            os.close(self._fd)
+            self._fd = None
+
+
+class DownloadWatcher:
+    """
+    等待浏览器下载完成：进入 with 时记录下载目录中已有的文件，退出时等待出现 count 个新的已完成文件
+    临时文件（.crdownload 等）会被忽略，直到浏览器把它重命名为最终文件名；Chrome 下载时预先创建的同名空文件
+    在对应的 .crdownload 消失之前也不算完成
+
+        with operator.expect_download() as download:
+            operator.element_click(ReportPage.EXPORT)
+        assert download.size > 0, download.path
+    """
+
+    def __init__(self, directory, timeout=60, count=1, poll_interval=0.2):
+        """
+        directory: 下载目录
+        timeout: 等待下载完成的超时时间（秒）
+        count: 需要等待的文件数量
+        poll_interval: 不支持 inotify 时的轮询间隔（秒）
+        """
+        self.directory = directory
+        self.timeout = timeout
+        self.count = count
+        self.poll_interval = poll_interval
+        self.downloads = []  # [(路径, 大小)]，按完成的顺序排列
+        self._before = {}
+        self._notifier = None
+
+    @property
+    def path(self) -> str:
+        """第一个下载完成的文件路径"""
+        return self.downloads[0][0] if self.downloads else None
+
+    @property
+    def size(self) -> int:
+        """第一个下载完成的文件大小（字节）"""
+        return self.downloads[0][1] if self.downloads else None
+
+    def __enter__(self):
+        os.makedirs(self.directory, exist_ok=True)
+        # 先开始监听再记录已有的文件，记录之后出现的变化都不会被漏掉
+        self._notifier = _DirectoryNotifier(self.directory, self.poll_interval)
+        self._before = self._scan()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        try:
+            if exc_type is None:
+                self.wait()
+        finally:
+            self._notifier.close()
+
+    def wait(self) -> list:
+        """等待下载完成，返回 [(路径, 大小)]，超时时抛出 TimeoutException"""
+        end_time = time.monotonic() + self.timeout
+        while True:
+            self._collect()
+            if len(self.downloads) >= self.count:
+                return self.downloads
+            remaining = end_time - time.monotonic()
+            if remaining <= 0:
+                pending = [name for name in os.listdir(self.directory) if is_temp_download(name)]
+                raise TimeoutException(f"{self.timeout} 秒内没有下载完成 {self.count} 个文件: 已完成 {[path for path, _ in self.downloads]}，"
+                                       f"未完成 {pending}，下载目录 {self.directory}")
+            self._notifier.wait(remaining)
+
+    def _scan(self) -> dict:
+        entries = {}
+        with os.scandir(self.directory) as iterator:
+            for entry in iterator:
+                try:
+                    if entry.is_file():
+                        stat = entry.stat()
+                        entries[entry.name] = (stat.st_mtime_ns, stat.st_size)
+                except FileNotFoundError:
+                    continue
+        return entries
+
+    def _collect(self):
+        """把新出现（或者被覆盖）并且已经完成的文件加入 downloads"""
+        entries = self._scan()
+        done = {os.path.basename(path) for path, _ in self.downloads}
+        for name, (mtime, size) in sorted(entries.items(), key=lambda item: item[1][0]):
+            if name in done or is_temp_download(name) or self._before.get(name) == (mtime, size):
+                continue
+            if any(name + suffix in entries for suffix in TEMP_SUFFIXES):
+                continue
+            self.downloads.append((os.path.join(self.directory, name), size))
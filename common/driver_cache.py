@@ -0,0 +1,174 @@
+import hashlib
+import json
+import os
+import shutil
+import subprocess
+import sys
+import threading
+
+from utils.file_utils import get_current_project_path
+from utils.log_manager import LogManager
+
+try:
+    import winreg
+except ImportError:  # 非 windows 系统没有注册表
+    winreg = None
+
+logger = LogManager()
+
+default_cache_path = os.path.join(get_current_project_path(), 'selenium', 'driver_cache.json')
+
+# windows 注册表中浏览器版本的位置
+BROWSER_REGISTRY = {
+    "chrome": r"Software\Google\Chrome\BLBeacon",
+    "edge": r"Software\Microsoft\Edge\BLBeacon",
+}
+
+# 非 windows 系统中浏览器可执行文件的候选位置
+BROWSER_BINARIES = {
+    "chrome": ["google-chrome", "google-chrome-stable", "chromium", "chromium-browser",
+               "/Applications/Google Chrome.app/Contents/MacOS/Google Chrome"],
+    "edge": ["microsoft-edge", "microsoft-edge-stable",
+             "/Applications/Microsoft Edge.app/Contents/MacOS/Microsoft Edge"],
+}
+
+
+def file_fingerprint(path):
+    """文件的指纹（修改时间 + 大小），文件不存在时返回 None"""
+    try:
+        stat = os.stat(path)
+    except OSError:
+        return None
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+def file_sha256(path):
+    sha256 = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            sha256.update(chunk)
+    return sha256.hexdigest()
+
+
+def run_version_command(binary_path):
+    """执行 `<binary> --version` 并返回其中的版本号，如 `Google Chrome 120.0.6099.109` -> 120.0.6099.109"""
+    result = subprocess.run([binary_path, "--version"], stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True, timeout=5)
+    if result.returncode != 0:
+        raise RuntimeError(result.stderr.strip())
+    for word in result.stdout.split():
+        if word[0].isdigit() and "." in word:
+            return word
+    raise RuntimeError(f"无法从 {result.stdout.strip()} 中解析版本号")
+
+
+class DriverResolutionCache:
+    """
+    驱动路径的持久化缓存，以浏览器版本为 key，并记录驱动文件的修改时间和大小
+    浏览器版本和驱动文件都没有变化时，直接返回驱动路径，不需要再执行子进程、解析 drivers.json 或者访问网络
+    """
+
+    def __init__(self, cache_path=default_cache_path):
+        self.cache_path = cache_path
+        self._data = None
+        self._fingerprint = None
+        self._lock = threading.Lock()
+
+    def _load(self):
+        """读取缓存文件，同一个进程中只在缓存文件被其他进程修改过时才会重新读取"""
+        fingerprint = file_fingerprint(self.cache_path)
+        if self._data is not None and fingerprint == self._fingerprint:
+            return self._data
+        data = {"drivers": {}, "versions": {}}
+        if fingerprint is not None:
+            try:
+                with open(self.cache_path, encoding="utf-8") as f:
+                    data.update(json.load(f))
+            except (OSError, ValueError) as e:
+                logger.warning(f"驱动缓存文件损坏，重新生成: {e}")
+        self._data = data
+        self._fingerprint = fingerprint
+        return data
+
+    def _save(self):
+        os.makedirs(os.path.dirname(self.cache_path), exist_ok=True)
+        tmp_path = f"{self.cache_path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self._data, f, indent=4)
+        os.replace(tmp_path, self.cache_path)
+        self._fingerprint = file_fingerprint(self.cache_path)
+
+    def browser_version(self, browser):
+        """
+        获取浏览器版本：windows 读取注册表；其他系统以浏览器可执行文件的指纹为 key 缓存版本号，只有浏览器升级后才会重新执行 --version
+        :return: 版本号，找不到浏览器时返回 None
+        """
+        browser = browser.lower()
+        if winreg is not None and browser in BROWSER_REGISTRY:
+            try:
+                with winreg.OpenKey(winreg.HKEY_CURRENT_USER, BROWSER_REGISTRY[browser]) as key:
+                    version, _ = winreg.QueryValueEx(key, "version")
+                    return version
+            except OSError:
+                pass
+        for candidate in BROWSER_BINARIES.get(browser, []):
+            binary_path = shutil.which(candidate) or (candidate if os.path.isfile(candidate) else None)
+            if binary_path:
+                return self._cached_version(os.path.realpath(binary_path))
+        return None
+
+    def driver_version(self, driver_path):
+        """获取驱动版本，以驱动文件的指纹为 key 缓存，驱动文件不变时不会再执行 --version"""
+        return self._cached_version(driver_path)
+
+    def _cached_version(self, binary_path):
+        fingerprint = file_fingerprint(binary_path)
+        if fingerprint is None:
+            return None
+        with self._lock:
+            versions = self._load()["versions"]
+            record = versions.get(binary_path)
+            if record and record["fingerprint"] == fingerprint:
+                return record["version"]
+        try:
+            version = run_version_command(binary_path)
+        except Exception as e:
+            logger.warning(f"获取 {binary_path} 版本失败: {e}")
+            return None
+        with self._lock:
+            self._load()["versions"][binary_path] = {"fingerprint": fingerprint, "version": version}
+            self._save()
+        return version
+
+    def get(self, browser, browser_version):
+        """
+        获取缓存的驱动路径，浏览器版本未知、没有缓存或者驱动文件被修改过时返回 None
+        """
+        if not browser_version:
+            return None
+        with self._lock:
+            record = self._load()["drivers"].get(f"{browser.lower()}:{browser_version}")
+        if record and file_fingerprint(record["driver_path"]) == record["fingerprint"]:
+            return record["driver_path"]
+        return None
+
+    def put(self, browser, browser_version, driver_path):
+        """记录浏览器版本对应的驱动路径"""
+        if not browser_version or not os.path.isfile(driver_path):
+            return
+        record = {
+            "driver_path": driver_path,
+            "fingerprint": file_fingerprint(driver_path),
+        }
+        with self._lock:
+            self._load()["drivers"][f"{browser.lower()}:{browser_version}"] = record
+            self._save()
+
+    def invalidate(self, browser, browser_version):
+        with self._lock:
+            if self._load()["drivers"].pop(f"{browser.lower()}:{browser_version}", None) is not None:
+                self._save()
+
+
+def driver_executable(name):
+    """驱动可执行文件的名称，windows 下带 .exe 后缀"""
+    return f"{name}.exe" if sys.platform.startswith("win") else name
@@ -1,10 +1,8 @@
 import json
 import os.path
-import subprocess
-import winreg
-import zipfile
+import platform
+import sys
 
-import requests
 from selenium import webdriver
 from selenium.webdriver.chrome.service import Service as ChromeService
 from selenium.webdriver.chromium.options import ChromiumOptions
@@ -13,6 +11,12 @@ from webdriver_manager.core.driver_cache import DriverCacheManager
 from selenium.webdriver.edge.options import Options as EdgeOption
 from selenium.webdriver.edge.service import Service as EdgeService
 
+from common.command_metrics import command_metrics_enabled, install_command_metrics
+from common.download_manager import attach_session_download_dir, create_session_download_dir, remove_session_download_dir
+from common.driver_cache import DriverResolutionCache, driver_executable
+from common.driver_download import DriverArtifactCache
+from common.launch_profile import LaunchProfile, get_launch_profile
+from common.profile_template import get_profile_template
 from utils.file_utils import get_current_project_path
 from utils.log_manager import LogManager
 
@@ -21,27 +25,72 @@ logger = LogManager()
 edge_driver_path = os.path.join(get_current_project_path(), 'selenium', 'edgedriver')
 
 
-class DriverConfig:
+def edge_driver_package():
+    """当前系统对应的 Edge 驱动压缩包名称"""
+    if sys.platform.startswith("win"):
+        return "edgedriver_win64.zip"
+    if sys.platform == "darwin":
+        return "edgedriver_mac64_m1.zip" if platform.machine() == "arm64" else "edgedriver_mac64.zip"
+    return "edgedriver_linux64.zip"
+
 
-    def init_driver(self, browser_type="Chrome", debugger=None):
+class DriverConfig:
+    # 驱动路径缓存，进程内共享，避免每次启动浏览器都重新解析 drivers.json 或者执行版本检查的子进程
+    resolution_cache = DriverResolutionCache()
+    # 驱动压缩包缓存，多个 worker 同时启动时只下载一次
+    artifact_cache = DriverArtifactCache()
+
+    def init_driver(self, browser_type="Chrome", debugger=None, profile: LaunchProfile = None):
+        """
+        browser_type: 浏览器类型
+        debugger: 调试模式，接管已经启动的浏览器
+        profile: 启动配置，默认读取环境变量 TEST_LAUNCH_PROFILE（参考 launch_profile.py）
+        """
         driver = None
+        profile = profile or get_launch_profile()
         if browser_type.lower() == "chrome":
-            driver = self.init_chrome_driver(debugger)
+            driver = self.init_chrome_driver(debugger, profile)
         elif browser_type.lower() == "firefox":
             # TODO
             pass
         elif browser_type.lower() == "edge":
-            driver = self.init_edge_driver(debugger)
+            driver = self.init_edge_driver(debugger, profile)
+        if driver is not None and command_metrics_enabled():
+            # 统计每个 WebDriver 命令的耗时（run.py --command-metrics 开启）
+            install_command_metrics(driver)
         return driver
 
+    @staticmethod
+    def start_with_profile_clone(driver_class, service, options: ChromiumOptions, debugger=False):
+        """
+        启动浏览器，配置了 profile 模板（环境变量 TEST_PROFILE_TEMPLATE）时，每个浏览器使用一份克隆的 --user-data-dir，
+        浏览器退出后克隆的 profile 在后台删除
+        浏览器的下载目录记录在驱动上，用于等待下载完成（参考 DownloadWatcher），浏览器退出或者启动失败后删除
+        """
+        download_dir = options.experimental_options.get("prefs", {}).get("download.default_directory")
+        template = None if debugger else get_profile_template()
+        clone_dir = None
+        if template is not None:
+            clone_dir = template.clone()
+            options.add_argument(f'--user-data-dir={clone_dir}')
+        try:
+            driver = driver_class(service=service, options=options)
+        except Exception:
+            if clone_dir is not None:
+                template.release(clone_dir)
+            remove_session_download_dir(download_dir)
+            raise
+        attach_session_download_dir(driver, download_dir)
+        return template.attach(driver, clone_dir) if clone_dir is not None else driver
+
     # =================================================== Chrome 浏览器 =================================================================
     @staticmethod
-    def default_chrome_options(options: ChromiumOptions = None, debugger=False):
+    def default_chrome_options(options: ChromiumOptions = None, debugger=False, profile: LaunchProfile = None):
         if debugger:
             # debugger模式，接管浏览器，方便调试Test case
             options.debugger_address = "127.0.0.1:9222"
         else:
-            download_dir = os.path.join(get_current_project_path(), "download")  # 设置浏览器下载文件路径
+            download_dir = create_session_download_dir()  # 设置浏览器下载文件路径（每个浏览器独立的目录）
             prefs = {
                 'profile.default_content_settings.popups': 0,  # 禁止所有弹窗显示（0表示阻止）
                 'profile.default_content_setting_values.notifications': 2,  # 禁用浏览器通知（2表示阻止）
@@ -52,67 +101,95 @@ class DriverConfig:
             }
             options.add_argument('--safebrowsing-disable-download-protectio‌​n')  # 禁用下载文件的类型安全检测
             options.add_argument('--test-type')  # 标记为测试模式，规避部分浏览器限制
-            options.add_argument('--start-maximized')  # 启动时最大化窗口
             options.add_argument('no-default-browser-check')  # 跳过默认浏览器检查
             options.add_argument('disable-popup-blocking​')  # 完全禁用弹窗拦截功能
             options.add_argument('--lang=en_US')  # 设置浏览器语言为美式英语
             options.add_argument('--ignore-certificate-errors')  # 跳过SSL/TLS证书验证环节
+            (profile or get_launch_profile()).apply(options, prefs)  # 无头、最大化、页面加载策略、图片加载等启动配置
             options.add_experimental_option('prefs', prefs)
         return options
 
-    def init_chrome_driver(self, debugger=None):
-        options = webdriver.ChromeOptions()
+    def init_chrome_driver(self, debugger=None, profile: LaunchProfile = None):
+        profile = profile or get_launch_profile()
+        browser_version = self.resolution_cache.browser_version("chrome")
         try:
-            driver_json_path = os.path.join(get_current_project_path(), 'selenium', 'chromedriver', '.wdm', 'drivers.json')
-            with open(driver_json_path, encoding='uft-8') as a:
-                result = json.load(a)
-                for key in result.keys():
-                    if 'win32_chromedriver' in key:
-                        chrom_driver = result[key].get('binary_path')
-                        service = ChromeService(chrom_driver)
-                        driver = webdriver.Chrome(service=service, options=self.default_chrome_options(options, debugger))
+            # 浏览器版本和驱动文件都没有变化时直接使用缓存的驱动路径，否则从 webdriver-manager 的 drivers.json 中查找
+            cached_driver = self.resolution_cache.get("chrome", browser_version)
+            chrome_driver = cached_driver or self.find_local_chromedriver(browser_version)
+            if not chrome_driver:
+                raise FileNotFoundError("本地没有找到可用的 chromedriver")
+            service = ChromeService(chrome_driver)
+            driver = self.start_with_profile_clone(webdriver.Chrome, service, self.default_chrome_options(webdriver.ChromeOptions(), debugger, profile), debugger)
         except Exception as e:
             # 如果本地驱动查找或启动失败，则自动下载符合版本的驱动
             logger.error(f"本地驱动启动浏览器失败 {e}")
-            service = ChromeService(self.safe_chromedriver_install())
-            driver = webdriver.Chrome(service=service, options=self.default_chrome_options(options, debugger))
+            self.resolution_cache.invalidate("chrome", browser_version)
+            cached_driver = None
+            chrome_driver = self.safe_chromedriver_install()
+            service = ChromeService(chrome_driver)
+            driver = self.start_with_profile_clone(webdriver.Chrome, service, self.default_chrome_options(webdriver.ChromeOptions(), debugger, profile), debugger)
+        if chrome_driver != cached_driver:
+            # 只在缓存没有命中或者重新下载驱动后更新缓存，命中缓存时不会再读写缓存文件
+            self.resolution_cache.put("chrome", browser_version, chrome_driver)
         driver.delete_all_cookies()
-        driver.maximize_window()
+        if profile.maximize and not profile.headless:
+            driver.maximize_window()
         return driver
 
+    @staticmethod
+    def find_local_chromedriver(browser_version=None):
+        """
+        从 webdriver-manager 的 drivers.json 中查找本地已经下载的 chromedriver，优先使用与浏览器主版本一致的驱动
+        """
+        driver_json_path = os.path.join(get_current_project_path(), 'selenium', 'chromedriver', '.wdm', 'drivers.json')
+        if not os.path.exists(driver_json_path):
+            return None
+        with open(driver_json_path, encoding='utf-8') as f:
+            result = json.load(f)
+        candidates = []
+        for key, value in result.items():
+            binary_path = value.get('binary_path', '')
+            if 'chromedriver' in key and os.path.isfile(binary_path):
+                candidates.append((key, binary_path))
+        if browser_version:
+            major_version = browser_version.split(".")[0]
+            for key, binary_path in candidates:
+                if f"_for_{major_version}." in key:
+                    return binary_path
+        return candidates[0][1] if candidates else None
+
     @staticmethod
     def safe_chromedriver_install():
         # 修复 webdriver-manager 4.x bug
         chrome_driver_path = os.path.join(get_current_project_path(), 'selenium', 'chromedriver')
         path = ChromeDriverManager(cache_manager=DriverCacheManager(chrome_driver_path, 30)).install()
-        correct_exe_path = os.path.join(os.path.dirname(path), "chromedriver.exe")
+        correct_exe_path = os.path.join(os.path.dirname(path), driver_executable("chromedriver"))
 
         modified = False
         driver_json_path = os.path.join(get_current_project_path(), 'selenium', 'chromedriver', '.wdm', 'drivers.json')
         if os.path.exists(driver_json_path):
-            with open(driver_json_path, encoding='uft-8') as f:
+            with open(driver_json_path, encoding='utf-8') as f:
                 drivers_data = json.load(f)
-            for key, value in drivers_data:
+            for key, value in drivers_data.items():
                 bin_path = value.get("binary_path", '')
                 if bin_path.endswith("THIRD_PARTY_NOTICES.chromedriver"):
                     drivers_data[key]["binary_path"] = correct_exe_path
                     modified = True
         if modified:
-            with open(driver_json_path, 'w', encoding="utf-8 ") as f:
+            with open(driver_json_path, 'w', encoding="utf-8") as f:
                 json.dump(drivers_data, f, indent=4)
         return correct_exe_path
 
     # =================================================== Edge 浏览器 =================================================================
     @staticmethod
-    def default_edge_options(edge_options: EdgeOption = None, debugger=False):
+    def default_edge_options(edge_options: EdgeOption = None, debugger=False, profile: LaunchProfile = None):
         if debugger:
             # debugger模式，接管浏览器，方便调试Test case
             edge_options.debugger_address = "127.0.0.1:9222"
         else:
-            edge_options.add_argument('start-maximized')
             edge_options.add_argument('disable-infobars')
             edge_options.add_argument('--disable-extensions')
-            download_dir = os.path.join(get_current_project_path(), "download")
+            download_dir = create_session_download_dir()  # 每个浏览器独立的下载目录
             prefs = {
                 'profile.default_content_settings.popups': 0,  # 阻止弹窗（0=阻止，1=允许）
                 'profile.default_content_setting_values.notifications': 2,  # 禁用通知（2=阻止，1=允许）
@@ -124,69 +201,52 @@ class DriverConfig:
                 'edge.preferences.enhanced': True,  # 启用 Edge 增强功能（如智能拦截）
                 'browser.enable_automatic_resizing': False,  # 禁用窗口自动调整
             }
+            (profile or get_launch_profile()).apply(edge_options, prefs)  # 无头、最大化、页面加载策略、图片加载等启动配置
+            edge_options.add_experimental_option('prefs', prefs)
         return edge_options
 
-    @staticmethod
-    def get_edge_version():
-        try:
-            reg_path = r"Software\Microsoft\Edge\BLBeacon"
-            with winreg.OpenKey(winreg.HKEY_CURRENT_USER, reg_path) as key:
-                version, _ = winreg.QueryValueEx(key, "version")
-                return version
-        except Exception as e:
+    def get_edge_version(self):
+        version = self.resolution_cache.browser_version("edge")
+        if not version:
             raise AssertionError(f"Get Edge version failed!")
+        return version
 
     def download_edge_driver(self, save_dir):
+        """
+        获取与当前 Edge 浏览器版本一致的驱动，按版本存放在 save_dir/<version> 中，返回驱动路径
+        多个 worker 同时启动时只会下载一次，镜像地址可以通过环境变量 EDGE_DRIVER_MIRROR 指定
+        """
         version = self.get_edge_version()
         major_version = version.split(".")[0]
 
-        if self.get_driver_version(os.path.join(save_dir, "msedgedriver.exe")).split(".")[0] == major_version:
-            return
-        downlaod_url = f"https://msedgedriver.microsoft.com/{version}/edgedriver_win64.zip"
-        zip_path = os.path.join(save_dir, "edgedriver.zip")
-
-        with requests.get(downlaod_url, stream=True) as r:
-            r.raise_for_status()
-            with open(zip_path, "wb") as f:
-                for chunk in r.iter_content(chunk_size=8192):
-                    f.write(chunk)
-        with zipfile.ZipFile(zip_path, 'r') as zip_ref:
-            zip_ref.extractall(save_dir)
-        os.remove(zip_path)
-        for root, dirs, files in os.walk(save_dir):
-            for file in files:
-                if file.lower() == "msedgedriver.exe":
-                    driver_path = os.path.join(root, file)
-                    logger.info(f"Edge driver:{driver_path}")
-        raise AssertionError("not find msedgedriver.exe")
-
-    @staticmethod
-    def get_driver_version(driver_path):
+        # 浏览器版本和驱动文件都没有变化时，不需要再检查驱动版本
+        cached_path = self.resolution_cache.get("edge", version)
+        if cached_path:
+            return cached_path
+        driver_path = os.path.join(save_dir, version, driver_executable("msedgedriver"))
+        if self.get_driver_version(driver_path).split(".")[0] != major_version:
+            driver_path = self.artifact_cache.install(f"{version}/{edge_driver_package()}", os.path.dirname(driver_path),
+                                                      driver_executable("msedgedriver"))
+        self.resolution_cache.put("edge", version, driver_path)
+        return driver_path
+
+    def get_driver_version(self, driver_path):
+        """
+        获取驱动的版本号（以驱动文件的修改时间和大小为 key 缓存，驱动不变时不会再执行 --version 子进程）
+        """
         if not os.path.exists(driver_path):
             return "---"
-        try:
-            result = subprocess.run(
-                [driver_path, "--version"],
-                stdout=subprocess.PIPE,
-                stderr=subprocess.PIPE,
-                text=True,
-                timeout=5
-            )
-            if result.returncode == 0:
-                result = result.stdout.strip()
-                r = result.split("WebDriver")[1].split(".")[0].split()
-                return r
-            else:
-                raise RuntimeError()
-        except Exception as e:
-            raise RuntimeError(f"Can not get driver version: {e}")
+        version = self.resolution_cache.driver_version(driver_path)
+        if not version:
+            raise RuntimeError(f"Can not get driver version: {driver_path}")
+        return version
 
-    def init_edge_driver(self, debugger=False):
+    def init_edge_driver(self, debugger=False, profile: LaunchProfile = None):
         try:
-            self.download_edge_driver(edge_driver_path)
+            driver_path = self.download_edge_driver(edge_driver_path)
             options = EdgeOption()
-            service = EdgeService(os.path.join(edge_driver_path, "msedgedriver.exe"))
-            default_driver = webdriver.Edge(options=self.default_edge_options(options, debugger), service=service)
+            service = EdgeService(driver_path)
+            default_driver = self.start_with_profile_clone(webdriver.Edge, service, self.default_edge_options(options, debugger, profile), debugger)
             return default_driver
         except Exception as e:
             logger.error("Get edge driver failed!")
@@ -0,0 +1,175 @@
+import os
+import shutil
+import stat
+import zipfile
+import zlib
+from urllib.parse import urlparse
+from urllib.request import url2pathname
+
+import requests
+
+from common.driver_cache import file_sha256
+from utils.file_utils import get_current_project_path, FileLock
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+default_artifact_dir = os.path.join(get_current_project_path(), 'selenium', 'artifacts')
+
+
+class DriverArtifactCache:
+    """
+    驱动压缩包的本地缓存，多个 worker 同时启动时只有一个会真正下载：
+        - 下载和解压都在文件锁中进行，其他进程等待锁释放后直接使用已经下载好的文件
+        - 先写入临时文件，校验通过后再 rename，不会出现下载了一半的驱动
+        - 网络中断后通过 HTTP Range 断点续传
+        - 下载完成后校验 sha256（镜像提供 .sha256 文件时与之比对），并记录下来用于后续校验本地缓存是否损坏
+        - mirror 可以是 http 地址、file:// 地址或者本地目录，方便内网/离线环境使用
+    """
+
+    def __init__(self, mirror=None, cache_dir=default_artifact_dir, chunk_size=1024 * 1024, retries=3, timeout=60):
+        """
+        mirror: 驱动下载的根地址，默认读取环境变量 EDGE_DRIVER_MIRROR，没有时使用微软官方地址
+        cache_dir: 驱动压缩包的缓存目录
+        chunk_size: 下载时每次写入的块大小
+        retries: 下载失败时的重试（续传）次数
+        timeout: 网络请求的超时时间（秒）
+        """
+        self.mirror = (mirror or os.environ.get("EDGE_DRIVER_MIRROR") or "https://msedgedriver.microsoft.com").rstrip("/")
+        self.cache_dir = cache_dir
+        self.chunk_size = chunk_size
+        self.retries = retries
+        self.timeout = timeout
+
+    def _source(self, relative_path):
+        """返回 (是否本地文件, 地址)"""
+        parsed = urlparse(self.mirror)
+        if parsed.scheme in ("http", "https"):
+            return False, f"{self.mirror}/{relative_path}"
+        base = url2pathname(parsed.path) if parsed.scheme == "file" else self.mirror
+        return True, os.path.join(base, *relative_path.split("/"))
+
+    def _expected_sha256(self, relative_path, expected_sha256=None):
+        """期望的 sha256：优先使用调用方传入的值，其次使用镜像中同名的 .sha256 文件，都没有时返回 None"""
+        if expected_sha256:
+            return expected_sha256.lower()
+        is_local, source = self._source(relative_path + ".sha256")
+        try:
+            if is_local:
+                if not os.path.isfile(source):
+                    return None
+                with open(source, encoding="utf-8") as f:
+                    content = f.read()
+            else:
+                response = requests.get(source, timeout=self.timeout)
+                if response.status_code != 200:
+                    return None
+                content = response.text
+        except (OSError, requests.RequestException):
+            return None
+        return content.split()[0].lower() if content.strip() else None
+
+    def _is_valid(self, artifact_path):
+        """校验本地缓存的压缩包与下载时记录的 sha256 是否一致"""
+        record_path = artifact_path + ".sha256"
+        if not os.path.isfile(artifact_path) or not os.path.isfile(record_path):
+            return False
+        with open(record_path, encoding="utf-8") as f:
+            return f.read().strip() == file_sha256(artifact_path)
+
+    def fetch(self, relative_path, expected_sha256=None):
+        """
+        获取驱动压缩包，本地缓存有效时直接返回，否则从镜像下载
+        :param relative_path: 相对于镜像根地址的路径，如 120.0.2210.91/edgedriver_win64.zip
+        :param expected_sha256: 期望的 sha256
+        :return: 本地压缩包路径
+        """
+        artifact_path = os.path.join(self.cache_dir, *relative_path.split("/"))
+        if self._is_valid(artifact_path):
+            return artifact_path
+        os.makedirs(os.path.dirname(artifact_path), exist_ok=True)
+        with FileLock(artifact_path + ".lock"):
+            # 等待锁的过程中其他进程可能已经下载完成
+            if self._is_valid(artifact_path):
+                return artifact_path
+            part_path = artifact_path + ".part"
+            is_local, source = self._source(relative_path)
+            if is_local:
+                logger.info(f"从本地镜像复制驱动: {source}")
+                shutil.copyfile(source, part_path)
+            else:
+                self._download(source, part_path)
+            actual_sha256 = file_sha256(part_path)
+            expected = self._expected_sha256(relative_path, expected_sha256)
+            if expected and actual_sha256 != expected:
+                os.remove(part_path)
+                raise AssertionError(f"驱动文件校验失败: {relative_path}, 期望 {expected}, 实际 {actual_sha256}")
+            if zipfile.is_zipfile(part_path):
+                with zipfile.ZipFile(part_path) as zip_ref:
+                    if zip_ref.testzip() is not None:
+                        os.remove(part_path)
+                        raise AssertionError(f"驱动压缩包已损坏: {relative_path}")
+            os.replace(part_path, artifact_path)
+            with open(artifact_path + ".sha256", "w", encoding="utf-8") as f:
+                f.write(actual_sha256)
+        return artifact_path
+
+    def _download(self, url, part_path):
+        """下载到 part_path，已经存在的部分通过 HTTP Range 续传"""
+        for attempt in range(1, self.retries + 1):
+            downloaded = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+            headers = {"Range": f"bytes={downloaded}-"} if downloaded else {}
+            try:
+                with requests.get(url, stream=True, headers=headers, timeout=self.timeout) as r:
+                    if r.status_code == 416:
+                        # 请求的范围超出文件大小，说明已经下载完成
+                        return
+                    r.raise_for_status()
+                    # 服务器不支持 Range 时会返回完整内容，从头开始写
+                    mode = "ab" if downloaded and r.status_code == 206 else "wb"
+                    logger.info(f"下载驱动: {url}（第 {attempt} 次，从 {downloaded if mode == 'ab' else 0} 字节开始）")
+                    with open(part_path, mode) as f:
+                        for chunk in r.iter_content(chunk_size=self.chunk_size):
+                            f.write(chunk)
+                return
+            except requests.RequestException as e:
+                logger.warning(f"下载驱动失败: {url}, {e}")
+                if attempt == self.retries:
+                    raise AssertionError(f"下载驱动失败: {url}, {e}")
+
+    def install(self, relative_path, target_dir, member_name, expected_sha256=None):
+        """
+        获取驱动压缩包并解压出其中的驱动文件到 target_dir
+        :param member_name: 压缩包中驱动文件的名称，如 msedgedriver.exe
+        :return: 驱动文件路径
+        """
+        target_path = os.path.join(target_dir, member_name)
+        artifact_path = self.fetch(relative_path, expected_sha256)
+        os.makedirs(target_dir, exist_ok=True)
+        with FileLock(target_path + ".lock"):
+            with zipfile.ZipFile(artifact_path) as zip_ref:
+                members = [info for info in zip_ref.infolist() if os.path.basename(info.filename).lower() == member_name.lower()]
+                if not members:
+                    raise AssertionError(f"压缩包 {relative_path} 中没有找到 {member_name}")
+                # 已经解压过的驱动与压缩包中的文件一致时直接使用，被截断或者与压缩包不一致时重新解压
+                if os.path.isfile(target_path):
+                    if self._matches(target_path, members[0]):
+                        return target_path
+                    logger.warning(f"驱动文件与压缩包中的 {members[0].filename} 不一致，重新解压: {target_path}")
+                tmp_path = f"{target_path}.{os.getpid()}.tmp"
+                with zip_ref.open(members[0]) as src, open(tmp_path, "wb") as dst:
+                    shutil.copyfileobj(src, dst, self.chunk_size)
+            os.chmod(tmp_path, os.stat(tmp_path).st_mode | stat.S_IXUSR | stat.S_IXGRP | stat.S_IXOTH)
+            os.replace(tmp_path, target_path)
+        logger.info(f"Edge driver:{target_path}")
+        return target_path
+
+    def _matches(self, path, info: zipfile.ZipInfo) -> bool:
+        """文件的大小和 CRC32 是否与压缩包中的文件一致"""
+        if os.path.getsize(path) != info.file_size:
+            return False
+        crc = 0
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(self.chunk_size), b""):
+                crc = zlib.crc32(chunk, crc)
+        return crc == info.CRC
@@ -0,0 +1,194 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlparse
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from common.driver_config import DriverConfig
+from common.deep_locator import set_frame_path
+from common.download_manager import renew_session_download_dir
+from common.element_cache import clear_element_cache
+from common.global_var import quit_drivers
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 清理当前页面的 localStorage / sessionStorage（about:blank 等页面没有 storage 权限，忽略报错）
+CLEAR_STORAGE_JS = """
+try { window.localStorage.clear(); } catch (e) {}
+try { window.sessionStorage.clear(); } catch (e) {}
+"""
+
+
+class DriverPool:
+    """
+    浏览器预热池：后台提前启动浏览器，case 需要时直接取用，用完后重置状态放回池中复用
+    浏览器使用次数达到 max_uses 或者不再响应时，会被销毁并在后台重新启动一个新的浏览器
+    后台启动失败时重试 launch_retries 次，仍然失败时等待中的 acquire 立即报错，不会一直等到超时
+    """
+
+    def __init__(self, browser_type="Chrome", size=1, max_uses=20, debugger=False, health_timeout=5, launch_retries=2):
+        """
+        browser_type: 浏览器类型
+        size: 池中预热的浏览器数量
+        max_uses: 单个浏览器最多被复用的次数，超过后回收
+        debugger: 调试模式
+        health_timeout: 检查浏览器是否响应的超时时间（秒）
+        launch_retries: 后台启动浏览器失败时的重试次数
+        """
+        self.browser_type = browser_type
+        self.size = max(1, size)
+        self.max_uses = max_uses
+        self.debugger = debugger
+        self.health_timeout = health_timeout
+        self.launch_retries = launch_retries
+        self._idle = queue.Queue()  # 空闲的浏览器，重试后仍然启动失败时放入异常，交给 acquire 抛出
+        self._uses = {}  # 会话编号（session_id）-> 已经使用的次数
+        self._lock = threading.Lock()
+        self._closed = False
+        # 启动/销毁浏览器都在后台线程中完成，不占用 case 的执行时间
+        self._executor = ThreadPoolExecutor(max_workers=self.size + 1, thread_name_prefix="driver-pool")
+
+    def start(self):
+        """后台预热 size 个浏览器"""
+        for _ in range(self.size):
+            self._executor.submit(self._launch)
+        return self
+
+    def _launch(self, attempt=0):
+        if self._closed:
+            return
+        try:
+            driver = DriverConfig().init_driver(self.browser_type, self.debugger)
+            if driver is None:
+                raise RuntimeError("没有获取到驱动")
+        except Exception as e:
+            if attempt < self.launch_retries and not self._closed:
+                logger.warning(f"预热浏览器失败，重新启动（第 {attempt + 1} 次重试）: {e}")
+                self._executor.submit(self._launch, attempt + 1)
+            else:
+                logger.error(f"预热浏览器失败: {e}")
+                self._idle.put(e)
+            return
+        with self._lock:
+            self._uses[driver.session_id] = 0
+        self._idle.put(driver)
+
+    def acquire(self, timeout=120) -> WebDriver:
+        """
+        从池中获取一个可用的浏览器，池中没有空闲浏览器时等待后台启动完成
+        """
+        while True:
+            try:
+                driver = self._idle.get(timeout=timeout)
+            except queue.Empty:
+                raise AssertionError(f"{timeout} 秒内没有从浏览器池中获取到可用的浏览器")
+            if isinstance(driver, Exception):
+                # 这个位置的浏览器启动失败，在后台重新尝试启动，本次获取直接报错
+                self._executor.submit(self._launch)
+                raise AssertionError(f"浏览器池启动浏览器失败: {driver}")
+            if self._is_alive(driver):
+                return driver
+            logger.warning("浏览器池中的浏览器已不再响应，重新启动一个新的浏览器")
+            self._discard(driver)
+
+    def release(self, driver: WebDriver):
+        """
+        归还浏览器：重置浏览器状态后放回池中，达到复用次数上限或者重置失败时回收并补充一个新的浏览器
+        """
+        if driver is None:
+            return
+        with self._lock:
+            uses = self._uses.get(driver.session_id, 0) + 1
+            self._uses[driver.session_id] = uses
+        if self._closed or uses >= self.max_uses or not self._reset(driver):
+            self._discard(driver)
+            return
+        self._idle.put(driver)
+
+    def _is_alive(self, driver: WebDriver) -> bool:
+        """在独立线程中检查浏览器是否响应，避免卡死的浏览器阻塞 case"""
+        result = []
+
+        def ping():
+            try:
+                result.append(driver.execute_script("return 1;") == 1)
+            except Exception:
+                result.append(False)
+
+        checker = threading.Thread(target=ping, daemon=True)
+        checker.start()
+        checker.join(self.health_timeout)
+        return bool(result and result[0])
+
+    def _reset(self, driver: WebDriver) -> bool:
+        """
+        清理 cookie、storage，关闭多余的标签页，加载空白页，并更换一个新的空下载目录
+        Chromium 内核通过 CDP 清理所有访问过的域名（各个标签页的浏览历史以及 cookie 所属的域名）下的 storage 和所有 cookie，
+        其他浏览器只能清理各个标签页当前域名下的 storage 和 cookie
+        """
+        try:
+            chromium = hasattr(driver, "execute_cdp_cmd")
+            origins = set()
+            handles = driver.window_handles
+            # 最后处理第一个标签页，处理完之后保留它
+            for handle in handles[1:] + handles[:1]:
+                driver.switch_to.window(handle)
+                driver.execute_script(CLEAR_STORAGE_JS)
+                if chromium:
+                    origins.update(self._history_origins(driver))
+                if handle != handles[0]:
+                    driver.close()
+            if chromium:
+                for cookie in driver.execute_cdp_cmd("Network.getAllCookies", {}).get("cookies", []):
+                    host = cookie["domain"].lstrip(".")
+                    origins.update({f"https://{host}"} if cookie.get("secure") else {f"http://{host}", f"https://{host}"})
+                for origin in origins:
+                    driver.execute_cdp_cmd("Storage.clearDataForOrigin", {"origin": origin, "storageTypes": "all"})
+                driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+            else:
+                driver.delete_all_cookies()
+            driver.get("about:blank")
+            renew_session_download_dir(driver)
+            clear_element_cache(driver)
+            set_frame_path(driver, ())
+            return True
+        except Exception as e:
+            logger.warning(f"重置浏览器状态失败，回收该浏览器: {e}")
+            return False
+
+    @staticmethod
+    def _history_origins(driver: WebDriver) -> set:
+        """当前标签页浏览历史中的所有域名（scheme://host[:port]）"""
+        origins = set()
+        for entry in driver.execute_cdp_cmd("Page.getNavigationHistory", {}).get("entries", []):
+            parsed = urlparse(entry.get("url", ""))
+            if parsed.scheme in ("http", "https") and parsed.hostname:
+                origins.add(f"{parsed.scheme}://{parsed.hostname}" + (f":{parsed.port}" if parsed.port else ""))
+        return origins
+
+    def _discard(self, driver: WebDriver):
+        """销毁浏览器，并在后台补充一个新的浏览器"""
+        with self._lock:
+            self._uses.pop(driver.session_id, None)
+        if self._closed:
+            self._quit(driver)
+            return
+        self._executor.submit(self._quit, driver)
+        self._executor.submit(self._launch)
+
+    @staticmethod
+    def _quit(driver: WebDriver):
+        quit_drivers({f"pool-{id(driver)}": driver})
+
+    def shutdown(self):
+        """销毁池中所有的浏览器"""
+        self._closed = True
+        self._executor.shutdown(wait=True)
+        drivers = {}
+        while not self._idle.empty():
+            driver = self._idle.get_nowait()
+            if not isinstance(driver, Exception):
+                drivers[f"pool-{id(driver)}"] = driver
+        quit_drivers(drivers)
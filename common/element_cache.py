@@ -0,0 +1,126 @@
+import os
+import threading
+
+from selenium.common import WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from common.js_scripts import DOCUMENT_TOKEN_JS
+
+
+def element_cache_enabled() -> bool:
+    """是否开启元素缓存，由 run.py 的 --element-cache 通过环境变量 TEST_ELEMENT_CACHE 开启"""
+    return os.environ.get("TEST_ELEMENT_CACHE", "0").lower() in ("1", "true", "yes")
+
+
+class ElementCache:
+    """
+    元素缓存：同一个驱动中，同一个定位元组在同一个文档中只查找一次，命中时直接返回缓存的 WebElement，不需要任何命令
+    以下失效点之后清空缓存：
+        - 通过 BrowserOperator 打开页面、刷新、前进、后退、切换窗口、切换 frame
+        - 点击元素后：点击不一定跳转，在下一次查找时读取一次当前文档的标识（document.__docId），文档变化时才清空
+    失效点之间在 BrowserOperator 之外发生的跳转或者元素被重新渲染，使用缓存的元素时会抛出 StaleElementReferenceException，
+    由调用方移除这个元素后重新查找；要求可见时只返回查找时可见的元素，命中时不再检查是否仍然可见
+    """
+
+    def __init__(self, driver: WebDriver):
+        self.driver = driver
+        self._elements = {}  # 定位元组 -> (WebElement, 查找时是否可见)
+        self._token = None  # 当前文档的标识
+        self._checked = False  # 失效点之后是否已经读取过文档标识
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.stale = 0
+        self.invalidations = 0
+
+    def get(self, web_element: tuple, must_be_visible=False) -> WebElement:
+        """获取缓存的元素，没有缓存或者要求可见但查找时不可见时返回 None"""
+        if not self._checked:
+            self._check_document()
+        with self._lock:
+            cached = self._elements.get(tuple(web_element))
+            if cached is None or (must_be_visible and not cached[1]):
+                self.misses += 1
+                return None
+            self.hits += 1
+            return cached[0]
+
+    def put(self, web_element: tuple, element: WebElement, visible=False):
+        """缓存元素，visible: 查找时是否确认过元素可见"""
+        if not isinstance(element, WebElement):
+            return
+        with self._lock:
+            self._elements[tuple(web_element)] = (element, visible)
+
+    def discard(self, web_element: tuple, stale=True) -> bool:
+        """移除一个元素（通常是元素已经失效），返回缓存中是否有这个元素"""
+        with self._lock:
+            removed = self._elements.pop(tuple(web_element), None) is not None
+            if removed and stale:
+                self.stale += 1
+            return removed
+
+    def clear(self):
+        """页面跳转、切换窗口或者 frame 后清空缓存"""
+        with self._lock:
+            if self._elements:
+                self.invalidations += 1
+            self._elements.clear()
+            self._token = None
+            self._checked = False
+
+    def invalidate(self):
+        """点击等可能跳转的操作之后调用：下一次查找时检查文档是否变化"""
+        self._checked = False
+
+    def _check_document(self):
+        """读取当前文档的标识，和缓存元素时的文档不同时清空缓存"""
+        try:
+            token = self.driver.execute_script(DOCUMENT_TOKEN_JS)
+        except WebDriverException:
+            # 页面正在跳转等情况下无法执行脚本，清空缓存，下一次查找时再检查
+            self.clear()
+            return
+        with self._lock:
+            if token != self._token:
+                if self._elements:
+                    self.invalidations += 1
+                self._elements.clear()
+                self._token = token
+            self._checked = True
+
+    def stats(self) -> dict:
+        """命中次数、未命中次数、失效的元素数量、清空次数以及命中率"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "stale": self.stale,
+                "invalidations": self.invalidations,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def get_element_cache(driver: WebDriver) -> ElementCache:
+    """获取驱动的元素缓存，同一个驱动的所有 page 共享一个缓存"""
+    cache = getattr(driver, "_element_cache", None)
+    if cache is None:
+        cache = ElementCache(driver)
+        driver._element_cache = cache
+    return cache
+
+
+def clear_element_cache(driver: WebDriver):
+    """清空驱动的元素缓存（没有开启缓存时什么都不做）"""
+    cache = getattr(driver, "_element_cache", None)
+    if cache is not None:
+        cache.clear()
+
+
+def invalidate_element_cache(driver: WebDriver):
+    """标记驱动的元素缓存需要在下一次查找时检查文档是否变化（没有开启缓存时什么都不做）"""
+    cache = getattr(driver, "_element_cache", None)
+    if cache is not None:
+        cache.invalidate()
@@ -0,0 +1,77 @@
+import os
+import time
+
+from selenium.common import TimeoutException, WebDriverException
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.wait import WebDriverWait
+
+from common.js_scripts import EVENT_WAIT_JS
+
+# 等待条件对应的轮询实现，事件驱动的等待因页面跳转或者脚本报错失效时回退使用
+POLLING_CONDITIONS = {
+    "present": lambda locator, text: EC.presence_of_element_located(locator),
+    "visible": lambda locator, text: EC.visibility_of_element_located(locator),
+    "gone": lambda locator, text: EC.invisibility_of_element_located(locator),
+    "text": lambda locator, text: EC.text_to_be_present_in_element(locator, text),
+}
+
+
+def get_wait_engine(name: str = None) -> str:
+    """
+    获取等待引擎：polling（WebDriverWait 轮询，默认）/ event（页面内事件驱动），没有指定时读取环境变量 TEST_WAIT_ENGINE
+    """
+    name = name or os.environ.get("TEST_WAIT_ENGINE") or "polling"
+    if name not in ("polling", "event"):
+        raise ValueError(f"不支持的等待引擎: {name}，可选值: polling, event")
+    return name
+
+
+class EventWaiter:
+    """
+    事件驱动的等待：在页面中注入 MutationObserver / requestAnimationFrame 监听，条件满足的瞬间通过 execute_async_script 返回，
+    没有 WebDriverWait 默认 0.5 秒轮询带来的平均 250ms 空等，也不会频繁向 driver 发送请求；
+    页面在等待过程中发生跳转时，回退到轮询方式等待剩余的时间
+    """
+
+    def __init__(self, driver: WebDriver, poll_frequency=0.5):
+        self.driver = driver
+        self.poll_frequency = poll_frequency
+        self._script_timeout = None
+
+    def wait(self, web_element: tuple, condition="present", timeout=20, text=None):
+        """
+        :param web_element: 定位元组，如 (By.ID, "element_id")
+        :param condition: present（存在）/ visible（可见）/ gone（不存在或不可见）/ text（元素文本包含 text）
+        :param timeout: 超时时间（秒）
+        :param text: condition 为 text 时期望包含的文本
+        :return: 满足条件的 WebElement，condition 为 gone 时返回 True
+        """
+        if condition not in POLLING_CONDITIONS:
+            raise ValueError(f"不支持的等待条件: {condition}")
+        deadline = time.monotonic() + timeout
+        self.ensure_script_timeout(timeout)
+        try:
+            result = self.driver.execute_async_script(EVENT_WAIT_JS, web_element[0], web_element[1], condition, text or "", int(timeout * 1000))
+        except WebDriverException:
+            # 等待过程中页面跳转（document unloaded）等情况，回退到轮询
+            result = {"status": "navigated", "element": None}
+        if result["status"] == "ok":
+            return result["element"] if condition != "gone" else True
+        if result["status"] == "timeout":
+            raise TimeoutException(f"元素 {web_element} 在 {timeout} 秒内没有满足条件: {condition}")
+        return self.poll(web_element, condition, max(0.0, deadline - time.monotonic()), text)
+
+    def poll(self, web_element: tuple, condition="present", timeout=20, text=None):
+        """使用 WebDriverWait 轮询等待"""
+        result = WebDriverWait(self.driver, timeout, poll_frequency=self.poll_frequency).until(
+            POLLING_CONDITIONS[condition](web_element, text)
+        )
+        return True if condition == "gone" else result
+
+    def ensure_script_timeout(self, timeout):
+        """异步脚本的超时时间需要大于等待时间，否则 driver 会先于页面中的计时器超时"""
+        required = timeout + 5
+        if self._script_timeout is None or self._script_timeout < required:
+            self.driver.set_script_timeout(required)
+            self._script_timeout = required
@@ -1,11 +1,92 @@
+import contextvars
+import os
+import threading
 import time
+from contextlib import contextmanager
 
 from selenium.webdriver.remote.webdriver import WebDriver
 
+from common.launch_profile import get_launch_profile
+from utils.common_utils import kill_process_tree
 
-class GlobalVar:
-    driver = None
-    driver_map = {}
+
+def quit_drivers(drivers: dict, timeout: float = None) -> float:
+    """
+    并发退出多个驱动，每个驱动最多等待 timeout 秒，超时后强制结束驱动服务及其启动的浏览器进程
+    drivers: {角色: 驱动}
+    timeout: 单个驱动退出的超时时间（秒），默认读取环境变量 TEST_QUIT_TIMEOUT，没有时为 10 秒
+    :return: 退出所有驱动的总耗时（秒），即最慢的那一个驱动的耗时
+    """
+    timeout = timeout if timeout is not None else float(os.environ.get("TEST_QUIT_TIMEOUT", "10"))
+    start = time.perf_counter()
+
+    def quit_driver(role, driver):
+        try:
+            driver.quit()
+        except Exception as e:
+            print(f"退出驱动失败:{role},{e}")
+
+    # 使用守护线程，卡死的 quit 不会阻止进程退出
+    threads = {}
+    for role, driver in drivers.items():
+        thread = threading.Thread(target=quit_driver, args=(role, driver), name=f"quit-{role}", daemon=True)
+        thread.start()
+        threads[role] = thread
+    deadline = start + timeout
+    for role, thread in threads.items():
+        thread.join(max(0.0, deadline - time.perf_counter()))
+        if thread.is_alive():
+            print(f"退出驱动超时（{timeout}s），强制结束驱动进程:{role}")
+            service = getattr(drivers[role], "service", None)
+            process = getattr(service, "process", None)
+            if process is not None:
+                kill_process_tree(process.pid)
+    return time.perf_counter() - start
+
+
+class _DriverState:
+    """一个会话上下文中的驱动状态：当前使用的驱动 + 各个角色的驱动"""
+
+    def __init__(self, driver_map=None, driver=None):
+        self.driver_map = {} if driver_map is None else driver_map
+        self.driver = driver
+
+
+# 进程级别的默认状态，没有通过 GlobalVar.session 开启独立上下文的线程都使用这个状态（与之前的全局变量行为一致）
+_root_state = _DriverState()
+_current_state = contextvars.ContextVar("global_var_driver_state", default=_root_state)
+
+
+class _GlobalVarMeta(type):
+    """让 GlobalVar.driver / GlobalVar.driver_map 读写的是当前上下文中的状态"""
+
+    @property
+    def driver(cls):
+        return _current_state.get().driver
+
+    @driver.setter
+    def driver(cls, driver):
+        _current_state.get().driver = driver
+
+    @property
+    def driver_map(cls):
+        return _current_state.get().driver_map
+
+    @driver_map.setter
+    def driver_map(cls, driver_map):
+        _current_state.get().driver_map = driver_map
+
+
+class GlobalVar(metaclass=_GlobalVarMeta):
+    """
+    驱动注册表：driver / driver_map 按上下文（contextvars）隔离
+    默认所有线程共享同一个状态；需要在一个进程中同时驱动多个浏览器时（如买家、卖家并发操作），
+    每个线程通过 GlobalVar.session / GlobalVar.run_with_driver 开启自己的上下文，各自的当前驱动互不影响：
+
+        with ThreadPoolExecutor() as executor:
+            executor.submit(GlobalVar.run_with_driver, "buyer", buyer_flow)
+            executor.submit(GlobalVar.run_with_driver, "seller", seller_flow)
+    """
 
     @classmethod
     def get_driver(cls) -> "WebDriver":
@@ -25,34 +106,86 @@ class GlobalVar:
 
     @classmethod
     def get_driver_map(cls, driver_role):
-        return cls.driver_map[driver_role]
+        return cls.driver_map.get(driver_role, None)
 
     @classmethod
-    def switch_driver(cls, driver_role):
-        if cls.driver_map.get(driver_role, None) is not None:
+    def switch_driver(cls, driver_role, bring_to_front: bool = None):
+        """
+        切换当前使用的驱动
+        driver_role: 角色
+        bring_to_front: 是否将切换后的浏览器窗口显示到最前面（最小化当前窗口、最大化目标窗口），
+                        默认只在有界面的启动配置下进行，无头模式下窗口不可见，不需要这两次操作
+        """
+        target = cls.driver_map.get(driver_role, None)
+        if target is None:
+            return
+        if bring_to_front is None:
+            bring_to_front = not get_launch_profile().headless
+        if bring_to_front and cls.driver is not None and cls.driver is not target:
             try:
                 cls.driver.minimize_window()
             except Exception as e:
                 print(f"警告：并不能将当前启动最小号 {e}")
-            cls.driver = cls.driver_map.get(driver_role, None)
-            time.sleep(1)
+        cls.driver = target
+        if bring_to_front:
             cls.driver.maximize_window()
 
     @classmethod
-    def cleanup_single_driver(cls, driver_role):
+    @contextmanager
+    def session(cls, driver_role=None, isolated=False):
+        """
+        开启一个独立的驱动上下文，上下文中切换驱动不会影响其他线程
+        driver_role: 上下文中默认使用的驱动角色，为 None 时沿用外层上下文的当前驱动
+        isolated: 为 True 时使用一个全新的空驱动表，否则复制一份外层上下文的驱动表（浅拷贝，可以使用外层已经启动的各个角色的驱动）
+        上下文中的驱动表是独立的：上下文中 set_driver_map / release_driver / cleanup_driver 不会增加或者移除外层上下文中的角色，
+        在上下文中启动的驱动需要在上下文中退出
+        """
+        parent = _current_state.get()
+        driver_map = {} if isolated else dict(parent.driver_map)
+        driver = driver_map.get(driver_role) if driver_role else (None if isolated else parent.driver)
+        token = _current_state.set(_DriverState(driver_map, driver))
         try:
-            driver = cls.driver_map.pop(driver_role, None)
-            if driver:
-                driver.quit()
-        except Exception as e:
-            print(f"退出驱动失败:{driver_role},{e}")
+            yield cls
+        finally:
+            _current_state.reset(token)
 
     @classmethod
-    def cleanup_driver(cls):
-        for key, value in cls.driver_map.items():
-            try:
-                value.quit()
-            except Exception as e:
-                print(f"退出驱动失败:{key},{e}")
-            cls.driver_map = {}
+    def run_with_driver(cls, driver_role, func, *args, **kwargs):
+        """在以 driver_role 为当前驱动的独立上下文中执行 func，用于多线程并发驱动多个浏览器"""
+        with cls.session(driver_role):
+            return func(*args, **kwargs)
+
+    @classmethod
+    def cleanup_single_driver(cls, driver_role, timeout: float = None):
+        driver = cls.driver_map.pop(driver_role, None)
+        if driver is None:
+            return
+        if driver is cls.driver:
             cls.driver = None
+        quit_drivers({driver_role: driver}, timeout)
+
+    @classmethod
+    def release_driver(cls, driver_role):
+        """
+        将驱动从 GlobalVar 中移除但不退出浏览器（例如归还给浏览器池），返回被移除的驱动
+        """
+        driver = cls.driver_map.pop(driver_role, None)
+        if driver is not None and driver is cls.driver:
+            cls.driver = None
+        return driver
+
+    @classmethod
+    def cleanup_driver(cls, timeout: float = None) -> float:
+        """
+        并发退出所有角色的驱动，耗时取决于最慢的那一个驱动，而不是所有驱动耗时之和
+        timeout: 单个驱动退出的超时时间（秒），超时后强制结束驱动进程
+        :return: 退出驱动的耗时（秒）
+        """
+        drivers = dict(cls.driver_map)
+        cls.driver_map.clear()
+        cls.driver = None
+        if not drivers:
+            return 0.0
+        elapsed = quit_drivers(drivers, timeout)
+        print(f"退出 {len(drivers)} 个驱动耗时 {elapsed:.2f}s")
+        return elapsed
@@ -0,0 +1,462 @@
+# BrowserOperator 中注入到页面执行的 JavaScript 脚本
+
+# 在页面中按 selenium 的定位方式查找元素的公共函数，其他脚本拼接在它后面使用
+LOCATOR_JS = """
+const __findAll = (by, value, root) => {
+    root = root || document;
+    switch (by) {
+        case 'css selector':
+            return Array.from(root.querySelectorAll(value));
+        case 'xpath': {
+            const snapshot = document.evaluate(value, root, null, XPathResult.ORDERED_NODE_SNAPSHOT_TYPE, null);
+            const nodes = [];
+            for (let i = 0; i < snapshot.snapshotLength; i++) nodes.push(snapshot.snapshotItem(i));
+            return nodes;
+        }
+        case 'id':
+            return Array.from(root.querySelectorAll('[id="' + CSS.escape(value) + '"]'));
+        case 'name':
+            return Array.from(root.querySelectorAll('[name="' + CSS.escape(value) + '"]'));
+        // shadow root 没有 getElementsByClassName / getElementsByTagName，统一使用 querySelectorAll
+        case 'class name':
+            return Array.from(root.querySelectorAll('.' + CSS.escape(value)));
+        case 'tag name':
+            return Array.from(root.querySelectorAll(value));
+        case 'link text':
+            return Array.from(root.querySelectorAll('a')).filter(a => a.innerText.trim() === value);
+        case 'partial link text':
+            return Array.from(root.querySelectorAll('a')).filter(a => a.innerText.includes(value));
+        default:
+            throw new Error('不支持的定位方式: ' + by);
+    }
+};
+const __find = (by, value, root) => __findAll(by, value, root)[0] || null;
+const __isVisible = (el) => {
+    if (!el || !el.isConnected) return false;
+    const style = window.getComputedStyle(el);
+    if (style.display === 'none' || style.visibility === 'hidden' || style.opacity === '0') return false;
+    const rect = el.getBoundingClientRect();
+    return rect.width > 0 && rect.height > 0;
+};
+const __describe = (el) => ({
+    element: el,
+    visible: __isVisible(el),
+    text: el.innerText !== undefined ? el.innerText : el.textContent,
+    value: 'value' in el ? el.value : null,
+});
+"""
+
+# 当前文档的随机标识（第一次调用时生成），页面跳转后是新的文档，标识也会变化；不同窗口、frame 中的文档标识也不同
+DOCUMENT_TOKEN_JS = """
+if (!document.__docId) document.__docId = Math.random().toString(36).slice(2) + Date.now().toString(36);
+return document.__docId;
+"""
+
+# 一次查找多个元素，返回 {name: {element, visible, text, value}}，没有找到的元素不返回
+RESOLVE_MANY_JS = LOCATOR_JS + """
+const locators = arguments[0];
+const result = {};
+for (const [name, locator] of Object.entries(locators)) {
+    const el = __find(locator[0], locator[1]);
+    if (el) result[name] = __describe(el);
+}
+return result;
+"""
+
+# 事件驱动的等待：通过 MutationObserver 监听 DOM 变化、requestAnimationFrame 监听样式变化，条件满足时立即返回
+# 参数: by, value, condition(present/visible/gone/text), expected_text, timeout_ms
+# 返回: {status: ok/timeout/navigated, element}
+EVENT_WAIT_JS = LOCATOR_JS + """
+const [by, value, condition, expected, timeoutMs] = arguments;
+const done = arguments[arguments.length - 1];
+const check = () => {
+    const el = __find(by, value);
+    switch (condition) {
+        case 'present':
+            return el ? {element: el} : null;
+        case 'visible':
+            return el && __isVisible(el) ? {element: el} : null;
+        case 'gone':
+            return !el || !__isVisible(el) ? {element: null} : null;
+        case 'text': {
+            const text = el ? (el.innerText !== undefined ? el.innerText : el.textContent) : '';
+            return el && text.includes(expected) ? {element: el} : null;
+        }
+        default:
+            throw new Error('不支持的等待条件: ' + condition);
+    }
+};
+const first = check();
+if (first) {
+    done({status: 'ok', element: first.element});
+} else {
+    let finished = false, frame = null, timer = null, observer = null;
+    const finish = (result) => {
+        if (finished) return;
+        finished = true;
+        if (observer) observer.disconnect();
+        if (frame !== null) cancelAnimationFrame(frame);
+        clearTimeout(timer);
+        window.removeEventListener('pagehide', onLeave);
+        done(result);
+    };
+    const onChange = () => {
+        const matched = check();
+        if (matched) finish({status: 'ok', element: matched.element});
+    };
+    // 页面跳转时当前文档中的监听会失效，通知调用方回退到轮询
+    const onLeave = () => finish({status: 'navigated', element: null});
+    observer = new MutationObserver(onChange);
+    observer.observe(document.documentElement, {childList: true, subtree: true, attributes: true, characterData: true});
+    // 可见性可能由 CSS 动画/布局变化引起，不会触发 DOM 变化，需要逐帧检查
+    if (condition === 'visible' || condition === 'gone') {
+        const tick = () => {
+            onChange();
+            if (!finished) frame = requestAnimationFrame(tick);
+        };
+        frame = requestAnimationFrame(tick);
+    }
+    window.addEventListener('pagehide', onLeave);
+    timer = setTimeout(() => finish({status: 'timeout', element: null}), timeoutMs);
+}
+"""
+
+# 记录页面中正在进行的 fetch / XHR 请求（重复注入时不会重复记录）
+NETWORK_TRACKER_JS = """
+(() => {
+    if (window.__networkTracker) return;
+    const tracker = window.__networkTracker = {pending: new Map(), nextId: 0, lastActivity: performance.now()};
+    const begin = () => {
+        const id = tracker.nextId++;
+        tracker.pending.set(id, performance.now());
+        tracker.lastActivity = performance.now();
+        return id;
+    };
+    const end = (id) => {
+        tracker.pending.delete(id);
+        tracker.lastActivity = performance.now();
+    };
+    if (window.fetch) {
+        const originalFetch = window.fetch;
+        window.fetch = function () {
+            const id = begin();
+            return originalFetch.apply(this, arguments).finally(() => end(id));
+        };
+    }
+    const originalSend = XMLHttpRequest.prototype.send;
+    XMLHttpRequest.prototype.send = function () {
+        const id = begin();
+        this.addEventListener('loadend', () => end(id), {once: true});
+        return originalSend.apply(this, arguments);
+    };
+})();
+"""
+
+# 等待页面就绪：文档加载完成、网络请求（fetch/XHR/资源加载）空闲 idle_ms、没有正在播放的有限动画、前端框架空闲
+# 参数: idle_ms, timeout_ms, long_request_ms（超过这个时长的请求视为长连接/轮询，不计入网络繁忙）
+# 返回: {status: ok/timeout, elapsed, pending}
+PAGE_READY_JS = NETWORK_TRACKER_JS + """
+const [idleMs, timeoutMs, longRequestMs] = arguments;
+const done = arguments[arguments.length - 1];
+const start = performance.now();
+const tracker = window.__networkTracker;
+let resourceCount = performance.getEntriesByType('resource').length;
+const pendingRequests = () => {
+    const now = performance.now();
+    let count = 0;
+    tracker.pending.forEach((startedAt) => { if (now - startedAt < longRequestMs) count++; });
+    return count;
+};
+const animating = () => {
+    if (!document.getAnimations) return false;
+    return document.getAnimations().some(animation => {
+        const timing = animation.effect && animation.effect.getComputedTiming ? animation.effect.getComputedTiming() : {};
+        return animation.playState === 'running' && timing.iterations !== Infinity;
+    });
+};
+const frameworkBusy = () => {
+    try {
+        if (window.jQuery && window.jQuery.active > 0) return true;
+        if (window.getAllAngularTestabilities && window.getAllAngularTestabilities().some(t => !t.isStable())) return true;
+    } catch (e) {}
+    return false;
+};
+const check = () => {
+    const now = performance.now();
+    // 资源加载（图片、脚本、样式等）没有事件可以监听，通过 Resource Timing 的条目数量变化判断是否有新的资源加载完成
+    const currentResources = performance.getEntriesByType('resource').length;
+    if (currentResources !== resourceCount) {
+        resourceCount = currentResources;
+        tracker.lastActivity = now;
+    }
+    const pending = pendingRequests();
+    if (document.readyState === 'complete' && pending === 0 && now - tracker.lastActivity >= idleMs && !animating() && !frameworkBusy()) {
+        done({status: 'ok', elapsed: now - start, pending: 0});
+    } else if (now - start >= timeoutMs) {
+        done({status: 'timeout', elapsed: now - start, pending: pending});
+    } else {
+        setTimeout(check, 50);
+    }
+};
+check();
+"""
+
+# 表单字段读写的公共函数
+# __readValue: 复选框/单选框返回 checked，多选下拉框返回选中的 value 列表，其他输入框返回 value，富文本返回文本
+# __writeValue: 通过原型上的原生 setter 赋值并触发 input/change 事件（React 等框架会在元素实例上覆盖 value 的 setter，
+#               直接赋值不会触发框架的数据绑定），返回写入后期望读到的值
+FORM_JS = LOCATOR_JS + """
+const __nativeSetter = (el, prop) => {
+    for (let proto = Object.getPrototypeOf(el); proto; proto = Object.getPrototypeOf(proto)) {
+        const descriptor = Object.getOwnPropertyDescriptor(proto, prop);
+        if (descriptor && descriptor.set) return descriptor.set;
+    }
+    return null;
+};
+const __fire = (el, type) => el.dispatchEvent(new Event(type, {bubbles: true}));
+const __isToggle = (el) => el.tagName === 'INPUT' && ['checkbox', 'radio'].includes((el.type || '').toLowerCase());
+const __readValue = (el) => {
+    if (__isToggle(el)) return el.checked;
+    if (el.tagName === 'SELECT' && el.multiple) return Array.from(el.selectedOptions).map(option => option.value);
+    if (['INPUT', 'SELECT', 'TEXTAREA'].includes(el.tagName)) return el.value;
+    if (el.isContentEditable) return el.innerText;
+    return 'value' in el ? el.value : el.textContent;
+};
+const __writeValue = (el, value) => {
+    el.focus();
+    if (__isToggle(el)) {
+        // 通过点击切换状态，会触发 click/input/change 事件以及框架的点击监听
+        value = Boolean(value);
+        if (el.checked !== value) el.click();
+    } else if (el.tagName === 'SELECT') {
+        // 下拉框的值可以是 option 的 value，也可以是 option 的文本
+        const toValue = (item) => {
+            const option = Array.from(el.options).find(o => o.value === item) || Array.from(el.options).find(o => o.text.trim() === item);
+            return option ? option.value : item;
+        };
+        if (el.multiple) {
+            value = (Array.isArray(value) ? value : [value]).map(toValue);
+            Array.from(el.options).forEach(option => { option.selected = value.includes(option.value); });
+        } else {
+            value = toValue(value);
+            __nativeSetter(el, 'value').call(el, value);
+        }
+        __fire(el, 'input');
+        __fire(el, 'change');
+    } else if (el.isContentEditable) {
+        el.innerText = value;
+        __fire(el, 'input');
+    } else {
+        const setter = __nativeSetter(el, 'value');
+        if (setter) setter.call(el, value); else el.value = value;
+        __fire(el, 'input');
+        __fire(el, 'change');
+    }
+    el.blur();
+    return value;
+};
+const __sameValue = (actual, expected) => {
+    if (Array.isArray(expected)) return JSON.stringify([...actual].sort()) === JSON.stringify([...expected].sort());
+    return actual === expected;
+};
+"""
+
+# 批量填写表单：参数 fields 为 [[by, value, 字段的值], ...]
+# 所有字段写入完成后统一读取校验（字段的 change 事件可能会修改其他字段）
+# 返回: 与 fields 顺序一致的 [{found, ok, actual}]
+FILL_FORM_JS = FORM_JS + """
+const fields = arguments[0];
+const targets = fields.map(([by, value, fieldValue]) => {
+    const el = __find(by, value);
+    return el ? {el: el, expected: __writeValue(el, fieldValue)} : null;
+});
+return targets.map(target => {
+    if (!target) return {found: false, ok: false, actual: null};
+    const actual = __readValue(target.el);
+    return {found: true, ok: __sameValue(actual, target.expected), actual: actual};
+});
+"""
+
+# 批量读取表单：参数 fields 为 [[by, value], ...]，返回与 fields 顺序一致的 [{found, value}]
+READ_FORM_JS = FORM_JS + """
+return arguments[0].map(([by, value]) => {
+    const el = __find(by, value);
+    return el ? {found: true, value: __readValue(el)} : {found: false, value: null};
+});
+"""
+
+# 提取表格/列表的数据，参数: 表格元素, 行的 css 选择器, 单元格的 css 选择器, 列（表头文本或索引）, 起始行, 行数（0 表示全部）
+# 默认支持 <table>（表头取 thead 的最后一行或者全部是 th 的第一行）以及 role=row/cell 的表格，其他元素把子元素作为行、行的子元素作为单元格
+# 返回: {headers, total, rows: [[单元格文本]]}，列不存在时返回 {error, headers}
+TABLE_JS = """
+const [table, rowSelector, cellSelector, columns, start, count] = arguments;
+const cellsOf = (row) => {
+    if (cellSelector) return Array.from(row.querySelectorAll(cellSelector));
+    if (row.cells) return Array.from(row.cells);
+    const cells = row.querySelectorAll('[role=cell], [role=gridcell], [role=columnheader], [role=rowheader]');
+    return cells.length ? Array.from(cells) : Array.from(row.children);
+};
+const textOf = (cell) => (cell.innerText !== undefined ? cell.innerText : cell.textContent).trim();
+let headerRow = null;
+let rows;
+if (table.tagName === 'TABLE') {
+    if (table.tHead && table.tHead.rows.length) headerRow = table.tHead.rows[table.tHead.rows.length - 1];
+    rows = rowSelector ? Array.from(table.querySelectorAll(rowSelector)) : Array.from(table.tBodies).flatMap(body => Array.from(body.rows));
+    if (!headerRow && rows.length && rows[0].cells && rows[0].cells.length && Array.from(rows[0].cells).every(cell => cell.tagName === 'TH')) headerRow = rows[0];
+} else {
+    rows = Array.from(table.querySelectorAll(rowSelector || '[role=row]'));
+    if (!rows.length && !rowSelector) rows = Array.from(table.children);
+    headerRow = rows.find(row => row.querySelector('[role=columnheader]')) || null;
+}
+rows = rows.filter(row => row !== headerRow && !(table.tHead && table.tHead.contains(row)));
+const headers = headerRow ? cellsOf(headerRow).map(textOf) : [];
+let indexes = null;
+if (columns) {
+    indexes = columns.map(column => typeof column === 'number' ? column : headers.indexOf(column));
+    const missing = columns.filter((column, i) => indexes[i] < 0);
+    if (missing.length) return {error: '表头中没有这些列: ' + missing.join(', '), headers: headers};
+}
+const selected = rows.slice(start, count > 0 ? start + count : undefined).map(row => {
+    const cells = cellsOf(row).map(textOf);
+    return indexes ? indexes.map(i => i < cells.length ? cells[i] : null) : cells;
+});
+return {headers: headers, total: rows.length, rows: selected};
+"""
+
+# 虚拟列表/无限滚动列表的一步：读取新渲染出来的行，向下滚动 step 像素，等待列表渲染稳定后再读取一次新的行
+# 参数: 滚动容器（null 表示整个页面）, 行的 css 选择器, 作为行 key 的属性, 单元格的 css 选择器, 流的 id, 滚动步长（0 表示容器高度的 90%）,
+#       稳定时间 settle_ms（DOM 变化后多久没有新的变化认为渲染完成）, 加载超时 load_ms（滚动到底部后等待懒加载的时间）
+# 已经返回过的行（按 key）记录在 window.__listStreams[流的 id] 中，不会重复序列化
+# 返回: {rows: [{key, text, cells}], exhausted: 是否已经到底并且没有新的数据}
+LIST_STREAM_JS = """
+const [container, rowSelector, keyAttribute, cellSelector, streamId, step, settleMs, loadMs] = arguments;
+const done = arguments[arguments.length - 1];
+const scroller = container || document.scrollingElement || document.documentElement;
+const root = container || document.body;
+const streams = window.__listStreams = window.__listStreams || {};
+const seen = streams[streamId] = streams[streamId] || new Set();
+const textOf = (el) => (el.innerText !== undefined ? el.innerText : el.textContent).trim();
+const keyOf = (row) => {
+    if (keyAttribute) return row.getAttribute(keyAttribute);
+    for (const name of ['data-key', 'data-id', 'data-row-key', 'data-index', 'aria-rowindex', 'id']) {
+        if (row.hasAttribute(name)) return row.getAttribute(name);
+    }
+    return textOf(row);
+};
+const rows = [];
+const collect = () => {
+    for (const row of root.querySelectorAll(rowSelector)) {
+        const key = keyOf(row);
+        if (key === null || seen.has(key)) continue;
+        seen.add(key);
+        const cells = cellSelector ? Array.from(row.querySelectorAll(cellSelector)) : Array.from(row.children);
+        rows.push({key: key, text: textOf(row), cells: cells.map(textOf)});
+    }
+};
+collect();
+const collected = rows.length;
+const height = scroller.scrollHeight;
+const before = scroller.scrollTop;
+const atBottom = before + scroller.clientHeight >= scroller.scrollHeight - 2;
+if (!atBottom) scroller.scrollTop = before + (step > 0 ? step : Math.max(1, Math.floor(scroller.clientHeight * 0.9)));
+const moved = scroller.scrollTop !== before;
+let mutated = false;
+let lastChange = performance.now();
+const start = performance.now();
+const observer = new MutationObserver(() => { mutated = true; lastChange = performance.now(); });
+// 只监听行所在的容器，页面其他位置的时钟、加载动画不会影响等待
+const firstRow = root.querySelector(rowSelector);
+observer.observe(container || (firstRow && firstRow.parentElement) || root, {childList: true, subtree: true, characterData: true});
+// 没有滚动到底部时只需要等待虚拟列表重新渲染；已经在底部时等待懒加载的数据；容器一直变化时最多等待 loadMs，返回已经读取到的行
+const waitMs = atBottom || !moved ? loadMs : settleMs;
+const check = () => {
+    const now = performance.now();
+    if ((mutated && now - lastChange >= settleMs) || (!mutated && now - start >= waitMs) || now - start >= loadMs) {
+        observer.disconnect();
+        collect();
+        // 到底部后没有读取到新的行、列表高度也没有变化时，认为已经没有更多数据
+        done({rows: rows, exhausted: (atBottom || !moved) && rows.length === collected && scroller.scrollHeight === height});
+    } else {
+        setTimeout(check, 20);
+    }
+};
+setTimeout(check, 20);
+"""
+
+# 定位方式的耗时分析：在页面中重复执行 iterations 次定位，返回平均耗时和匹配数量，
+# 并为匹配到的第一个元素生成更快的候选定位（id、测试属性、name、class 等），只保留唯一匹配到同一个元素的候选
+# 返回: {cost_ms, matches, suggestions: [{by, value, cost_ms}]}
+LOCATOR_COST_JS = LOCATOR_JS + """
+const [by, value, iterations] = arguments;
+const measure = (locatorBy, locatorValue) => {
+    let found = [];
+    const start = performance.now();
+    for (let i = 0; i < iterations; i++) found = __findAll(locatorBy, locatorValue);
+    return {cost: (performance.now() - start) / iterations, found: found};
+};
+const quote = (text) => '"' + text.replace(/\\\\/g, '\\\\\\\\').replace(/"/g, '\\\\"') + '"';
+const base = measure(by, value);
+const target = base.found[0] || null;
+const suggestions = [];
+if (target) {
+    const tag = target.tagName.toLowerCase();
+    const candidates = [];
+    if (target.id) candidates.push(['id', target.id]);
+    for (const attribute of ['data-testid', 'data-test', 'data-qa', 'data-cy', 'name', 'aria-label', 'placeholder', 'title']) {
+        if (target.hasAttribute(attribute)) candidates.push(['css selector', tag + '[' + attribute + '=' + quote(target.getAttribute(attribute)) + ']']);
+    }
+    const classes = Array.from(target.classList).map(name => '.' + CSS.escape(name)).join('');
+    if (classes) candidates.push(['css selector', tag + classes]);
+    const anchor = target.parentElement ? target.parentElement.closest('[id]') : null;
+    if (anchor) candidates.push(['css selector', '#' + CSS.escape(anchor.id) + ' ' + tag + classes]);
+    for (const [candidateBy, candidateValue] of candidates) {
+        if (candidateBy === by && candidateValue === value) continue;
+        let result;
+        try {
+            result = measure(candidateBy, candidateValue);
+        } catch (e) {
+            continue;
+        }
+        if (result.found.length === 1 && result.found[0] === target) {
+            suggestions.push({by: candidateBy, value: candidateValue, cost_ms: result.cost});
+        }
+    }
+    suggestions.sort((a, b) => a.cost_ms - b.cost_ms);
+}
+return {cost_ms: base.cost, matches: base.found.length, suggestions: suggestions};
+"""
+
+# 在一次脚本调用中依次穿过 shadow host（css 选择器）进入最内层的 shadow root，并在其中按 (by, value) 查找元素
+# 参数: shadow host 列表, by, value, 是否要求可见, 是否返回所有元素
+# 返回: 元素（或者元素列表），没有找到/不满足可见性时返回 null
+SHADOW_FIND_JS = LOCATOR_JS + """
+const [hosts, by, value, mustBeVisible, findAll] = arguments;
+let root = document;
+for (const selector of hosts) {
+    const host = root.querySelector(selector);
+    if (!host || !host.shadowRoot) return null;
+    root = host.shadowRoot;
+}
+const found = __findAll(by, value, root);
+if (findAll) {
+    if (!found.length || (mustBeVisible && !found.every(__isVisible))) return null;
+    return found;
+}
+const el = found[0] || null;
+return el && (!mustBeVisible || __isVisible(el)) ? el : null;
+"""
+
+# 视觉比较时计算截图区域和忽略区域的位置（视口坐标，CSS 像素）
+# 参数: 截图的元素（为 null 时截取整个视口）, 忽略的元素列表
+# 返回: {target: 截图区域, ignore: [忽略区域]}，区域为 {x, y, width, height}
+VISUAL_RECTS_JS = """
+const [target, ignored] = arguments;
+const __rect = (el) => {
+    const rect = el.getBoundingClientRect();
+    return {x: rect.left, y: rect.top, width: rect.width, height: rect.height};
+};
+return {
+    target: target ? __rect(target) : {x: 0, y: 0, width: window.innerWidth, height: window.innerHeight},
+    ignore: ignored.map(__rect),
+};
+"""
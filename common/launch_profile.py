@@ -0,0 +1,77 @@
+import os
+
+from selenium.webdriver.chromium.options import ChromiumOptions
+
+
+class LaunchProfile:
+    """
+    浏览器启动配置，决定浏览器以什么方式启动（是否无头、页面加载策略、是否加载图片等）
+    """
+
+    def __init__(self, name, headless=False, maximize=True, page_load_strategy="normal", block_images=False,
+                 window_size=None, arguments=None):
+        """
+        name: 配置名称
+        headless: 是否使用无头模式（没有显示器的 Linux CI 机器需要开启）
+        maximize: 启动后是否最大化窗口
+        page_load_strategy: 页面加载策略 normal（等待所有资源加载完成）/ eager（DOM 加载完成即返回）/ none
+        block_images: 是否禁止加载图片
+        window_size: 窗口大小，如 (1920, 1080)，无头模式下没有最大化的概念，需要指定窗口大小
+        arguments: 额外的浏览器启动参数
+        """
+        self.name = name
+        self.headless = headless
+        self.maximize = maximize
+        self.page_load_strategy = page_load_strategy
+        self.block_images = block_images
+        self.window_size = window_size
+        self.arguments = arguments or []
+
+    def apply(self, options: ChromiumOptions, prefs: dict):
+        """将启动配置写入 Chrome/Edge 的 options 和 prefs 中"""
+        options.page_load_strategy = self.page_load_strategy
+        if self.headless:
+            options.add_argument('--headless=new')
+        if self.maximize:
+            options.add_argument('--start-maximized')
+        if self.window_size:
+            options.add_argument(f'--window-size={self.window_size[0]},{self.window_size[1]}')
+        if self.block_images:
+            prefs['profile.managed_default_content_settings.images'] = 2  # 禁止加载图片（2表示阻止）
+        for argument in self.arguments:
+            options.add_argument(argument)
+        return options
+
+
+# 精简浏览器功能，缩短启动时间和页面加载时间
+TRIMMED_ARGUMENTS = [
+    '--disable-gpu',  # 禁用 GPU 合成
+    '--disable-extensions',  # 禁用扩展
+    '--disable-background-networking',  # 禁用后台网络请求（更新检查、预取等）
+    '--disable-component-update',  # 禁用组件更新
+    '--disable-default-apps',  # 禁用默认应用
+    '--disable-sync',  # 禁用同步
+    '--no-first-run',  # 跳过首次运行向导
+    '--mute-audio',  # 静音
+    '--disable-dev-shm-usage',  # Linux 容器中 /dev/shm 空间较小，避免浏览器崩溃
+]
+
+LAUNCH_PROFILES = {
+    # 默认配置：有界面、最大化、开启浏览器的所有默认功能
+    "full": LaunchProfile("full"),
+    # 无头快速模式：适用于没有显示器的 CI 机器，DOM 加载完成即返回、不加载图片、关闭不需要的浏览器功能
+    "headless-fast": LaunchProfile("headless-fast", headless=True, maximize=False, page_load_strategy="eager",
+                                   block_images=True, window_size=(1920, 1080), arguments=TRIMMED_ARGUMENTS),
+    # 调试模式：有界面并自动打开开发者工具
+    "debug": LaunchProfile("debug", arguments=['--auto-open-devtools-for-tabs']),
+}
+
+
+def get_launch_profile(name: str = None) -> LaunchProfile:
+    """
+    获取启动配置，没有指定名称时读取环境变量 TEST_LAUNCH_PROFILE，默认为 full
+    """
+    name = name or os.environ.get("TEST_LAUNCH_PROFILE") or "full"
+    if name not in LAUNCH_PROFILES:
+        raise ValueError(f"不支持的启动配置: {name}，可选值: {', '.join(LAUNCH_PROFILES)}")
+    return LAUNCH_PROFILES[name]
@@ -0,0 +1,137 @@
+import json
+import os
+import threading
+from pathlib import Path
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from common.js_scripts import LOCATOR_COST_JS
+from utils.common_utils import get_worker_id
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+
+def locator_profile_enabled() -> bool:
+    """是否开启定位方式耗时分析，由 run.py 的 --locator-profile 通过环境变量 TEST_LOCATOR_PROFILE（输出目录）开启"""
+    return bool(os.environ.get("TEST_LOCATOR_PROFILE"))
+
+
+class LocatorProfiler:
+    """
+    定位方式耗时分析：记录每个 page 使用的定位元组，第一次使用时在页面中测量定位的耗时和匹配数量，
+    标记耗时高（slow）、匹配多个元素（ambiguous）、没有匹配（not_found）以及包含 //* 或 contains() 的 XPath（xpath_scan），
+    并给出经过验证（唯一匹配同一个元素）的更快的 id / css 定位
+    """
+
+    def __init__(self, iterations=20, slow_ms=1.0):
+        """
+        iterations: 每个定位在页面中重复执行的次数，取平均耗时
+        slow_ms: 平均耗时超过多少毫秒认为是慢定位
+        """
+        self.iterations = iterations
+        self.slow_ms = slow_ms
+        self.records = {}
+        self._lock = threading.Lock()
+
+    def observe(self, driver: WebDriver, page: str, web_element: tuple):
+        """
+        记录 page 中使用了一次 web_element，第一次使用时在页面中测量（需要在元素已经出现之后调用）
+        分析失败不会影响 case 的执行
+        """
+        key = (page, web_element[0], web_element[1])
+        with self._lock:
+            record = self.records.get(key)
+            if record is not None:
+                record["uses"] += 1
+                return
+            record = self.records[key] = {"page": page, "by": web_element[0], "value": web_element[1], "uses": 1}
+        try:
+            result = driver.execute_script(LOCATOR_COST_JS, web_element[0], web_element[1], self.iterations)
+        except Exception as e:
+            logger.warning(f"分析定位 {web_element} 的耗时失败: {e}")
+            return
+        flags = []
+        if result["cost_ms"] >= self.slow_ms:
+            flags.append("slow")
+        if result["matches"] > 1:
+            flags.append("ambiguous")
+        if result["matches"] == 0:
+            flags.append("not_found")
+        if web_element[0] == "xpath" and ("//*" in web_element[1] or "contains(" in web_element[1]):
+            flags.append("xpath_scan")
+        suggestions = [suggestion for suggestion in result["suggestions"] if suggestion["cost_ms"] < result["cost_ms"]]
+        with self._lock:
+            record.update({
+                "cost_ms": round(result["cost_ms"], 4),
+                "matches": result["matches"],
+                "flags": flags,
+                "suggestions": [{**suggestion, "cost_ms": round(suggestion["cost_ms"], 4)} for suggestion in suggestions[:3]],
+            })
+
+    def to_dict(self):
+        with self._lock:
+            return {"worker": get_worker_id(), "locators": [dict(record) for record in self.records.values() if "cost_ms" in record]}
+
+    def save(self, report_dir):
+        """写入 report_dir/<worker>.json，没有记录任何定位时不写入"""
+        data = self.to_dict()
+        if not data["locators"]:
+            return None
+        report_dir = Path(report_dir)
+        report_dir.mkdir(parents=True, exist_ok=True)
+        path = report_dir / f"{get_worker_id()}.json"
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4, ensure_ascii=False)
+        return path
+
+    @staticmethod
+    def merge_reports(report_dir) -> dict:
+        """
+        合并所有 worker 的分析结果，按 page 分组，每个 page 中按 总耗时（平均耗时 * 使用次数）从高到低排序
+        同一个定位在多个 worker 中出现时，使用次数累加，耗时取最大值
+        """
+        merged = {}
+        for path in sorted(Path(report_dir).glob("*.json")):
+            if path.name == "report.json":
+                continue
+            try:
+                with open(path, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for record in data["locators"]:
+                key = (record["page"], record["by"], record["value"])
+                if key not in merged:
+                    merged[key] = dict(record)
+                    continue
+                existing = merged[key]
+                existing["uses"] += record["uses"]
+                if record["cost_ms"] > existing["cost_ms"]:
+                    existing.update({name: record[name] for name in ("cost_ms", "matches", "flags", "suggestions")})
+        pages = {}
+        for record in merged.values():
+            record["total_ms"] = round(record["cost_ms"] * record["uses"], 4)
+            pages.setdefault(record["page"], []).append(record)
+        for records in pages.values():
+            records.sort(key=lambda item: -item["total_ms"])
+        return dict(sorted(pages.items(), key=lambda item: -sum(record["total_ms"] for record in item[1])))
+
+    @staticmethod
+    def format_report(report: dict) -> str:
+        """将分析结果格式化为文本（每个 page 一个排好序的表格，有问题的定位附带建议）"""
+        lines = []
+        for page, records in report.items():
+            lines.append(f"[{page}]")
+            for record in records:
+                flags = ",".join(record["flags"]) or "ok"
+                lines.append(f"    {record['total_ms']:>10.3f}ms {record['cost_ms']:>8.4f}ms x{record['uses']:<5} matches={record['matches']:<4} "
+                             f"{flags:<24} ({record['by']}, {record['value']!r})")
+                if record["flags"] and record["suggestions"]:
+                    best = record["suggestions"][0]
+                    lines.append(f"        -> 建议: ({best['by']}, {best['value']!r}) {best['cost_ms']:.4f}ms")
+        return "\n".join(lines)
+
+
+# 进程内共享的分析实例
+locator_profiler = LocatorProfiler()
@@ -0,0 +1,163 @@
+import atexit
+import fnmatch
+import os
+import queue
+import shutil
+import sys
+import threading
+import time
+import uuid
+
+from utils.common_utils import get_worker_id
+from utils.file_utils import get_current_project_path
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+default_clone_root = os.path.join(get_current_project_path(), "selenium", "profiles")
+
+# 浏览器运行时生成的锁文件，克隆时跳过，避免多个浏览器之间出现 profile 被占用的问题
+PROFILE_LOCK_FILES = ("SingletonLock", "SingletonSocket", "SingletonCookie", "lockfile", "LOCK", "*.lock")
+
+# Linux 下 reflink（写时复制）的 ioctl 编号 FICLONE
+FICLONE = 0x40049409
+
+
+def reflink_file(src, dst):
+    """
+    使用写时复制的方式克隆文件（btrfs、xfs 等文件系统支持），不支持时抛出 OSError
+    """
+    if not sys.platform.startswith("linux"):
+        raise OSError("当前系统不支持 reflink")
+    import fcntl
+    with open(src, "rb") as src_file, open(dst, "wb") as dst_file:
+        fcntl.ioctl(dst_file.fileno(), FICLONE, src_file.fileno())
+
+
+class ProfileTemplate:
+    """
+    浏览器 profile 模板（--user-data-dir）：提前准备好一份已经同意了 cookie 弹窗、安装了证书、缓存预热过的 profile，
+    每次启动浏览器时克隆一份给当前浏览器使用，多个浏览器之间不会争抢同一个 profile 的锁
+        - 文件系统支持 reflink 时使用写时复制，几乎没有复制开销
+        - hardlink_dirs 中的文件使用硬链接（只适用于浏览器不会修改的文件，如已安装的扩展）
+        - 其他情况直接复制
+    浏览器退出后，克隆出来的 profile 会在后台线程中删除
+    """
+
+    def __init__(self, template_dir, clone_root=default_clone_root, hardlink_dirs=("Extensions",)):
+        """
+        template_dir: 模板 profile 的目录
+        clone_root: 克隆 profile 的存放目录
+        hardlink_dirs: 使用硬链接的子目录名称（硬链接与模板共享同一份数据，浏览器修改后会影响模板，只能用于只读文件）
+        """
+        if not os.path.isdir(template_dir):
+            raise AssertionError(f"浏览器 profile 模板不存在: {template_dir}")
+        self.template_dir = template_dir
+        self.clone_root = clone_root
+        self.hardlink_dirs = set(hardlink_dirs)
+        self._reflink_supported = True
+        self._clones = set()
+        self._lock = threading.Lock()
+        self._cleanup_queue = queue.Queue()
+        threading.Thread(target=self._cleanup_worker, name="profile-cleanup", daemon=True).start()
+        atexit.register(self.cleanup_all)
+        self._cleanup_stale()
+
+    def clone(self) -> str:
+        """克隆一份 profile，返回克隆后的目录"""
+        clone_dir = os.path.join(self.clone_root, f"{get_worker_id()}-{uuid.uuid4().hex[:8]}")
+        start = time.perf_counter()
+        for root, dirs, files in os.walk(self.template_dir):
+            relative = os.path.relpath(root, self.template_dir)
+            target_root = os.path.normpath(os.path.join(clone_dir, relative))
+            os.makedirs(target_root, exist_ok=True)
+            use_hardlink = bool(self.hardlink_dirs.intersection(relative.split(os.sep)))
+            for file in files:
+                if any(fnmatch.fnmatch(file, pattern) for pattern in PROFILE_LOCK_FILES):
+                    continue
+                self._clone_file(os.path.join(root, file), os.path.join(target_root, file), use_hardlink)
+        with self._lock:
+            self._clones.add(clone_dir)
+        logger.info(f"克隆浏览器 profile 耗时 {time.perf_counter() - start:.3f}s: {clone_dir}")
+        return clone_dir
+
+    def _clone_file(self, src, dst, use_hardlink):
+        if use_hardlink:
+            try:
+                os.link(src, dst)
+                return
+            except OSError:
+                pass
+        if self._reflink_supported:
+            try:
+                reflink_file(src, dst)
+                return
+            except OSError:
+                # 文件系统不支持 reflink，后续的文件都直接复制
+                self._reflink_supported = False
+        shutil.copy2(src, dst)
+
+    def attach(self, driver, clone_dir):
+        """浏览器退出（driver.quit）后，在后台删除它使用的克隆 profile"""
+        original_quit = driver.quit
+
+        def quit_and_release():
+            try:
+                original_quit()
+            finally:
+                self.release(clone_dir)
+
+        driver.quit = quit_and_release
+        return driver
+
+    def release(self, clone_dir):
+        """将克隆的 profile 交给后台线程删除"""
+        with self._lock:
+            self._clones.discard(clone_dir)
+        self._cleanup_queue.put(clone_dir)
+
+    def _cleanup_worker(self):
+        while True:
+            clone_dir = self._cleanup_queue.get()
+            # windows 下浏览器进程完全退出前文件仍被占用，重试几次
+            for _ in range(5):
+                shutil.rmtree(clone_dir, ignore_errors=True)
+                if not os.path.exists(clone_dir):
+                    break
+                time.sleep(1)
+
+    def _cleanup_stale(self, max_age=24 * 3600):
+        """删除之前异常退出的进程遗留下来的克隆 profile"""
+        if not os.path.isdir(self.clone_root):
+            return
+        for entry in os.scandir(self.clone_root):
+            if entry.is_dir() and time.time() - entry.stat().st_mtime > max_age:
+                self._cleanup_queue.put(entry.path)
+
+    def cleanup_all(self):
+        """进程退出时删除所有还没有删除的克隆 profile，包括已经交给后台线程但还没有删除的（后台线程是守护线程，退出时不会等待它）"""
+        with self._lock:
+            clones, self._clones = self._clones, set()
+        while True:
+            try:
+                clones.add(self._cleanup_queue.get_nowait())
+            except queue.Empty:
+                break
+        for clone_dir in clones:
+            shutil.rmtree(clone_dir, ignore_errors=True)
+
+
+_templates = {}
+
+
+def get_profile_template(template_dir=None):
+    """
+    获取 profile 模板，没有指定目录时读取环境变量 TEST_PROFILE_TEMPLATE，没有配置时返回 None
+    同一个目录在进程中只创建一个 ProfileTemplate
+    """
+    template_dir = template_dir or os.environ.get("TEST_PROFILE_TEMPLATE")
+    if not template_dir:
+        return None
+    if template_dir not in _templates:
+        _templates[template_dir] = ProfileTemplate(template_dir)
+    return _templates[template_dir]
@@ -0,0 +1,117 @@
+import contextvars
+import time
+from contextlib import contextmanager
+
+from selenium.common import (
+    ElementClickInterceptedException,
+    ElementNotInteractableException,
+    StaleElementReferenceException,
+    TimeoutException,
+)
+
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 当前上下文的截止时间（time.monotonic），嵌套调用共享同一个截止时间
+_current_deadline = contextvars.ContextVar("retry_deadline", default=None)
+
+
+def classify_exception(e: Exception) -> str:
+    """
+    异常分类，决定是否值得重试：
+        stale: 元素已经从 DOM 中移除（页面重新渲染），重新查找后可能成功
+        intercepted: 点击被其他元素（遮罩、loading、动画）挡住，稍后可能成功
+        not_interactable: 元素存在但暂时不可交互（未显示、被禁用），稍后可能成功
+        timeout: 等待已经用完了时间，重试也不会成功
+        fatal: 其他错误（定位写错、窗口已关闭、会话失效等），重试不会成功
+    """
+    if isinstance(e, StaleElementReferenceException):
+        return "stale"
+    if isinstance(e, ElementClickInterceptedException):
+        return "intercepted"
+    if isinstance(e, ElementNotInteractableException):
+        return "not_interactable"
+    if isinstance(e, TimeoutException):
+        return "timeout"
+    return "fatal"
+
+
+@contextmanager
+def deadline_scope(timeout: float):
+    """
+    开启一个截止时间，范围内的所有等待共享这一个时间预算；嵌套时取外层剩余时间和 timeout 中较小的一个，
+    一个失败的步骤最多只消耗一次超时时间，而不是每一层各自等待一次
+
+        with deadline_scope(10):
+            operator.element_click(locator_a)  # 两次点击一共最多等待 10 秒
+            operator.element_click(locator_b)
+    """
+    deadline = time.monotonic() + timeout
+    outer = _current_deadline.get()
+    if outer is not None:
+        deadline = min(deadline, outer)
+    token = _current_deadline.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current_deadline.reset(token)
+
+
+def remaining_time(timeout: float = None) -> float:
+    """
+    获取可以使用的等待时间：没有截止时间时返回 timeout，否则返回 timeout 与剩余时间中较小的一个（不小于 0）
+    """
+    deadline = _current_deadline.get()
+    if deadline is None:
+        return timeout
+    left = max(0.0, deadline - time.monotonic())
+    return left if timeout is None else min(timeout, left)
+
+
+class RetryPolicy:
+    """
+    重试策略：只重试可能成功的异常（参考 classify_exception），重试间隔指数退避，所有重试共享一个截止时间
+    每次尝试中的等待应该使用 remaining_time 获取剩余时间，而不是重新等待完整的超时时间
+    """
+
+    def __init__(self, retry_on=("stale", "intercepted", "not_interactable"), backoff=0.1, max_backoff=1.0, multiplier=2.0, max_attempts=None):
+        """
+        retry_on: 需要重试的异常类型（classify_exception 的返回值）
+        backoff: 第一次重试前的等待时间（秒）
+        max_backoff: 重试间隔的上限（秒）
+        multiplier: 每次重试后间隔的放大倍数
+        max_attempts: 最多尝试的次数，为 None 时只受截止时间限制
+        """
+        self.retry_on = set(retry_on)
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.multiplier = multiplier
+        self.max_attempts = max_attempts
+
+    def run(self, func, timeout: float, description: str = ""):
+        """
+        在 timeout 秒的时间预算内执行 func，可重试的异常退避后重试，其他异常或者时间用完后抛出最后一次的异常
+        func: 无参数的方法
+        timeout: 时间预算（秒），在外层的 deadline_scope 中时不会超过外层的剩余时间
+        description: 操作描述，用于重试日志
+        """
+        with deadline_scope(timeout) as deadline:
+            attempt = 0
+            delay = self.backoff
+            while True:
+                attempt += 1
+                try:
+                    return func()
+                except Exception as e:
+                    kind = classify_exception(e)
+                    left = deadline - time.monotonic()
+                    if kind not in self.retry_on or left <= 0 or (self.max_attempts and attempt >= self.max_attempts):
+                        raise
+                    logger.warning(f"{description}失败（{kind}），{min(delay, left):.2f}s 后进行第 {attempt + 1} 次尝试: {e.__class__.__name__}")
+                    time.sleep(min(delay, left))
+                    delay = min(delay * self.multiplier, self.max_backoff)
+
+
+# 默认的重试策略
+DEFAULT_RETRY_POLICY = RetryPolicy()
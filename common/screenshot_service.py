@@ -0,0 +1,154 @@
+import atexit
+import base64
+import hashlib
+import io
+import os
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor, wait
+
+from PIL import Image
+from selenium.webdriver.remote.webdriver import WebDriver
+from selenium.webdriver.remote.webelement import WebElement
+
+from common.deep_locator import get_frame_path
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 元素相对于文档左上角的位置（CSS 像素），用于 CDP 的裁剪截图
+ELEMENT_CLIP_JS = """
+const rect = arguments[0].getBoundingClientRect();
+return {x: rect.left + window.scrollX, y: rect.top + window.scrollY, width: rect.width, height: rect.height};
+"""
+
+IMAGE_FORMATS = {".png": "png", ".jpg": "jpeg", ".jpeg": "jpeg"}
+
+
+class ScreenshotService:
+    """
+    截图服务：测试线程只负责向浏览器取回图片（一次往返），解码、转码和写入磁盘交给后台线程池，返回 Future
+        - Chromium 内核通过 CDP 的 Page.captureScreenshot 截取元素所在的区域，并直接让浏览器按目标格式编码（jpg 不需要再转码）
+        - 同一个路径再次写入相同内容的截图（按哈希判断）时直接跳过，写入失败后不再跳过
+        - 同一个路径的多次写入按调用 save 的顺序依次完成，文件中始终是最后一次写入的内容
+        - 等待写入的截图数量有上限，超过时测试线程会等待，避免大量截图堆积在内存中
+    进程退出前以及 pytest 会话结束时会调用 flush 等待所有截图写入完成
+    """
+
+    def __init__(self, workers=2, max_pending=32, jpeg_quality=85):
+        """
+        workers: 后台编码和写入的线程数
+        max_pending: 最多同时等待写入的截图数量
+        jpeg_quality: jpg 截图的质量
+        """
+        self.jpeg_quality = jpeg_quality
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="screenshot")
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._pending = set()
+        self._paths = {}  # 路径 -> 最近一次写入（或者正在写入）的 (内容哈希, Future)
+        self._lock = threading.Lock()
+        self.deduplicated = 0
+
+    def grab(self, driver: WebDriver, element: WebElement = None, image_format="png") -> bytes:
+        """
+        在测试线程中取回截图的原始数据（不解码），element 为 None 时截取整个窗口
+        支持 CDP 时按元素区域裁剪并直接编码为 image_format（png / jpeg），否则返回 png
+        元素在 iframe 中时（坐标相对于 frame）使用 WebDriver 的元素截图
+        """
+        if hasattr(driver, "execute_cdp_cmd") and (element is None or get_frame_path(driver) == ()):
+            params = {"format": image_format}
+            if image_format == "jpeg":
+                params["quality"] = self.jpeg_quality
+            if element is not None:
+                clip = driver.execute_script(ELEMENT_CLIP_JS, element)
+                params.update({"clip": {**clip, "scale": 1}, "captureBeyondViewport": True})
+            try:
+                return base64.b64decode(driver.execute_cdp_cmd("Page.captureScreenshot", params)["data"])
+            except Exception as e:
+                logger.warning(f"CDP 截图失败，使用 WebDriver 截图: {e}")
+        return element.screenshot_as_png if element is not None else driver.get_screenshot_as_png()
+
+    def capture(self, driver: WebDriver, file_path, element: WebElement = None) -> Future:
+        """
+        截图并在后台写入 file_path（支持 .png/.jpg/.jpeg），返回的 Future 在写入完成后返回文件路径
+        """
+        ext = os.path.splitext(file_path)[1].lower()
+        if ext not in IMAGE_FORMATS:
+            raise ValueError("图片名称必须以： .png, .jpg, or .jpeg 结尾")
+        data = self.grab(driver, element, IMAGE_FORMATS[ext])
+        return self.save(data, file_path)
+
+    def save(self, data: bytes, file_path) -> Future:
+        """
+        在后台把截图数据写入 file_path，数据格式和扩展名不一致时转码
+        写入的是调用时传入的数据；同一个路径之前的写入还没有完成时，等它完成后再写入
+        """
+        file_path = os.path.abspath(file_path)
+        digest = hashlib.sha1(data).hexdigest()
+        self._slots.acquire()
+        with self._lock:
+            previous = self._paths.get(file_path)
+            if previous is not None and previous[0] == digest:
+                self._slots.release()
+                self.deduplicated += 1
+                return previous[1]
+            try:
+                future = self._executor.submit(self._write, data, file_path, previous[1] if previous else None)
+            except Exception:
+                self._slots.release()
+                raise
+            self._pending.add(future)
+            self._paths[file_path] = (digest, future)
+        future.add_done_callback(lambda done: self._done(done, file_path))
+        return future
+
+    def flush(self, timeout=None) -> bool:
+        """等待所有截图写入完成，返回是否全部完成"""
+        with self._lock:
+            pending = list(self._pending)
+        if not pending:
+            return True
+        done, not_done = wait(pending, timeout=timeout)
+        for future in done:
+            if future.exception():
+                logger.error(f"截图写入失败: {future.exception()}")
+        if not_done:
+            logger.warning(f"还有 {len(not_done)} 张截图没有写入完成")
+        return not not_done
+
+    def shutdown(self):
+        self.flush()
+        self._executor.shutdown(wait=True)
+
+    def _done(self, future: Future, file_path):
+        with self._lock:
+            self._pending.discard(future)
+            if (future.cancelled() or future.exception() is not None) and self._paths.get(file_path, (None, None))[1] is future:
+                # 写入失败的截图不再跳过，之后相同内容的截图重新写入
+                del self._paths[file_path]
+        self._slots.release()
+
+    def _write(self, data: bytes, file_path, previous: Future = None):
+        if previous is not None:
+            # 先完成同一个路径之前的写入（失败也没有关系），保证文件中是最后一次写入的内容
+            wait([previous])
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        target_format = IMAGE_FORMATS[os.path.splitext(file_path)[1].lower()]
+        source_format = "jpeg" if data[:3] == b"\xff\xd8\xff" else "png"
+        if source_format != target_format:
+            image = Image.open(io.BytesIO(data))
+            if target_format == "jpeg":
+                image = image.convert("RGB")
+            buffer = io.BytesIO()
+            image.save(buffer, format=target_format, quality=self.jpeg_quality)
+            data = buffer.getvalue()
+        # 先写入临时文件再替换，其他进程（如报告）不会读到写了一半的图片
+        temp_path = f"{file_path}.{threading.get_ident()}.tmp"
+        with open(temp_path, "wb") as f:
+            f.write(data)
+        os.replace(temp_path, file_path)
+        return file_path
+
+
+# 进程内共享的截图服务
+screenshot_service = ScreenshotService()
+atexit.register(screenshot_service.flush)
@@ -0,0 +1,225 @@
+import json
+import os
+import time
+from urllib.parse import urlparse
+
+from selenium.webdriver.remote.webdriver import WebDriver
+
+from common.global_var import GlobalVar
+from utils.file_utils import get_current_project_path, FileLock
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+default_session_dir = os.path.join(get_current_project_path(), "session_cache")
+
+# 读取当前页面的 localStorage / sessionStorage
+READ_STORAGE_JS = """
+const dump = (storage) => {
+    const result = {};
+    for (let i = 0; i < storage.length; i++) {
+        const key = storage.key(i);
+        result[key] = storage.getItem(key);
+    }
+    return result;
+};
+return {origin: window.location.origin, local: dump(window.localStorage), session: dump(window.sessionStorage)};
+"""
+
+# 在新页面的脚本执行之前写入 storage，只在快照对应的域名下、每个标签页只写入一次（避免覆盖页面后续修改的数据）
+INJECT_STORAGE_JS = """
+(() => {
+    const snapshot = %s;
+    if (window.location.origin !== snapshot.origin) return;
+    try {
+        if (window.sessionStorage.getItem('__session_cache_injected')) return;
+        for (const [key, value] of Object.entries(snapshot.local)) window.localStorage.setItem(key, value);
+        for (const [key, value] of Object.entries(snapshot.session)) window.sessionStorage.setItem(key, value);
+        window.sessionStorage.setItem('__session_cache_injected', '1');
+    } catch (e) {}
+})();
+"""
+
+# 不支持 CDP 的浏览器在页面打开后直接写入 storage
+WRITE_STORAGE_JS = """
+const [local, session] = arguments;
+for (const [key, value] of Object.entries(local)) window.localStorage.setItem(key, value);
+for (const [key, value] of Object.entries(session)) window.sessionStorage.setItem(key, value);
+"""
+
+# 清空当前页面域名下的 storage
+CLEAR_STORAGE_JS = """
+window.localStorage.clear();
+window.sessionStorage.clear();
+"""
+
+
+class SessionCache:
+    """
+    登录状态快照缓存：登录一次后保存 cookie、localStorage 和 sessionStorage，以 环境 + 角色 为 key 存到本地
+    后续的浏览器在第一次打开页面之前注入登录状态，跳过 UI 登录；快照过期或者注入后仍未登录时，自动回退到真实登录
+
+        cache = SessionCache()
+        cache.ensure_login("https://xxx/home", role="buyer", login=login_page.login, is_logged_in=home_page.is_logged_in)
+    """
+
+    def __init__(self, cache_dir=default_session_dir, ttl=3600):
+        """
+        cache_dir: 快照的存放目录
+        ttl: 快照的有效期（秒）
+        """
+        self.cache_dir = cache_dir
+        self.ttl = ttl
+
+    def _path(self, env, role):
+        return os.path.join(self.cache_dir, f"{env}_{role}.json")
+
+    def capture(self, role, env=None, driver: WebDriver = None):
+        """
+        保存当前浏览器的登录状态（需要在登录完成后、停留在应用页面时调用）
+        Chromium 内核通过 CDP 获取所有域名下的 cookie，其他浏览器只能获取当前域名的 cookie
+        """
+        env = env or os.environ.get("TEST_ENV", "dev")
+        driver = driver or GlobalVar.get_driver()
+        if hasattr(driver, "execute_cdp_cmd"):
+            cookies = driver.execute_cdp_cmd("Network.getAllCookies", {})["cookies"]
+        else:
+            cookies = driver.get_cookies()
+        storage = driver.execute_script(READ_STORAGE_JS)
+        now = time.time()
+        snapshot = {
+            "env": env,
+            "role": role,
+            "origin": storage["origin"],
+            "cookies": cookies,
+            "local_storage": storage["local"],
+            "session_storage": storage["session"],
+            "created": now,
+            "expires": now + self.ttl,
+        }
+        os.makedirs(self.cache_dir, exist_ok=True)
+        path = self._path(env, role)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(snapshot, f, indent=4)
+        os.replace(tmp_path, path)
+        logger.info(f"已保存登录状态快照: {env}/{role}")
+        return snapshot
+
+    def load(self, role, env=None):
+        """读取登录状态快照，快照不存在、已过期或者其中的 cookie 已过期时返回 None"""
+        env = env or os.environ.get("TEST_ENV", "dev")
+        path = self._path(env, role)
+        if not os.path.isfile(path):
+            return None
+        try:
+            with open(path, encoding="utf-8") as f:
+                snapshot = json.load(f)
+        except (OSError, ValueError):
+            return None
+        now = time.time()
+        if snapshot["expires"] < now:
+            return None
+        for cookie in snapshot["cookies"]:
+            # selenium 的 cookie 使用 expiry，CDP 的 cookie 使用 expires（会话 cookie 为 -1）
+            expires = cookie.get("expiry", cookie.get("expires", -1))
+            if 0 < expires < now:
+                return None
+        return snapshot
+
+    def invalidate(self, role, env=None):
+        env = env or os.environ.get("TEST_ENV", "dev")
+        path = self._path(env, role)
+        if os.path.isfile(path):
+            os.remove(path)
+
+    def inject(self, snapshot, driver: WebDriver = None):
+        """
+        将登录状态注入到浏览器中，Chromium 内核在第一次打开页面之前通过 CDP 注入；
+        其他浏览器需要先打开快照对应的域名，写入后再由调用方打开目标页面
+        :return: CDP 注入脚本的 identifier，用于第一次打开页面后移除脚本
+        """
+        driver = driver or GlobalVar.get_driver()
+        if hasattr(driver, "execute_cdp_cmd"):
+            cookies = [self._to_cdp_cookie(cookie) for cookie in snapshot["cookies"]]
+            driver.execute_cdp_cmd("Network.setCookies", {"cookies": cookies})
+            storage = {"origin": snapshot["origin"], "local": snapshot["local_storage"], "session": snapshot["session_storage"]}
+            result = driver.execute_cdp_cmd("Page.addScriptToEvaluateOnNewDocument", {"source": INJECT_STORAGE_JS % json.dumps(storage)})
+            return result.get("identifier")
+        driver.get(snapshot["origin"])
+        host = urlparse(snapshot["origin"]).hostname
+        for cookie in snapshot["cookies"]:
+            if host and host.endswith(cookie.get("domain", host).lstrip(".")):
+                driver.add_cookie({key: value for key, value in cookie.items() if key in
+                                   ("name", "value", "path", "domain", "secure", "httpOnly", "expiry", "sameSite")})
+        driver.execute_script(WRITE_STORAGE_JS, snapshot["local_storage"], snapshot["session_storage"])
+        return None
+
+    @staticmethod
+    def _to_cdp_cookie(cookie):
+        """selenium 格式的 cookie 转换为 CDP 格式（CDP 格式的 cookie 保持不变）"""
+        cdp_cookie = {key: cookie[key] for key in ("name", "value", "domain", "path", "secure", "httpOnly", "sameSite") if key in cookie}
+        expires = cookie.get("expires", cookie.get("expiry"))
+        if expires is not None and expires > 0:
+            cdp_cookie["expires"] = expires
+        return cdp_cookie
+
+    def ensure_login(self, url, role, login, is_logged_in, env=None, driver: WebDriver = None) -> bool:
+        """
+        打开 url 并保证处于登录状态：优先注入登录状态快照，快照失效时调用 login 真实登录并保存新的快照
+        :param url: 登录后要打开的页面
+        :param role: 角色，如 buyer、seller
+        :param login: 真实登录的方法，参数为 driver，执行完成后浏览器应处于登录状态
+        :param is_logged_in: 判断是否处于登录状态的方法，参数为 driver
+        :return: True 表示使用了快照，False 表示进行了真实登录
+        """
+        env = env or os.environ.get("TEST_ENV", "dev")
+        driver = driver or GlobalVar.get_driver()
+        if self._restore(url, role, env, is_logged_in, driver):
+            return True
+        # 多个 worker 同时需要登录时只有一个真实登录，其他 worker 等待后直接使用它保存的快照
+        os.makedirs(self.cache_dir, exist_ok=True)
+        with FileLock(self._path(env, role) + ".lock", timeout=600):
+            if self._restore(url, role, env, is_logged_in, driver):
+                return True
+            logger.info(f"登录状态快照不可用，进行真实登录: {env}/{role}")
+            login(driver)
+            self.capture(role, env, driver)
+        driver.get(url)
+        return False
+
+    def _restore(self, url, role, env, is_logged_in, driver):
+        snapshot = self.load(role, env)
+        if snapshot is None:
+            return False
+        try:
+            identifier = self.inject(snapshot, driver)
+            try:
+                driver.get(url)
+            finally:
+                # storage 在第一次打开页面时已经写入，移除注入脚本，避免浏览器被复用（如 DriverPool）后向其他角色的页面注入
+                if identifier:
+                    driver.execute_cdp_cmd("Page.removeScriptToEvaluateOnNewDocument", {"identifier": identifier})
+            if is_logged_in(driver):
+                return True
+        except Exception as e:
+            logger.warning(f"注入登录状态快照失败: {e}")
+        logger.warning(f"登录状态快照已失效: {env}/{role}")
+        self.invalidate(role, env)
+        # 清理注入的登录状态，保证真实登录从干净的状态开始
+        if hasattr(driver, "execute_cdp_cmd"):
+            driver.execute_cdp_cmd("Network.clearBrowserCookies", {})
+        else:
+            driver.delete_all_cookies()
+        self._clear_storage(snapshot["origin"], driver)
+        return False
+
+    @staticmethod
+    def _clear_storage(origin, driver):
+        """清空快照对应域名下的 localStorage 和 sessionStorage"""
+        try:
+            if driver.execute_script("return window.location.origin;") != origin:
+                driver.get(origin)
+            driver.execute_script(CLEAR_STORAGE_JS)
+        except Exception as e:
+            logger.warning(f"清理注入的 storage 失败: {e}")
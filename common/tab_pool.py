@@ -0,0 +1,145 @@
+import time
+from collections import deque
+
+from selenium.common import WebDriverException
+from selenium.webdriver.remote.command import Command
+from selenium.webdriver.support.wait import WebDriverWait
+
+from utils.log_manager import LogManager
+
+logger = LogManager()
+
+# 在当前文档上记录跳转前的地址后开始跳转（不等待页面加载），新文档中没有这个记录，用来判断跳转是否已经生效
+# 支持 Navigation API 时通过它跳转：返回 204 或者触发下载的地址不会加载新文档，跳转被取消时 committed 会 reject
+START_NAVIGATION_JS = """
+const url = arguments[0];
+window.__tabPoolLeaving = location.href;
+window.__tabPoolAborted = false;
+if (window.navigation && typeof window.navigation.navigate === 'function') {
+    window.navigation.navigate(url).committed.catch(() => { window.__tabPoolAborted = true; });
+} else {
+    window.location.href = url;
+}
+"""
+
+# 跳转已经生效：已经是新的文档并且不在加载中；或者还是原来的文档，但是地址已经变化（只改变 hash）或者跳转已经被取消（204、下载）
+NAVIGATION_COMMITTED_JS = """
+if (!window.__tabPoolLeaving) return document.readyState !== 'loading';
+return location.href !== window.__tabPoolLeaving || window.__tabPoolAborted;
+"""
+
+
+class TabPool:
+    """
+    在一个浏览器中打开多个标签页并行处理互相独立的只读检查（如校验列表中 20 个详情页）：
+    先在所有标签页中开始跳转，再逐个等待并执行检查，检查完一个标签页后立即在这个标签页中开始下一个跳转，
+    页面加载的时间互相重叠；标签页的句柄在本地记录，不会每次都查询 window_handles
+
+        with TabPool(operator, size=4) as pool:
+            titles = pool.map(urls, lambda operator, url: operator.get_page_title())
+    """
+
+    def __init__(self, operator, size=4, timeout=30, wait_ready=True):
+        """
+        operator: BrowserOperator，检查方法通过它操作当前标签页
+        size: 标签页的数量
+        timeout: 每个页面加载的超时时间（秒）
+        wait_ready: 是否在跳转后等待页面就绪（参考 BrowserOperator.wait_for_page_ready），否则只等待文档加载
+        """
+        self.operator = operator
+        self.driver = operator.driver
+        self.size = max(1, size)
+        self.timeout = timeout
+        self.wait_ready = wait_ready
+        self.handles = []
+        self._origin = None
+
+    def __enter__(self):
+        self.open()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def open(self):
+        """打开 size 个新的标签页（新建标签页的命令直接返回句柄，不会切换过去）"""
+        self._origin = self.driver.current_window_handle
+        for _ in range(self.size - len(self.handles)):
+            self.handles.append(self.driver.execute(Command.NEW_WINDOW, {"type": "tab"})["value"]["handle"])
+        return self
+
+    def close(self):
+        """关闭打开的标签页并切换回原来的窗口"""
+        for handle in self.handles:
+            try:
+                self.operator.switch_to_window(handle)
+                self.driver.close()
+            except Exception as e:
+                logger.warning(f"关闭标签页失败: {handle}, {e}")
+        self.handles = []
+        if self._origin:
+            self.operator.switch_to_window(self._origin)
+
+    def map(self, items: list, check=None, raise_on_error=True) -> list:
+        """
+        把 items 分配到各个标签页中处理，返回与 items 顺序一致的结果
+        items: url 或者方法的列表；url 会在标签页中打开后调用 check(operator, url)，
+               方法会在切换到空闲的标签页后调用 item(operator)（方法中的跳转无法和其他标签页重叠）
+        check: 页面打开后执行的检查方法，参数为 operator 和 url，为 None 时返回页面的 url
+        raise_on_error: 是否在所有 item 处理完成后，对失败的 item 统一抛出 AssertionError，否则失败的 item 的结果为异常对象
+        """
+        if not self.handles:
+            self.open()
+        results = [None] * len(items)
+        queue = deque(enumerate(items))
+        active = deque()
+        for handle in self.handles:
+            if not queue:
+                break
+            active.append(self._start(handle, *queue.popleft()))
+        while active:
+            handle, index, item, started = active.popleft()
+            try:
+                self.operator.switch_to_window(handle)
+                if callable(item):
+                    results[index] = item(self.operator)
+                else:
+                    if started is None:
+                        self.operator.open_url(item, wait_ready=self.wait_ready)
+                    else:
+                        self._wait_loaded(started)
+                    results[index] = check(self.operator, item) if check else self.operator.get_current_url()
+            except Exception as e:
+                logger.error(f"标签页处理 {item} 失败: {e}")
+                results[index] = e
+            if queue:
+                # 当前已经在这个标签页中，直接开始下一个跳转
+                active.append(self._start(handle, *queue.popleft(), switched=True))
+        errors = {items[index]: result for index, result in enumerate(results) if isinstance(result, Exception)}
+        if errors and raise_on_error:
+            details = "\n".join(f"    {item}: {error}" for item, error in errors.items())
+            raise AssertionError(f"{len(errors)}/{len(items)} 个标签页处理失败:\n{details}")
+        return results
+
+    def _start(self, handle, index, item, switched=False):
+        """在标签页中开始跳转（不等待加载完成），方法类型的 item 只记录下来，轮到时再执行"""
+        started = time.monotonic()
+        if not callable(item):
+            try:
+                if not switched:
+                    self.operator.switch_to_window(handle)
+                self.driver.execute_script(START_NAVIGATION_JS, item)
+            except Exception as e:
+                # 开始跳转失败时，轮到这个标签页时再按普通的方式打开页面
+                logger.warning(f"标签页开始跳转失败 {item}: {e}")
+                started = None
+        return handle, index, item, started
+
+    def _wait_loaded(self, started):
+        """等待跳转生效、文档加载完成，再按需要等待页面就绪"""
+        remaining = max(0.0, self.timeout - (time.monotonic() - started))
+        WebDriverWait(self.driver, remaining, poll_frequency=0.05, ignored_exceptions=(WebDriverException,)).until(
+            lambda driver: driver.execute_script(NAVIGATION_COMMITTED_JS)
+        )
+        if self.wait_ready:
+            self.operator.wait_for_page_ready(timeout=max(1.0, self.timeout - (time.monotonic() - started)))
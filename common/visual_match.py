@@ -0,0 +1,218 @@
+import io
+import os
+import threading
+
+import numpy as np
+from PIL import Image
+
+from utils.file_utils import get_current_project_path
+from utils.log_manager import LogManager
+
+try:
+    # 安装了 opencv 时使用 opencv 解码 png，比 PIL 更快
+    import cv2
+except ImportError:
+    cv2 = None
+
+logger = LogManager()
+
+# SSIM 的常数（像素范围 0 - 255）
+_C1 = (0.01 * 255) ** 2
+_C2 = (0.03 * 255) ** 2
+
+
+def visual_update_enabled() -> bool:
+    """是否用本次的截图更新基准图，由 run.py 的 --update-visual-baseline 通过环境变量 TEST_VISUAL_UPDATE 开启"""
+    return os.environ.get("TEST_VISUAL_UPDATE", "0").lower() in ("1", "true", "yes")
+
+
+def decode_image(data: bytes) -> np.ndarray:
+    """把 png / jpg 数据解码为 (高, 宽, 3) 的 RGB uint8 数组"""
+    if cv2 is not None:
+        image = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+        if image is not None:
+            return cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+    return np.asarray(Image.open(io.BytesIO(data)).convert("RGB"))
+
+
+class BaselineStore:
+    """
+    基准图存储：基准图以 png 保存在 root 下（名称中可以包含 / 分组），解码后的基准图按文件修改时间缓存在内存中，
+    同一个基准图在一次运行中被多次比较时只解码一次
+    """
+
+    def __init__(self, root=None):
+        self.root = root or os.environ.get("TEST_VISUAL_BASELINE") or os.path.join(get_current_project_path(), "visual_baseline")
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def path(self, name: str) -> str:
+        return os.path.join(self.root, *name.split("/")) + ".png"
+
+    def load(self, name: str):
+        """读取基准图，不存在时返回 None"""
+        path = self.path(name)
+        try:
+            mtime = os.path.getmtime(path)
+        except OSError:
+            return None
+        with self._lock:
+            cached = self._cache.get(path)
+        if cached and cached[0] == mtime:
+            return cached[1]
+        with open(path, "rb") as f:
+            image = decode_image(f.read())
+        with self._lock:
+            self._cache[path] = (mtime, image)
+        return image
+
+    def save(self, name: str, image: np.ndarray) -> str:
+        path = self.path(name)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        Image.fromarray(image).save(path, format="png")
+        with self._lock:
+            self._cache[path] = (os.path.getmtime(path), image)
+        return path
+
+
+class VisualComparator:
+    """
+    分块比较截图和基准图，只有发生变化的块才计算 SSIM：
+        1. 逐块比较像素是否完全相同，没有变化的块直接跳过
+        2. 变化的块计算感知哈希（8x8 的块内均值哈希），哈希相同并且像素差异都在 pixel_tolerance 以内的块视为渲染噪声（抗锯齿、亚像素偏移）
+        3. 剩下的块一次性向量化计算 SSIM，SSIM 低于 ssim_threshold 或者差异像素比例超过 tile_tolerance 的块认为不一致
+    ignore 区域（x, y, 宽, 高，图片像素）在比较前会被清零
+    """
+
+    def __init__(self, tile_size=32, ssim_threshold=0.98, pixel_tolerance=16, tile_tolerance=0.01):
+        """
+        tile_size: 分块的边长（像素），需要是 8 的倍数
+        ssim_threshold: 一个块的 SSIM 低于这个值时认为不一致
+        pixel_tolerance: 任意通道的差异超过这个值的像素认为是差异像素
+        tile_tolerance: 一个块中差异像素的比例超过这个值时认为不一致
+        """
+        if tile_size % 8:
+            raise ValueError("tile_size 需要是 8 的倍数")
+        self.tile_size = tile_size
+        self.ssim_threshold = ssim_threshold
+        self.pixel_tolerance = pixel_tolerance
+        self.tile_tolerance = tile_tolerance
+
+    def compare(self, baseline: np.ndarray, current: np.ndarray, ignore=()) -> dict:
+        """
+        比较两张 RGB 图片，返回：
+            passed: 是否一致
+            size_mismatch: 两张图片的尺寸是否不同（不同时不再逐块比较）
+            total_tiles / changed_tiles / compared_tiles / failed_tiles: 总块数 / 像素有变化的块数 / 计算了 SSIM 的块数 / 不一致的块数
+            min_ssim: 计算过 SSIM 的块中最低的 SSIM
+            failed: 不一致的块的区域 [(x, y, 宽, 高)]
+            diff_mask: 不一致的块中差异像素的掩码（与图片尺寸相同，没有差异时为 None）
+        """
+        if baseline.shape != current.shape:
+            return {"passed": False, "size_mismatch": True, "baseline_size": baseline.shape[1::-1], "current_size": current.shape[1::-1],
+                    "total_tiles": 0, "changed_tiles": 0, "compared_tiles": 0, "failed_tiles": 0, "min_ssim": 0.0, "failed": [], "diff_mask": None}
+        height, width = baseline.shape[:2]
+        size = self.tile_size
+        baseline = self._prepare(baseline, ignore)
+        current = self._prepare(current, ignore)
+        rows, cols = baseline.shape[0] // size, baseline.shape[1] // size
+        result = {"passed": True, "size_mismatch": False, "total_tiles": rows * cols, "changed_tiles": 0, "compared_tiles": 0,
+                  "failed_tiles": 0, "min_ssim": 1.0, "failed": [], "diff_mask": None}
+        if np.array_equal(baseline, current):
+            return result
+
+        # (行, 列, 块高, 块宽, 3)
+        baseline_tiles = self._tiles(baseline)
+        current_tiles = self._tiles(current)
+        channel_diff = np.abs(baseline_tiles.astype(np.int16) - current_tiles.astype(np.int16)).max(axis=-1)
+        changed = channel_diff.any(axis=(2, 3))
+        result["changed_tiles"] = int(changed.sum())
+
+        baseline_gray = self._gray(baseline_tiles[changed])
+        current_gray = self._gray(current_tiles[changed])
+        diff_pixels = channel_diff[changed] > self.pixel_tolerance
+        noise = (self._tile_hash(baseline_gray) == self._tile_hash(current_gray)).all(axis=(1, 2)) & ~diff_pixels.any(axis=(1, 2))
+        candidates = ~noise
+        result["compared_tiles"] = int(candidates.sum())
+        if not candidates.any():
+            return result
+
+        ssim = self._ssim(baseline_gray[candidates], current_gray[candidates])
+        ratio = diff_pixels[candidates].mean(axis=(1, 2))
+        failed = (ssim < self.ssim_threshold) | (ratio > self.tile_tolerance)
+        result["min_ssim"] = round(float(ssim.min()), 4)
+        result["failed_tiles"] = int(failed.sum())
+        if not failed.any():
+            return result
+
+        # 还原不一致的块在图片中的位置，并生成差异像素的掩码
+        positions = np.argwhere(changed)[candidates][failed]
+        mask = np.zeros((rows, cols, size, size), dtype=bool)
+        mask[positions[:, 0], positions[:, 1]] = diff_pixels[candidates][failed]
+        result["diff_mask"] = mask.swapaxes(1, 2).reshape(rows * size, cols * size)[:height, :width]
+        result["failed"] = [(int(col * size), int(row * size), int(min(size, width - col * size)), int(min(size, height - row * size)))
+                            for row, col in positions]
+        result["passed"] = False
+        return result
+
+    def _prepare(self, image: np.ndarray, ignore) -> np.ndarray:
+        """清零忽略区域，并把尺寸补齐到 tile_size 的倍数"""
+        image = np.array(image[:, :, :3], dtype=np.uint8, copy=True)
+        for x, y, width, height in ignore:
+            image[max(0, int(y)):max(0, int(y + height)), max(0, int(x)):max(0, int(x + width))] = 0
+        pad_y = -image.shape[0] % self.tile_size
+        pad_x = -image.shape[1] % self.tile_size
+        if pad_y or pad_x:
+            image = np.pad(image, ((0, pad_y), (0, pad_x), (0, 0)))
+        return image
+
+    def _tiles(self, image: np.ndarray) -> np.ndarray:
+        size = self.tile_size
+        rows, cols = image.shape[0] // size, image.shape[1] // size
+        return image.reshape(rows, size, cols, size, image.shape[2]).swapaxes(1, 2)
+
+    @staticmethod
+    def _gray(tiles: np.ndarray) -> np.ndarray:
+        return tiles[..., 0] * np.float32(0.299) + tiles[..., 1] * np.float32(0.587) + tiles[..., 2] * np.float32(0.114)
+
+    def _tile_hash(self, gray: np.ndarray) -> np.ndarray:
+        """每个块的均值哈希：把块缩小为 8x8 的均值，高于整个块均值的位置为 1"""
+        cell = self.tile_size // 8
+        cells = gray.reshape(len(gray), 8, cell, 8, cell).mean(axis=(2, 4))
+        return cells > cells.mean(axis=(1, 2), keepdims=True)
+
+    @staticmethod
+    def _ssim(a: np.ndarray, b: np.ndarray) -> np.ndarray:
+        """每个块作为一个窗口计算 SSIM，a、b 为 (块数, 块高, 块宽) 的灰度数组"""
+        a = a.astype(np.float64)
+        b = b.astype(np.float64)
+        mu_a = a.mean(axis=(1, 2))
+        mu_b = b.mean(axis=(1, 2))
+        var_a = a.var(axis=(1, 2))
+        var_b = b.var(axis=(1, 2))
+        cov = ((a - mu_a[:, None, None]) * (b - mu_b[:, None, None])).mean(axis=(1, 2))
+        return ((2 * mu_a * mu_b + _C1) * (2 * cov + _C2)) / ((mu_a ** 2 + mu_b ** 2 + _C1) * (var_a + var_b + _C2))
+
+
+def render_diff(baseline: np.ndarray, current: np.ndarray, result: dict) -> np.ndarray:
+    """
+    生成差异图：基准图 | 当前截图 | 差异（当前截图变淡，不一致的块标为浅红色，差异像素标为红色）
+    尺寸不同时只拼接两张图片
+    """
+    if result["size_mismatch"]:
+        height = max(baseline.shape[0], current.shape[0])
+        canvas = np.full((height, baseline.shape[1] + current.shape[1], 3), 255, dtype=np.uint8)
+        canvas[:baseline.shape[0], :baseline.shape[1]] = baseline[:, :, :3]
+        canvas[:current.shape[0], baseline.shape[1]:] = current[:, :, :3]
+        return canvas
+    diff = (current[:, :, :3].astype(np.float32) * 0.3 + 178).astype(np.uint8)
+    for x, y, width, height in result["failed"]:
+        diff[y:y + height, x:x + width] = (diff[y:y + height, x:x + width] * 0.7 + np.array([255, 0, 0]) * 0.3).astype(np.uint8)
+    if result["diff_mask"] is not None:
+        diff[result["diff_mask"]] = (255, 0, 0)
+    return np.concatenate((baseline[:, :, :3], current[:, :, :3], diff), axis=1)
+
+
+# 进程内共享的基准图存储和比较器
+baseline_store = BaselineStore()
+visual_comparator = VisualComparator()
@@ -1,13 +1,27 @@
+import json
 import os
+import shutil
 import sys
 import subprocess
 import argparse
 from pathlib import Path
 
+from common.command_metrics import CommandMetrics
+from common.launch_profile import LAUNCH_PROFILES
+from common.locator_profiler import LocatorProfiler
+from utils.duration_store import DurationStore, schedule_lpt
 from utils.log_manager import LogManager
 
 # 项目根目录（根据实际路径调整）
 BASE_DIR = Path(__file__).parent
+# 历史耗时数据库及每次运行各个 worker 的耗时报告
+DURATION_DIR = BASE_DIR / ".durations"
+DURATION_DB = DURATION_DIR / "durations.json"
+LAST_RUN_DIR = DURATION_DIR / "last_run"
+# WebDriver 命令统计，每个 worker 写入 <worker>.json，运行结束后合并为 summary.json
+COMMAND_METRICS_DIR = BASE_DIR / "command_metrics"
+# 定位方式耗时分析，每个 worker 写入 <worker>.json，运行结束后合并为 report.json
+LOCATOR_PROFILE_DIR = BASE_DIR / "locator_profile"
 
 logger = LogManager()
 
@@ -38,6 +52,32 @@ def parse_args():
         help="What browser to use",
         default="Chrome"
     )
+    # 浏览器启动配置，如 full（默认）、headless-fast（无头快速模式）、debug
+    parser.add_argument(
+        "--profile",
+        choices=list(LAUNCH_PROFILES),
+        default=os.environ.get("TEST_LAUNCH_PROFILE", "full"),
+        help="Browser launch profile (default: $TEST_LAUNCH_PROFILE or 'full')"
+    )
+    # 元素缓存：同一个页面中重复使用的定位元组只查找一次
+    parser.add_argument(
+        "--element-cache",
+        action="store_true",
+        help="Cache located elements per window/document and reuse them until navigation, window/frame switch or staleness"
+    )
+    # 元素等待引擎：polling（WebDriverWait 轮询）/ event（页面内 MutationObserver 事件驱动）
+    parser.add_argument(
+        "--wait-engine",
+        choices=["polling", "event"],
+        default=os.environ.get("TEST_WAIT_ENGINE", "polling"),
+        help="How BrowserOperator waits for elements (default: $TEST_WAIT_ENGINE or 'polling')"
+    )
+    # 浏览器 profile 模板目录，每个浏览器启动时克隆一份作为 --user-data-dir
+    parser.add_argument(
+        "--profile-template",
+        default=os.environ.get("TEST_PROFILE_TEMPLATE", ""),
+        help="Golden --user-data-dir cloned for every browser launch (default: $TEST_PROFILE_TEMPLATE)"
+    )
     # 指定allure 报告的位置，默认为项目根目录
     parser.add_argument(
         "--allure",
@@ -45,6 +85,59 @@ def parse_args():
         default=BASE_DIR / "allure-results",
         help="Generate Allure report after tests and specify the output directory"
     )
+    # 并行执行的 worker 数量，大于 1 时使用 pytest-xdist 启动多个 worker，每个 worker 独享一个浏览器
+    parser.add_argument(
+        "-n", "--workers",
+        type=int,
+        default=1,
+        help="Number of parallel workers, each worker runs its own browser (default: 1, serial)"
+    )
+    # 并行时的用例分发策略，driver 前置是 class 级别的，默认按 class 分发保证同一个类的 case 在同一个 worker 中执行
+    # lpt: 根据历史耗时按 class 分片，耗时最长的 class 优先分配给当前负载最小的 worker
+    parser.add_argument(
+        "--dist",
+        choices=["loadscope", "loadfile", "load", "worksteal", "lpt"],
+        default="loadscope",
+        help="How tests are distributed to workers: pytest-xdist modes, or 'lpt' for duration balanced class shards (default: loadscope)"
+    )
+    # 输出每个 worker 的预估耗时和实际耗时
+    parser.add_argument(
+        "--report-balance",
+        action="store_true",
+        help="Print actual makespan of every worker after the run (and the predicted one in lpt mode)"
+    )
+    # 浏览器预热池的大小，大于 0 时后台预热浏览器并在 class 之间复用（每个 worker 各自一个池）
+    parser.add_argument(
+        "--pool-size",
+        type=int,
+        default=0,
+        help="Number of pre-launched browsers kept warm per worker and reused across test classes (default: 0, disabled)"
+    )
+    # 单个浏览器最多被复用的次数
+    parser.add_argument(
+        "--pool-max-uses",
+        type=int,
+        default=20,
+        help="Recycle a pooled browser after it has served this many test classes (default: 20)"
+    )
+    # 统计每个 WebDriver 命令的耗时，输出延迟直方图、往返次数和最慢的命令
+    parser.add_argument(
+        "--command-metrics",
+        action="store_true",
+        help=f"Record every WebDriver command and write latency histograms to allure and {COMMAND_METRICS_DIR.name}/summary.json"
+    )
+    # 分析每个 page 使用的定位方式的耗时，并给出更快的 css / id 定位建议
+    parser.add_argument(
+        "--locator-profile",
+        action="store_true",
+        help=f"Measure every locator used by page objects and suggest faster CSS/ID equivalents in {LOCATOR_PROFILE_DIR.name}/report.json"
+    )
+    # 用本次的截图更新视觉比较的基准图
+    parser.add_argument(
+        "--update-visual-baseline",
+        action="store_true",
+        help="Overwrite visual baselines with the screenshots taken in this run instead of comparing against them"
+    )
     # 是否清理之前的测试结果
     parser.add_argument(
         "--clean",
@@ -62,6 +155,65 @@ def clean_results(allure_path):
     logger.info("🧹 Cleaned previous test results.")
 
 
+def collect_scopes(base_cmd):
+    """
+    收集本次要执行的 case，并按调度单元（class/module）分组
+    收集失败（如模块导入错误）或者没有收集到任何 case 时输出错误信息并返回 None，避免这些 case 被静默跳过
+    """
+    env = {key: value for key, value in os.environ.items() if key != "TEST_DURATION_DIR"}
+    result = subprocess.run(base_cmd + ["--collect-only", "-q"], cwd=BASE_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        output = "\n".join(part for part in (result.stdout.strip(), result.stderr.strip()) if part)
+        logger.error(f"❌ Test collection failed (exit code {result.returncode}):\n{output}")
+        return None
+    scopes = []
+    for line in result.stdout.splitlines():
+        line = line.strip()
+        if "::" not in line:
+            continue
+        scope = line.rsplit("::", 1)[0]
+        if scope not in scopes:
+            scopes.append(scope)
+    if not scopes:
+        logger.error("❌ No tests collected.")
+        return None
+    return scopes
+
+
+def run_lpt_shards(base_cmd, shards):
+    """每个分片启动一个 pytest 进程并行执行，所有进程的 allure 结果写入同一个目录"""
+    shard_dir = DURATION_DIR / "shards"
+    shard_dir.mkdir(parents=True, exist_ok=True)
+    processes = []
+    for index, shard in enumerate(shards):
+        if not shard:
+            continue
+        worker_id = f"gw{index}"
+        # 分片的 case 列表写入参数文件，避免 windows 命令行长度超限
+        args_file = shard_dir / f"{worker_id}.txt"
+        args_file.write_text("\n".join(shard), encoding="utf-8")
+        cmd = base_cmd + [f"@{args_file}"]
+        logger.info(f"🚀 [{worker_id}] Running {len(shard)} test classes with command: {' '.join(cmd)}")
+        processes.append(subprocess.Popen(cmd, cwd=BASE_DIR, env={**os.environ, "TEST_WORKER_ID": worker_id}))
+    return all([process.wait() == 0 for process in processes])
+
+
+def report_balance(predicted, actual):
+    """输出每个 worker 的预估耗时和实际耗时（非 lpt 模式没有预估耗时，显示为 -）"""
+    if predicted:
+        logger.info("⚖️ Worker balance (predicted / actual seconds):")
+    else:
+        logger.info("⚖️ Worker balance (predicted / actual seconds, no prediction: xdist assigns tests dynamically):")
+    workers = sorted(set(predicted) | set(actual), key=lambda name: (len(name), name))
+    for worker in workers:
+        predicted_time = f"{predicted[worker]:.1f}" if worker in predicted else "-"
+        actual_time = f"{actual[worker]:.1f}" if worker in actual else "-"
+        logger.info(f"    {worker:<8} {predicted_time:>10} / {actual_time:>10}")
+    predicted_makespan = f"{max(predicted.values()):.1f}" if predicted else "-"
+    actual_makespan = max(actual.values(), default=0.0)
+    logger.info(f"    makespan {predicted_makespan:>10} / {actual_makespan:>10.1f}")
+
+
 def run_pytest(args):
     """执行 pytest 命令"""
     cmd = ["pytest"]
@@ -71,10 +223,7 @@ def run_pytest(args):
     if args.keyword:
         cmd.extend(["-k", args.keyword])
     if args.clean:
-        clean_results(args.allure)
-
-    # 指定 Allure 结果目录
-    cmd.extend(["--alluredir", str(args.allure)])
+        clean_results(Path(args.allure))
 
     # 设置环境变量（case可以通过 conftest.py 或 pytest_configure 读取）
     os.environ["TEST_ENV"] = args.env
@@ -82,10 +231,96 @@ def run_pytest(args):
     # 设置浏览器类型
     os.environ["TEST_BROWSER"] = args.browser
 
-    # 执行命令
-    logger.info(f"🚀 Running pytest with command: {' '.join(cmd)}")
-    result = subprocess.run(cmd, cwd=BASE_DIR)
-    return result.returncode == 0
+    # 设置浏览器启动配置
+    os.environ["TEST_LAUNCH_PROFILE"] = args.profile
+    if args.profile_template:
+        os.environ["TEST_PROFILE_TEMPLATE"] = str(Path(args.profile_template).resolve())
+
+    # 设置元素等待引擎
+    os.environ["TEST_WAIT_ENGINE"] = args.wait_engine
+
+    # 设置元素缓存
+    os.environ["TEST_ELEMENT_CACHE"] = "1" if args.element_cache else "0"
+
+    # 设置浏览器预热池
+    os.environ["TEST_DRIVER_POOL"] = str(args.pool_size)
+    os.environ["TEST_DRIVER_MAX_USES"] = str(args.pool_max_uses)
+
+    # 设置 WebDriver 命令统计
+    if args.command_metrics:
+        shutil.rmtree(COMMAND_METRICS_DIR, ignore_errors=True)
+        os.environ["TEST_COMMAND_METRICS"] = str(COMMAND_METRICS_DIR)
+
+    # 设置定位方式耗时分析
+    if args.locator_profile:
+        shutil.rmtree(LOCATOR_PROFILE_DIR, ignore_errors=True)
+        os.environ["TEST_LOCATOR_PROFILE"] = str(LOCATOR_PROFILE_DIR)
+
+    # 设置视觉比较基准图的更新
+    os.environ["TEST_VISUAL_UPDATE"] = "1" if args.update_visual_baseline else "0"
+
+    # 每个 worker 把各个 class 的耗时写到 LAST_RUN_DIR 中，执行完成后合并到历史耗时数据库
+    shutil.rmtree(LAST_RUN_DIR, ignore_errors=True)
+    os.environ["TEST_DURATION_DIR"] = str(LAST_RUN_DIR)
+    store = DurationStore(DURATION_DB)
+
+    # 只有 lpt 模式会按预估的分片执行，其他模式由 xdist 动态分配，没有可以对比的预估耗时
+    predicted = {}
+    if args.workers > 1 and args.dist == "lpt":
+        scopes = collect_scopes(cmd)
+        if not scopes:
+            return False
+        shards, loads = schedule_lpt(scopes, args.workers, store)
+        predicted = {f"gw{index}": load for index, load in enumerate(loads)}
+
+    # 指定 Allure 结果目录
+    cmd.extend(["--alluredir", str(args.allure)])
+
+    if args.workers > 1 and args.dist == "lpt":
+        # 按历史耗时分片，每个分片一个 pytest 进程，所有分片写入同一个 allure 目录，最终合并成一份报告
+        success = run_lpt_shards(cmd, shards)
+    else:
+        # 并行执行，所有 worker 把结果写到同一个 allure 目录（结果文件以 uuid 命名，不会冲突），最终合并成一份报告
+        if args.workers > 1:
+            cmd.extend(["-n", str(args.workers), "--dist", args.dist])
+        # 执行命令
+        logger.info(f"🚀 Running pytest with command: {' '.join(cmd)}")
+        result = subprocess.run(cmd, cwd=BASE_DIR)
+        success = result.returncode == 0
+
+    actual = store.merge_reports(LAST_RUN_DIR)
+    store.save()
+    if args.report_balance:
+        report_balance(predicted, actual)
+    if args.command_metrics:
+        report_command_metrics()
+    if args.locator_profile:
+        report_locator_profile()
+    return success
+
+
+def report_command_metrics():
+    """合并所有 worker 的 WebDriver 命令统计，写入 summary.json 并输出到日志"""
+    summary = CommandMetrics.merge_reports(COMMAND_METRICS_DIR)
+    if not summary["round_trips"]:
+        logger.warning("⚠️ No WebDriver commands recorded.")
+        return
+    summary_path = COMMAND_METRICS_DIR / "summary.json"
+    with open(summary_path, "w", encoding="utf-8") as f:
+        json.dump(summary, f, indent=4, ensure_ascii=False)
+    logger.info(f"⏱️ WebDriver command metrics ({summary_path}):\n{CommandMetrics.format_summary(summary)}")
+
+
+def report_locator_profile():
+    """合并所有 worker 的定位方式分析，写入 report.json 并输出到日志"""
+    report = LocatorProfiler.merge_reports(LOCATOR_PROFILE_DIR)
+    if not report:
+        logger.warning("⚠️ No locators recorded.")
+        return
+    report_path = LOCATOR_PROFILE_DIR / "report.json"
+    with open(report_path, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=4, ensure_ascii=False)
+    logger.info(f"🔍 Locator profile ({report_path}):\n{LocatorProfiler.format_report(report)}")
 
 
 def generate_reports(args):
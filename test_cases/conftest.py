@@ -1,11 +1,19 @@
+import hashlib
+import json
 import os
 
 import allure
 import pytest
 
+from common.command_metrics import command_metrics, command_metrics_enabled, CommandMetrics
 from common.driver_config import DriverConfig
+from common.driver_pool import DriverPool
+from common.element_cache import element_cache_enabled, get_element_cache
+from common.locator_profiler import locator_profile_enabled, locator_profiler
 from common.global_var import GlobalVar
-from utils.common_utils import get_host_ip_address
+from common.screenshot_service import screenshot_service
+from utils.common_utils import get_host_ip_address, get_worker_path
+from utils.duration_store import DurationRecorder
 from utils.log_manager import LogManager
 from utils.screen_recording import ScreenRecording
 from utils.time_utils import get_utc_date_str, TimeFormat
@@ -15,19 +23,100 @@ logger = LogManager()
 # 获取当前项目所在根目录并创建一个 testData的文件夹用于存储录屏信息
 server_local_path = os.path.splitdrive(os.getcwd())[0] + "\\testData"
 
+duration_recorder = None
+
+
+# 记录每个 class 的耗时，用于下一次并行执行时的分片均衡（由 run.py 通过 TEST_DURATION_DIR 开启）
+def pytest_configure(config):
+    global duration_recorder
+    report_dir = os.environ.get("TEST_DURATION_DIR")
+    # xdist 的主进程也会收到所有 worker 的报告，只在真正执行 case 的进程中记录
+    is_xdist_controller = not hasattr(config, "workerinput") and config.getoption("numprocesses", default=None)
+    if report_dir and not is_xdist_controller:
+        duration_recorder = DurationRecorder(report_dir)
+
+
+def pytest_runtest_logreport(report):
+    if duration_recorder:
+        duration_recorder.add_report(report)
+
+
+def pytest_sessionfinish(session):
+    screenshot_service.flush()  # 等待后台的截图全部写入完成，保证生成 allure 报告时图片已经存在
+    if duration_recorder:
+        duration_recorder.save()
+    if command_metrics_enabled():
+        command_metrics.save(os.environ["TEST_COMMAND_METRICS"])  # 每个 worker 的命令统计，由 run.py 合并
+    if locator_profile_enabled():
+        locator_profiler.save(os.environ["TEST_LOCATOR_PROFILE"])  # 每个 worker 的定位方式分析，由 run.py 合并
+
+
+# case 失败时截取当前窗口并添加到 allure 报告中：直接使用浏览器返回的 png 数据，不在测试线程中解码或转码，
+# 同一个 case 的多个阶段（如 call 和 teardown）失败时画面没有变化的截图只添加一次
+@pytest.hookimpl(hookwrapper=True)
+def pytest_runtest_makereport(item, call):
+    outcome = yield
+    report = outcome.get_result()
+    if not report.failed or GlobalVar.driver is None:
+        return
+    try:
+        data = screenshot_service.grab(GlobalVar.get_driver())
+    except Exception as e:
+        logger.info(f"failure screenshot failed: {str(e)}")
+        return
+    digest = hashlib.sha1(data).hexdigest()
+    if getattr(item, "_failure_screenshot", None) == digest:
+        return
+    item._failure_screenshot = digest
+    allure.attach(data, name=f"Failure Screenshot ({report.when})", attachment_type=allure.attachment_type.PNG)
+
+
+# 浏览器预热池，由 run.py 通过 TEST_DRIVER_POOL 开启（池的大小），为 0 或者调试模式时不使用
+@pytest.fixture(scope="session")
+def driver_pool():
+    pool_size = int(os.environ.get("TEST_DRIVER_POOL", "0"))
+    if pool_size <= 0:
+        yield None
+        return
+    max_uses = int(os.environ.get("TEST_DRIVER_MAX_USES", "20"))
+    pool = DriverPool(os.environ['TEST_BROWSER'], size=pool_size, max_uses=max_uses).start()
+    yield pool
+    pool.shutdown()
+
 
 # 所有case运行前获取驱动的前置方法
 @pytest.fixture(scope="class", autouse=True)
-def driver():
+def driver(driver_pool):
     debugger = False  # 调试模式，用于接管cmd启动的浏览器，方便调试
     browser_type = os.environ['TEST_BROWSER']  # 获取浏览器类型
     global get_driver  # 设置全局变量
-    get_driver = DriverConfig().init_driver(browser_type, debugger)  # 初始化驱动
+    if driver_pool and not debugger:
+        get_driver = driver_pool.acquire()  # 从浏览器池中获取已经预热好的浏览器
+    else:
+        get_driver = DriverConfig().init_driver(browser_type, debugger)  # 初始化驱动
     GlobalVar.set_driver(get_driver)  # 将驱动放入 GlobalVar 中
     yield get_driver
+    if element_cache_enabled():
+        logger.info(f"元素缓存统计: {get_element_cache(get_driver).stats()}")  # 元素缓存节省的查找次数（run.py --element-cache 开启）
+    if driver_pool and not debugger:
+        driver_pool.release(GlobalVar.release_driver("base"))  # 主驱动重置后归还给浏览器池
     GlobalVar.cleanup_driver()  # case 全部运行完成后，将所有的驱动都销毁
 
 
+# 统计每个 case 发出的 WebDriver 命令（run.py --command-metrics 开启），结果作为附件添加到 allure 报告中
+@pytest.fixture(autouse=True)
+def command_metrics_report(request):
+    if not command_metrics_enabled():
+        yield
+        return
+    command_metrics.begin_test(request.node.nodeid)
+    yield
+    summary = command_metrics.end_test()
+    if summary:
+        allure.attach(name="WebDriver Commands", body=CommandMetrics.format_summary(summary), attachment_type=allure.attachment_type.TEXT)
+        allure.attach(name="WebDriver Commands (json)", body=json.dumps(summary, indent=4, ensure_ascii=False), attachment_type=allure.attachment_type.JSON)
+
+
 # 这个是执行每个case 的时候进行录屏，
 @pytest.fixture(autouse=True)
 def capture_case_recording(request):
@@ -40,7 +129,7 @@ def capture_case_recording(request):
     screen_record = None
     try:
         video_name = f"{test_name}_{get_utc_date_str(TimeFormat.YYYYMMDD_HHMMSS.value)}.mp4"
-        save_path = os.path.join(server_local_path, 'screen_record')
+        save_path = get_worker_path(os.path.join(server_local_path, 'screen_record'))  # 并行时每个 worker 独立的录屏目录
         screen_record = ScreenRecording(video_name=video_name, save_path=save_path)
         screen_record.start()
     except Exception as e:
@@ -1,4 +1,7 @@
+import os
+import signal
 import socket
+import subprocess
 
 
 def get_host_ip_address():
@@ -10,3 +13,77 @@ def get_host_ip_address():
         return addr
     except socket.error:
         return "127.0.0.1"
+
+
+def get_worker_id():
+    """
+    获取当前并行 worker 的编号（run.py 分片执行时注入 TEST_WORKER_ID，pytest-xdist 会注入 PYTEST_XDIST_WORKER，如 gw0、gw1）
+    串行执行时返回 master
+    """
+    return os.environ.get("TEST_WORKER_ID") or os.environ.get("PYTEST_XDIST_WORKER", "master")
+
+
+def is_parallel_worker():
+    """当前进程是否是并行执行中的某一个 worker"""
+    return get_worker_id() != "master"
+
+
+def get_worker_path(base_dir):
+    """
+    获取当前 worker 独享的目录，并行时每个 worker 使用 base_dir 下以 worker 编号命名的子目录，串行时直接返回 base_dir
+    """
+    worker_dir = os.path.join(base_dir, get_worker_id()) if is_parallel_worker() else base_dir
+    os.makedirs(worker_dir, exist_ok=True)
+    return worker_dir
+
+
+def kill_process_tree(pid):
+    """
+    强制结束进程及其所有子进程（如 chromedriver 和它启动的浏览器）
+    优先使用 psutil，没有安装时 windows 使用 taskkill，其他系统通过 /proc 或 pgrep 查找子进程
+    """
+    try:
+        import psutil
+    except ImportError:
+        psutil = None
+    if psutil is not None:
+        try:
+            parent = psutil.Process(pid)
+            processes = parent.children(recursive=True) + [parent]
+        except psutil.NoSuchProcess:
+            return
+        for process in processes:
+            try:
+                process.kill()
+            except psutil.NoSuchProcess:
+                pass
+        return
+    if os.name == "nt":
+        subprocess.run(["taskkill", "/PID", str(pid), "/T", "/F"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        return
+    # 先收集整棵进程树再结束，避免父进程先退出后子进程被 init 接管而找不到
+    pids, index = [pid], 0
+    while index < len(pids):
+        pids.extend(_child_pids(pids[index]))
+        index += 1
+    for child_pid in reversed(pids):
+        try:
+            os.kill(child_pid, signal.SIGKILL)
+        except OSError:
+            pass
+
+
+def _child_pids(pid):
+    task_dir = f"/proc/{pid}/task"
+    if os.path.isdir(task_dir):
+        # 子进程可能是由进程中的任意一个线程创建的
+        children = []
+        for task in os.listdir(task_dir):
+            try:
+                with open(os.path.join(task_dir, task, "children")) as f:
+                    children.extend(int(child) for child in f.read().split())
+            except OSError:
+                continue
+        return children
+    result = subprocess.run(["pgrep", "-P", str(pid)], stdout=subprocess.PIPE, stderr=subprocess.DEVNULL, text=True)
+    return [int(child) for child in result.stdout.split()]
@@ -0,0 +1,127 @@
+import heapq
+import json
+import os
+import time
+from pathlib import Path
+
+from utils.common_utils import get_worker_id
+
+
+def get_scope(nodeid: str) -> str:
+    """
+    获取 case 所属的调度单元：类中的 case 归属于类（path::Class），模块级函数归属于模块
+    driver 前置是 class 级别的，所以同一个类的 case 必须分到同一个 worker
+    """
+    return nodeid.rsplit("::", 1)[0] if "::" in nodeid else nodeid
+
+
+class DurationRecorder:
+    """
+    在每个 pytest 进程中记录各个调度单元的耗时，session 结束时写入 report_dir/<worker>.json
+    """
+
+    def __init__(self, report_dir):
+        self.report_dir = Path(report_dir)
+        self.scopes = {}
+        self.start = time.time()
+
+    def add_report(self, report):
+        """累加 setup/call/teardown 三个阶段的耗时，类前置的耗时会计入第一个 case 的 setup 阶段"""
+        scope = get_scope(report.nodeid)
+        self.scopes[scope] = self.scopes.get(scope, 0.0) + report.duration
+
+    def save(self):
+        self.report_dir.mkdir(parents=True, exist_ok=True)
+        data = {
+            "worker": get_worker_id(),
+            "start": self.start,
+            "stop": time.time(),
+            "scopes": self.scopes,
+        }
+        with open(self.report_dir / f"{get_worker_id()}.json", "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=4)
+
+
+class DurationStore:
+    """
+    本地的历史耗时数据库，记录每个调度单元（class/module）的平均耗时，用于并行时的分片均衡
+    """
+
+    def __init__(self, db_path, alpha=0.5, default_duration=30.0):
+        """
+        db_path: 数据库文件路径（json）
+        alpha: 指数平均的权重，越大越偏向最近一次的耗时
+        default_duration: 没有历史数据的调度单元的默认预估耗时（秒）
+        """
+        self.db_path = Path(db_path)
+        self.alpha = alpha
+        self.default_duration = default_duration
+        self.durations = {}
+        if self.db_path.exists():
+            try:
+                with open(self.db_path, encoding="utf-8") as f:
+                    self.durations = json.load(f)
+            except (OSError, ValueError):
+                self.durations = {}
+
+    def estimate(self, scope: str) -> float:
+        """预估调度单元的耗时，没有历史数据时使用已知耗时的中位数"""
+        if scope in self.durations:
+            return self.durations[scope]["duration"]
+        if self.durations:
+            known = sorted(value["duration"] for value in self.durations.values())
+            return known[len(known) // 2]
+        return self.default_duration
+
+    def update(self, scope: str, duration: float):
+        record = self.durations.get(scope)
+        if record is None:
+            self.durations[scope] = {"duration": duration, "runs": 1, "last": duration}
+        else:
+            record["duration"] = self.alpha * duration + (1 - self.alpha) * record["duration"]
+            record["runs"] += 1
+            record["last"] = duration
+
+    def merge_reports(self, report_dir) -> dict:
+        """
+        将一次运行中各个 worker 的耗时报告合并到数据库中
+        :return: {worker: 实际耗时（秒）}
+        """
+        actual = {}
+        report_dir = Path(report_dir)
+        if not report_dir.exists():
+            return actual
+        for report_file in sorted(report_dir.glob("*.json")):
+            try:
+                with open(report_file, encoding="utf-8") as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                continue
+            for scope, duration in data.get("scopes", {}).items():
+                self.update(scope, duration)
+            actual[data.get("worker", report_file.stem)] = data["stop"] - data["start"]
+        return actual
+
+    def save(self):
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = f"{self.db_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(self.durations, f, indent=4, sort_keys=True)
+        os.replace(tmp_path, self.db_path)
+
+
+def schedule_lpt(scopes, workers: int, store: DurationStore):
+    """
+    最长处理时间优先（LPT）分片：按预估耗时从大到小，依次把调度单元分给当前负载最小的 worker
+    :return: (shards, predicted) shards 为每个 worker 的调度单元列表，predicted 为每个 worker 的预估耗时
+    """
+    workers = max(1, min(workers, len(scopes)))
+    shards = [[] for _ in range(workers)]
+    predicted = [0.0] * workers
+    heap = [(0.0, index) for index in range(workers)]
+    for scope in sorted(scopes, key=lambda item: (-store.estimate(item), item)):
+        load, index = heapq.heappop(heap)
+        shards[index].append(scope)
+        predicted[index] = load + store.estimate(scope)
+        heapq.heappush(heap, (predicted[index], index))
+    return shards, predicted
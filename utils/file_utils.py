@@ -1,4 +1,5 @@
 import os
+import time
 
 
 def get_current_project_path():
@@ -15,3 +16,65 @@ def get_subdirectories(folder_path):
     """
     subdirectories = [f.path for f in os.scandir(folder_path) if f.is_dir()]
     return subdirectories
+
+
+class FileLock:
+    """
+    跨进程的文件锁（windows 使用 msvcrt，其他系统使用 fcntl），用于多个 worker 同时操作同一个文件的场景
+        with FileLock("xxx.lock", timeout=300):
+            ...
+    """
+
+    def __init__(self, lock_path, timeout=300, poll_interval=0.2):
+        self.lock_path = lock_path
+        self.timeout = timeout
+        self.poll_interval = poll_interval
+        self._file = None
+
+    def acquire(self):
+        os.makedirs(os.path.dirname(os.path.abspath(self.lock_path)), exist_ok=True)
+        self._file = open(self.lock_path, "a+b")
+        deadline = time.monotonic() + self.timeout
+        while True:
+            try:
+                self._lock_file()
+                return self
+            except OSError:
+                if time.monotonic() >= deadline:
+                    self._file.close()
+                    self._file = None
+                    raise TimeoutError(f"{self.timeout} 秒内没有获取到文件锁: {self.lock_path}")
+                time.sleep(self.poll_interval)
+
+    def release(self):
+        if self._file is None:
+            return
+        try:
+            self._unlock_file()
+        finally:
+            self._file.close()
+            self._file = None
+
+    def _lock_file(self):
+        if os.name == "nt":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_NBLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+
+    def _unlock_file(self):
+        if os.name == "nt":
+            import msvcrt
+            self._file.seek(0)
+            msvcrt.locking(self._file.fileno(), msvcrt.LK_UNLCK, 1)
+        else:
+            import fcntl
+            fcntl.flock(self._file.fileno(), fcntl.LOCK_UN)
+
+    def __enter__(self):
+        return self.acquire()
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.release()
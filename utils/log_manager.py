@@ -6,6 +6,8 @@ from pathlib import Path
 
 from loguru import logger
 
+from utils.common_utils import get_worker_id, is_parallel_worker
+
 
 class LogManager:
     _instance = None
@@ -60,6 +62,9 @@ class LogManager:
     def _generate_log_filename(self):
         timestamp = time.strftime("%Y%m%d%H%M%S", time.localtime())
         ip = self._get_host_ip().replace(".", "_")
+        if is_parallel_worker():
+            # 并行执行时每个 worker 写自己的日志文件
+            return f"TA-{timestamp}-{ip}-{get_worker_id()}.log"
         return f"TA-{timestamp}-{ip}.log"
 
     @staticmethod